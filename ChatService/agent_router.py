@@ -0,0 +1,351 @@
+import argparse
+import heapq
+import math
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatdb
+
+# --- CONFIG ---
+DEFAULT_CAPACITY = 8                 # concurrent open conversations per agent
+DEFAULT_BATCH_SIZE = 1000            # assignments written per INSERT
+ROUTABLE_STATUSES = ("available",)   # users.agent_status values that may take new conversations
+ANY_SKILL = None                     # heap key for conversations that need no particular skill
+
+AGENTS_SQL = """
+    SELECT user_id, name, details->'skills', details->'shift'->>'start', details->'shift'->>'end'
+    FROM users
+    WHERE role_id = %(agent_role)s
+      AND agent_status = ANY(%(statuses)s)
+    ORDER BY user_id;
+"""
+
+# Current load: assignments to conversations that are still open
+LOADS_SQL = """
+    SELECT a.user_id, COUNT(*)
+    FROM conversation_assignments a
+    JOIN conversations c ON c.conversation_id = a.conversation_id
+    WHERE c.status_id = %(open_status)s
+    GROUP BY a.user_id;
+"""
+
+UNASSIGNED_SQL = """
+    SELECT c.conversation_id
+    FROM conversations c
+    WHERE c.status_id = %(open_status)s
+      AND NOT EXISTS (SELECT 1 FROM conversation_assignments a WHERE a.conversation_id = c.conversation_id)
+    ORDER BY c.started_at, c.conversation_id;
+"""
+
+INSERT_ASSIGNMENTS_SQL = """
+    INSERT INTO conversation_assignments (conversation_id, user_id, skill, assigned_at) VALUES %s
+    ON CONFLICT (conversation_id) DO UPDATE
+        SET user_id = EXCLUDED.user_id, skill = EXCLUDED.skill, assigned_at = EXCLUDED.assigned_at
+"""
+
+# --- AGENTS ---
+class Agent:
+    __slots__ = ("user_id", "name", "skills", "shift", "load", "version", "on_shift")
+
+    def __init__(self, user_id, name, skills, shift, load=0):
+        self.user_id = user_id
+        self.name = name
+        self.skills = tuple(skills)
+        self.shift = shift      # (start, end) times of day, or None for always on shift
+        self.load = load
+        self.version = 0        # bumped on every change; heap entries with an older version are stale
+        self.on_shift = None
+
+def parse_shift(start, end):
+    """("06:00", "14:00") -> (time, time), or None if the agent has no shift."""
+    if not start or not end:
+        return None
+    return (datetime.strptime(start, "%H:%M").time(), datetime.strptime(end, "%H:%M").time())
+
+def in_shift(shift, at):
+    """Whether time of day `at` falls in the [start, end) window; windows may wrap past midnight."""
+    if shift is None:
+        return True
+    start, end = shift
+    return start <= at < end if start <= end else (at >= start or at < end)
+
+# --- ROUTER ---
+class AgentRouter:
+    """Assigns conversations to the least-loaded eligible agent with the required skill.
+
+    Each skill (and ANY_SKILL) has a min-heap of (load, user_id, version)
+    entries for the agents that have it. Entries are never updated in place: a
+    load change bumps the agent's version and pushes fresh entries, and stale
+    ones are discarded when they reach the top. assign() and release() are
+    O(k log n) for agents with k skills. Heaps holding mostly stale entries are
+    rebuilt, which keeps them O(n) in size. Agents off shift (see set_clock())
+    or at `capacity` have no live entries. Not thread-safe.
+    """
+
+    def __init__(self, agents, capacity=DEFAULT_CAPACITY, now=None):
+        self.agents = {agent.user_id: agent for agent in agents}
+        self.capacity = capacity
+        self.members = defaultdict(list)   # skill -> agents with it
+        for agent in self.agents.values():
+            self.members[ANY_SKILL].append(agent)
+            for skill in agent.skills:
+                self.members[skill].append(agent)
+        self.heaps = {skill: [] for skill in self.members}
+        self.stale_pops = 0
+        self.rebuilds = 0
+        self.set_clock(now or datetime.now())
+
+    def _eligible(self, agent):
+        return agent.on_shift and agent.load < self.capacity
+
+    def _push(self, agent):
+        if not self._eligible(agent):
+            return
+        entry = (agent.load, agent.user_id, agent.version)
+        for skill in (ANY_SKILL, *agent.skills):
+            heap = self.heaps[skill]
+            if len(heap) > 2 * len(self.members[skill]) + 64:
+                self._rebuild(skill)
+            else:
+                heapq.heappush(heap, entry)
+
+    def _rebuild(self, skill):
+        """Replace `skill`'s heap with one live entry per eligible agent."""
+        heap = [(a.load, a.user_id, a.version) for a in self.members[skill] if self._eligible(a)]
+        heapq.heapify(heap)
+        self.heaps[skill] = heap
+        self.rebuilds += 1
+
+    def _changed(self, agent):
+        agent.version += 1
+        self._push(agent)
+
+    def set_clock(self, now):
+        """Re-evaluate shift windows at `now`; agents whose shift started or ended are (un)listed. O(n)."""
+        at = now.time()
+        for agent in self.agents.values():
+            on_shift = in_shift(agent.shift, at)
+            if on_shift != agent.on_shift:
+                agent.on_shift = on_shift
+                self._changed(agent)
+
+    def assign(self, skill=ANY_SKILL):
+        """Take the least-loaded eligible agent with `skill` (ties go to the lowest user_id).
+
+        Returns its user_id, or None if every such agent is off shift or at capacity.
+        """
+        heap = self.heaps.get(skill)
+        while heap:
+            _, user_id, version = heapq.heappop(heap)
+            agent = self.agents[user_id]
+            if version != agent.version or not self._eligible(agent):
+                self.stale_pops += 1
+                continue
+            agent.load += 1
+            self._changed(agent)
+            return user_id
+        return None
+
+    def release(self, user_id):
+        """One of the agent's conversations was closed or handed off."""
+        agent = self.agents[user_id]
+        agent.load = max(0, agent.load - 1)
+        self._changed(agent)
+
+    def loads(self, on_shift_only=True):
+        return {a.user_id: a.load for a in self.agents.values() if a.on_shift or not on_shift_only}
+
+class ScanRouter(AgentRouter):
+    """AgentRouter that scans every agent with the skill on each assign(): the O(n) baseline for --compare."""
+
+    def _push(self, agent):
+        pass
+
+    def assign(self, skill=ANY_SKILL):
+        best = min((a for a in self.members.get(skill, ()) if self._eligible(a)),
+                   key=lambda a: (a.load, a.user_id), default=None)
+        if best is None:
+            return None
+        best.load += 1
+        best.version += 1
+        return best.user_id
+
+# --- DATABASE ---
+def load_router(conn, capacity=DEFAULT_CAPACITY, statuses=ROUTABLE_STATUSES, now=None,
+                with_loads=True, router_class=AgentRouter):
+    """A router over the routable agents, starting from their current open-conversation load.
+
+    With `with_loads` False every agent starts idle (for simulations).
+    """
+    loads = {}
+    with conn.cursor() as cur:
+        if with_loads:
+            cur.execute(LOADS_SQL, {"open_status": chatdb.status_id(conn, "open")})
+            loads = dict(cur.fetchall())
+        cur.execute(AGENTS_SQL, {"agent_role": chatdb.role_id(conn, "Agent"), "statuses": list(statuses)})
+        agents = [Agent(user_id, name, skills or [], parse_shift(start, end), loads.get(user_id, 0))
+                  for user_id, name, skills, start, end in cur.fetchall()]
+    return router_class(agents, capacity, now)
+
+class AssignmentWriter:
+    """Buffers assignments and writes them with one multi-row INSERT per `batch_size`; the caller commits."""
+
+    def __init__(self, conn, batch_size=DEFAULT_BATCH_SIZE):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.pending = []
+        self.written = 0
+
+    def add(self, conversation_id, user_id, skill=ANY_SKILL, assigned_at=None):
+        self.pending.append((conversation_id, user_id, skill, assigned_at or datetime.now()))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            with self.conn.cursor() as cur:
+                execute_values(cur, INSERT_ASSIGNMENTS_SQL, self.pending, page_size=len(self.pending))
+            self.written += len(self.pending)
+            self.pending = []
+
+def route_open_conversations(conn, router, batch_size=DEFAULT_BATCH_SIZE, skill_of=None):
+    """Assign every open, unassigned conversation, committing after each batch.
+
+    `skill_of(conversation_id)` names the skill a conversation needs; conversations
+    carry no topic yet, so by default any agent may take them. Returns
+    (assigned, left unassigned).
+    """
+    with conn.cursor() as cur:
+        cur.execute(UNASSIGNED_SQL, {"open_status": chatdb.status_id(conn, "open")})
+        conversation_ids = [row[0] for row in cur.fetchall()]
+
+    writer = AssignmentWriter(conn, batch_size)
+    unassigned = 0
+    with conn:
+        for index, conversation_id in enumerate(conversation_ids, 1):
+            skill = skill_of(conversation_id) if skill_of else ANY_SKILL
+            user_id = router.assign(skill)
+            if user_id is None:
+                unassigned += 1
+            else:
+                writer.add(conversation_id, user_id, skill)
+            if index % batch_size == 0:
+                writer.flush()
+                conn.commit()
+        writer.flush()
+    return writer.written, unassigned
+
+# --- SIMULATION ---
+def balance(loads):
+    """Load spread across agents: min/max/mean/stdev and Jain's fairness index (1.0 = perfectly even)."""
+    values = list(loads.values())
+    if not values:
+        return {"agents": 0}
+    mean = sum(values) / len(values)
+    squares = sum(v * v for v in values)
+    return {
+        "agents": len(values), "min": min(values), "max": max(values), "mean": mean,
+        "stdev": math.sqrt(sum((v - mean) ** 2 for v in values) / len(values)),
+        "jain": (sum(values) ** 2) / (len(values) * squares) if squares else 1.0,
+    }
+
+def simulate(router, assignments, fill=0.75, seed=42):
+    """Route `assignments` conversations needing random skills, closing random ones to hold a steady state.
+
+    Once `fill` of the on-shift capacity is in use, each new assignment is
+    preceded by closing a random open one. Returns stats with assignments/sec
+    and the final load balance.
+    """
+    rng = random.Random(seed)
+    skills = sorted(s for s in router.members if s is not ANY_SKILL) + [ANY_SKILL]
+    on_shift = sum(1 for a in router.agents.values() if a.on_shift)
+    target = int(on_shift * router.capacity * fill)
+    active, unassigned = [], 0
+    requests = [rng.choice(skills) for _ in range(assignments)]
+    picks = [rng.random() for _ in range(assignments)]
+
+    start = time.perf_counter()
+    for skill, pick in zip(requests, picks):
+        if len(active) >= target and active:
+            # Close a random open conversation (swap-remove keeps this O(1))
+            index = int(pick * len(active))
+            active[index], active[-1] = active[-1], active[index]
+            router.release(active.pop())
+        user_id = router.assign(skill)
+        if user_id is None:
+            unassigned += 1
+        else:
+            active.append(user_id)
+    elapsed = time.perf_counter() - start
+
+    return {"assignments": assignments, "unassigned": unassigned, "seconds": elapsed,
+            "per_sec": assignments / elapsed if elapsed else 0.0, "open": len(active),
+            "balance": balance(router.loads())}
+
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Route open conversations to agents, or simulate routing.")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY,
+                        help="Open conversations an agent may hold at once.")
+    parser.add_argument("--statuses", nargs="+", default=list(ROUTABLE_STATUSES),
+                        help="Agent statuses that may take new conversations.")
+    parser.add_argument("--at", type=lambda s: datetime.combine(datetime.now().date(), datetime.strptime(s, "%H:%M").time()),
+                        help="Route as if it were this time of day (HH:MM) for shift windows (default: now).")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Assignments written per INSERT and commit.")
+    parser.add_argument("--simulate", type=int, metavar="N",
+                        help="Instead of routing, time N in-memory assignments with random skills and closures.")
+    parser.add_argument("--fill", type=float, default=0.75,
+                        help="With --simulate, share of on-shift capacity kept busy.")
+    parser.add_argument("--compare", action="store_true",
+                        help="With --simulate, also run the same workload with a linear scan over agents.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for --simulate.")
+    return parser.parse_args()
+
+def print_simulation(label, stats):
+    b = stats["balance"]
+    print(f"⏱️  {label}: {stats['assignments']:,} assignments in {stats['seconds']:.2f}s "
+          f"({stats['per_sec']:,.0f}/sec), {stats['unassigned']:,} unassigned, {stats['open']:,} open at the end")
+    if b["agents"]:
+        print(f"📊 Load over {b['agents']} agents: min {b['min']}, max {b['max']}, mean {b['mean']:.2f}, "
+              f"stdev {b['stdev']:.2f}, Jain index {b['jain']:.3f}")
+
+# --- MAIN ---
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        conn = chatdb.connect()
+
+        router = load_router(conn, args.capacity, args.statuses, args.at, with_loads=not args.simulate)
+        conn.rollback()
+        on_shift = sum(1 for a in router.agents.values() if a.on_shift)
+        print(f"✅ Loaded {len(router.agents)} routable agents, {on_shift} on shift")
+
+        if args.simulate:
+            print_simulation("Heap router", simulate(router, args.simulate, args.fill, args.seed))
+            if args.compare:
+                scan = load_router(conn, args.capacity, args.statuses, args.at, with_loads=False,
+                                   router_class=ScanRouter)
+                conn.rollback()
+                print_simulation("Linear scan", simulate(scan, args.simulate, args.fill, args.seed))
+        else:
+            start = time.perf_counter()
+            assigned, unassigned = route_open_conversations(conn, router, args.batch_size)
+            print(f"✅ Assigned {assigned} open conversations in {time.perf_counter() - start:.2f}s"
+                  + (f"; {unassigned} left waiting (no agent on shift with spare capacity)" if unassigned else ""))
+            b = balance(router.loads())
+            if b["agents"]:
+                print(f"📊 Load over {b['agents']} agents: min {b['min']}, max {b['max']}, mean {b['mean']:.2f}")
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+    finally:
+        if 'conn' in locals() and conn:
+            conn.close()
@@ -0,0 +1,97 @@
+import json
+import os
+from functools import lru_cache
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# --- CONFIG ---
+DEFAULT_ARCHIVE_DIR = os.environ.get(
+    "CHAT_ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "archive"))
+COMPRESSION = "zstd"
+ROW_GROUP_SIZE = 2000  # rows decoded to read one archived conversation, at most two groups' worth
+
+# Messages in a chunk are sorted by (conversation_id, created_at, message_id), so each
+# conversation is one contiguous run of rows; content is the JSON text of messages.content.
+SCHEMA = pa.schema([
+    ("message_id", pa.int32()),
+    ("conversation_id", pa.int32()),
+    ("user_id", pa.int32()),
+    ("content", pa.string()),
+    ("created_at", pa.timestamp("us")),
+])
+
+ARCHIVED_SQL = """
+    SELECT conversation_id, status_id, started_at, ended_at, first_message_at, last_message_at,
+           message_count, customer_message_count, agent_message_count, participants,
+           archive_file, row_offset, row_count
+    FROM archived_conversations
+    WHERE conversation_id = %s;
+"""
+
+# --- WRITING ---
+def write_chunk(directory, name, rows):
+    """Write message rows to `directory`/`name` and return {conversation_id: (row_offset, row_count)}.
+
+    `rows` are (message_id, conversation_id, user_id, content JSON, created_at)
+    tuples in chunk order. The file is written under a temporary name, synced
+    and renamed, so a chunk is either complete on disk or absent.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    columns = list(zip(*rows)) if rows else [[] for _ in SCHEMA]
+    table = pa.table({f.name: pa.array(c, type=f.type) for f, c in zip(SCHEMA, columns)})
+    pq.write_table(table, tmp, compression=COMPRESSION, row_group_size=ROW_GROUP_SIZE)
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+    offsets = {}
+    for offset, conversation_id in enumerate(columns[1]):
+        start, count = offsets.get(conversation_id, (offset, 0))
+        offsets[conversation_id] = (start, count + 1)
+    return offsets
+
+# --- READING ---
+@lru_cache(maxsize=64)
+def read_rows(path, row_offset, row_count):
+    """Rows [row_offset, row_offset + row_count) of a chunk, decoding only the row groups they span.
+
+    Chunks never change once written, so results are cached per process.
+    """
+    parquet = pq.ParquetFile(path)
+    groups, first_row, start = [], None, 0
+    for index in range(parquet.num_row_groups):
+        size = parquet.metadata.row_group(index).num_rows
+        if start + size > row_offset and start < row_offset + row_count:
+            groups.append(index)
+            first_row = start if first_row is None else first_row
+        start += size
+    if not groups:
+        return ()
+    table = parquet.read_row_groups(groups).slice(row_offset - first_row, row_count)
+    return tuple(zip(*(table.column(name).to_pylist() for name in SCHEMA.names)))
+
+def archived_conversation(conn, conversation_id, directory=DEFAULT_ARCHIVE_DIR):
+    """An archived conversation as a dict, or None if `conversation_id` is not archived.
+
+    Holds the conversation's columns, its participants, and "messages": a list of
+    (message_id, user_id, content dict, created_at) tuples in transcript order.
+    """
+    with conn.cursor() as cur:
+        cur.execute(ARCHIVED_SQL, (conversation_id,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        conversation = dict(zip([col.name for col in cur.description], row))
+    rows = read_rows(os.path.join(directory, conversation.pop("archive_file")),
+                     conversation.pop("row_offset"), conversation.pop("row_count"))
+    conversation["messages"] = [(message_id, user_id, json.loads(content), created_at)
+                                for message_id, _, user_id, content, created_at in rows]
+    return conversation
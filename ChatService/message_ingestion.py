@@ -0,0 +1,327 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatdb
+
+# --- CONFIG ---
+DEFAULT_LANES = 2             # concurrent writers (and pooled connections)
+DEFAULT_MAX_BATCH = 500       # messages per group commit
+DEFAULT_MAX_DELAY = 0.005     # seconds a message may wait for its batch to fill
+DEFAULT_MAX_QUEUE = 10000     # queued messages before producers are made to wait
+LATENCY_SAMPLES = 100000      # most recent append latencies kept for percentiles
+
+# Each row carries its position in the batch. RETURNING cannot see it and does not promise
+# input order, so message_ids are drawn up front and the inserted rows are joined back on them.
+# clock_timestamp() is evaluated per row, so messages in one batch keep their order in time.
+INSERT_SQL = """
+    WITH batch AS (
+        SELECT ord, conversation_id, user_id, content,
+               nextval(pg_get_serial_sequence('messages', 'message_id')) AS message_id
+        FROM (VALUES %s) AS v (ord, conversation_id, user_id, content)
+        ORDER BY ord
+    ), inserted AS (
+        INSERT INTO messages (message_id, conversation_id, user_id, content, created_at)
+        SELECT message_id, conversation_id, user_id, content::jsonb, clock_timestamp()::timestamp
+        FROM batch
+        ORDER BY ord
+        RETURNING message_id, created_at
+    )
+    SELECT batch.ord, inserted.message_id, batch.conversation_id, batch.user_id, inserted.created_at
+    FROM inserted JOIN batch USING (message_id)
+"""
+INSERT_TEMPLATE = "(%s, %s, %s, %s)"
+
+# --- HELPERS ---
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def encode_content(content):
+    """Messages store JSON; plain strings are wrapped as {"text": ...} like the populate scripts do."""
+    return json.dumps(content if isinstance(content, dict) else {"text": content})
+
+# --- INGESTOR ---
+class MessageIngestor:
+    """Accepts append_message() calls from many coroutines and writes them in group commits.
+
+    Messages are routed to one of `lanes` writer queues by conversation_id, so
+    each conversation's messages are committed in the order they were appended.
+    A lane flushes when `max_batch` messages are waiting or the oldest has waited
+    `max_delay` seconds. When a lane's queue is full, append_message() waits.
+    """
+
+    def __init__(self, lanes=DEFAULT_LANES, max_batch=DEFAULT_MAX_BATCH,
+                 max_delay=DEFAULT_MAX_DELAY, max_queue=DEFAULT_MAX_QUEUE):
+        self.lanes = lanes
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_queue = max_queue
+        self.commit_hooks = []
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.committed = 0
+        self.batches = 0
+        self.started_at = None
+        self._queues = []
+        self._tasks = []
+
+    # -- lifecycle --
+    async def start(self):
+        self._pool = chatdb.create_pool(1, self.lanes)
+        self._executor = ThreadPoolExecutor(max_workers=self.lanes)
+        self._queues = [asyncio.Queue(maxsize=max(1, self.max_queue // self.lanes)) for _ in range(self.lanes)]
+        self._tasks = [asyncio.create_task(self._run_lane(q)) for q in self._queues]
+        self.started_at = time.perf_counter()
+        return self
+
+    async def close(self):
+        """Flush everything already queued, then stop the writers and release connections."""
+        for queue in self._queues:
+            await queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+        self._pool.closeall()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def add_commit_hook(self, hook):
+        """Call `hook(rows)` on the event loop after each commit.
+
+        `rows` is a list of (message_id, conversation_id, user_id, created_at) tuples.
+        """
+        self.commit_hooks.append(hook)
+
+    # -- producers --
+    async def append_message(self, conversation_id, user_id, content):
+        """Queue one message and wait until it is committed. Returns (message_id, created_at)."""
+        future = asyncio.get_running_loop().create_future()
+        item = ((conversation_id, user_id, encode_content(content)), future, time.perf_counter())
+        await self._queues[conversation_id % self.lanes].put(item)
+        return await future
+
+    # -- writers --
+    async def _next_batch(self, queue):
+        batch = [await queue.get()]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run_lane(self, queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch(queue)
+            rows = [row for row, _, _ in batch]
+            try:
+                try:
+                    results = await loop.run_in_executor(self._executor, self._write_batch, rows)
+                except Exception:
+                    # One bad row fails the whole statement; retry row by row so only it fails
+                    results = await loop.run_in_executor(self._executor, self._write_each, rows)
+                self._finish(batch, results)
+            except Exception as e:
+                # Even the retry failed (e.g. no connection): fail what is still waiting, keep the lane alive
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    def _finish(self, batch, results):
+        now = time.perf_counter()
+        committed = []
+        for (_, future, enqueued_at), result in zip(batch, results):
+            if isinstance(result, Exception):
+                if not future.done():
+                    future.set_exception(result)
+                continue
+            committed.append(result)
+            self.latencies.append(now - enqueued_at)
+            if not future.done():
+                future.set_result((result[0], result[3]))
+        self.committed += len(committed)
+        self.batches += 1
+        for hook in self.commit_hooks:
+            try:
+                hook(committed)
+            except Exception as e:
+                print(f"⚠️  Commit hook {getattr(hook, '__name__', hook)} failed: {e}")
+
+    def _write_batch(self, rows):
+        """Insert rows in one statement and transaction; results come back in the order of `rows`."""
+        conn = self._pool.getconn()
+        try:
+            with conn, conn.cursor() as cur:
+                returned = execute_values(cur, INSERT_SQL, [(ord, *row) for ord, row in enumerate(rows)],
+                                          template=INSERT_TEMPLATE, page_size=len(rows), fetch=True)
+        finally:
+            self._pool.putconn(conn, close=conn.closed != 0)
+        results = [RuntimeError("message was not returned by the batch insert")] * len(rows)
+        for ord, *result in returned:
+            results[ord] = tuple(result)
+        return results
+
+    def _write_each(self, rows):
+        """Insert rows one transaction each with the prepared single-row statement."""
+        results = []
+        conn = self._pool.getconn()
+        try:
+            for conversation_id, user_id, content in rows:
+                try:
+                    with conn:
+                        cur = chatdb.execute(conn, "chatdb_insert_message",
+                                             (conversation_id, user_id, content, None))
+                        message_id, created_at = cur.fetchone()
+                        results.append((message_id, conversation_id, user_id, created_at))
+                except Exception as e:
+                    results.append(e)
+        finally:
+            self._pool.putconn(conn, close=conn.closed != 0)
+        return results
+
+    # -- reporting --
+    def stats(self):
+        """Append latency percentiles (ms) and throughput since start()."""
+        ordered = sorted(self.latencies)
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0
+        return {
+            "messages": self.committed,
+            "batches": self.batches,
+            "avg_batch": self.committed / self.batches if self.batches else 0,
+            "p50_ms": percentile(ordered, 50) * 1000,
+            "p99_ms": percentile(ordered, 99) * 1000,
+            "msgs_per_sec": self.committed / elapsed if elapsed > 0 else 0,
+        }
+
+# --- DEMO ---
+def create_targets(count):
+    """Open `count` new conversations for the demo, and pick the customers and agents to write as."""
+    conn = chatdb.connect()
+    try:
+        with conn:
+            customers = chatdb.users_with_role(conn, chatdb.role_id(conn, "Customer"))
+            agents = chatdb.users_with_role(conn, chatdb.role_id(conn, "Agent"))
+            if not customers or not agents:
+                raise RuntimeError("no customers/agents to write as; populate the database first")
+            open_status = chatdb.status_id(conn, "open")
+            conversations = [chatdb.insert_conversation(conn, open_status) for _ in range(count)]
+        return conversations, customers + agents
+    finally:
+        conn.close()
+
+def delete_conversations(conversation_ids):
+    """Remove what the demo wrote (messages and participants go with their conversation)."""
+    conn = chatdb.connect()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM conversations WHERE conversation_id = ANY(%s);", (list(conversation_ids),))
+            return cur.rowcount
+    finally:
+        conn.close()
+
+def run_row_by_row(conversations, users, total):
+    """Baseline: one INSERT and commit per message, like insert_message() in the populate scripts."""
+    conn = chatdb.connect()
+    latencies = []
+    start = time.perf_counter()
+    try:
+        for i in range(total):
+            t0 = time.perf_counter()
+            with conn, conn.cursor() as cur:
+                cur.execute("INSERT INTO messages (conversation_id, user_id, content) VALUES (%s, %s, %s);",
+                            (random.choice(conversations), random.choice(users), encode_content(f"demo {i}")))
+            latencies.append(time.perf_counter() - t0)
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {"messages": total, "p50_ms": percentile(latencies, 50) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000, "msgs_per_sec": total / elapsed}
+
+async def run_demo(args, conversations, users):
+    ingestor = MessageIngestor(lanes=args.lanes, max_batch=args.max_batch,
+                               max_delay=args.max_delay_ms / 1000, max_queue=args.max_queue)
+
+    async def producer(index):
+        rng = random.Random(index)
+        for i in range(args.messages):
+            await ingestor.append_message(rng.choice(conversations), rng.choice(users), f"demo {index}-{i}")
+
+    async with ingestor:
+        await asyncio.gather(*(producer(i) for i in range(args.producers)))
+    return ingestor.stats()
+
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load-test group-commit message ingestion against the local database.")
+    parser.add_argument("--producers", type=int, default=100, help="Concurrent producer coroutines.")
+    parser.add_argument("--messages", type=int, default=100, help="Messages appended by each producer.")
+    parser.add_argument("--lanes", type=int, default=DEFAULT_LANES, help="Concurrent writers / pooled connections.")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="Messages per group commit.")
+    parser.add_argument("--max-delay-ms", type=float, default=DEFAULT_MAX_DELAY * 1000,
+                        help="Longest a message waits for its batch to fill.")
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE,
+                        help="Queued messages before producers are made to wait.")
+    parser.add_argument("--conversations", type=int, default=100,
+                        help="New open conversations the demo writes into.")
+    parser.add_argument("--compare", action="store_true",
+                        help="Also time one INSERT+commit per message for the same number of messages.")
+    parser.add_argument("--cleanup", action="store_true",
+                        help="Delete the conversations (and messages) written by the demo afterwards.")
+    return parser.parse_args()
+
+def print_stats(label, stats):
+    print(f"⏱️  {label}: {stats['messages']} messages, {stats['msgs_per_sec']:,.0f} msgs/sec, "
+          f"p50 {stats['p50_ms']:.2f}ms, p99 {stats['p99_ms']:.2f}ms"
+          + (f", avg batch {stats['avg_batch']:.1f}" if "avg_batch" in stats else ""))
+
+# --- MAIN ---
+if __name__ == "__main__":
+    args = parse_args()
+    conversations = []
+    try:
+        if args.conversations < 1:
+            raise ValueError("--conversations must be at least 1")
+        conversations, users = create_targets(args.conversations)
+        print(f"💬 Writing into {len(conversations)} new open conversations "
+              f"(#{conversations[0]}-#{conversations[-1]})")
+
+        print_stats("Group commit", asyncio.run(run_demo(args, conversations, users)))
+        if args.compare:
+            print_stats("Row by row", run_row_by_row(conversations, users, args.producers * args.messages))
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+    finally:
+        if args.cleanup and conversations:
+            print(f"🧹 Deleted {delete_conversations(conversations)} conversations written by the demo")
@@ -0,0 +1,266 @@
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatdb
+
+# --- CONFIG ---
+DEFAULT_LIMIT = 20
+TEXT_SEARCH_CONFIG = "english"  # must match the search_vector expression in 13_add_message_search.sql
+ORDERS = {
+    # order name: (sort expression in `matches`, SQL type of its cursor value)
+    "rank": ("rank", "real"),
+    "recent": ("created_at", "timestamp"),
+}
+
+# Matching messages, before ordering and paging. {joins}/{filters} come from _filters().
+MATCHES_SQL = """
+    SELECT m.message_id, m.conversation_id, m.user_id, m.created_at,
+           ts_rank_cd(m.search_vector, q.query) AS rank
+    FROM messages m
+    CROSS JOIN websearch_to_tsquery('{config}', %(query)s) AS q(query)
+    {joins}
+    WHERE m.search_vector @@ q.query
+      {filters}
+"""
+
+# One page of messages; the headline is only built for the rows on the page
+MESSAGES_SQL = """
+    WITH matches AS ({matches}),
+    page AS (
+        SELECT * FROM matches
+        {after}
+        ORDER BY {sort} DESC, message_id DESC
+        LIMIT %(limit)s
+    )
+    SELECT p.message_id, p.conversation_id, p.user_id, u.name AS user_name, p.created_at, p.rank,
+           ts_headline('{config}', m.content->>'text', websearch_to_tsquery('{config}', %(query)s)) AS headline
+    FROM page p
+    JOIN messages m ON m.message_id = p.message_id AND m.created_at = p.created_at
+    JOIN users u ON u.user_id = p.user_id
+    ORDER BY p.{sort} DESC, p.message_id DESC;
+"""
+
+# One page of conversations, ranked by their best matching message
+CONVERSATIONS_SQL = """
+    WITH matches AS ({matches}),
+    grouped AS (
+        SELECT conversation_id, MAX(rank) AS rank, MAX(created_at) AS created_at, COUNT(*) AS matches
+        FROM matches
+        GROUP BY conversation_id
+    ),
+    page AS (
+        SELECT * FROM grouped
+        {after}
+        ORDER BY {sort} DESC, conversation_id DESC
+        LIMIT %(limit)s
+    )
+    SELECT p.conversation_id, p.rank, p.created_at AS last_match_at, p.matches,
+           s.name AS status, c.started_at, c.ended_at
+    FROM page p
+    JOIN conversations c ON c.conversation_id = p.conversation_id
+    JOIN status s ON s.status_id = c.status_id
+    ORDER BY p.{sort} DESC, p.conversation_id DESC;
+"""
+
+# The naive alternative: a substring scan of every message's text
+SCAN_PAGE_SQL = """
+    SELECT m.message_id, m.conversation_id, m.created_at
+    FROM messages m
+    WHERE m.content->>'text' ILIKE %(pattern)s
+    ORDER BY m.created_at DESC, m.message_id DESC
+    LIMIT %(limit)s;
+"""
+SCAN_COUNT_SQL = "SELECT COUNT(*) FROM messages m WHERE m.content->>'text' ILIKE %(pattern)s;"
+SEARCH_COUNT_SQL = f"""
+    SELECT COUNT(*) FROM messages m
+    WHERE m.search_vector @@ websearch_to_tsquery('{TEXT_SEARCH_CONFIG}', %(query)s);
+"""
+
+# --- HELPERS ---
+def _filters(conn, role, status, since, until):
+    """(joins, filters, params) for the optional role/status/date filters."""
+    joins, filters, params = [], [], {}
+    if role:
+        joins.append("JOIN users fu ON fu.user_id = m.user_id")
+        filters.append("AND fu.role_id = %(role_id)s")
+        params["role_id"] = chatdb.role_id(conn, role)
+    if status:
+        joins.append("JOIN conversations fc ON fc.conversation_id = m.conversation_id")
+        filters.append("AND fc.status_id = %(status_id)s")
+        params["status_id"] = chatdb.status_id(conn, status)
+    # Bounds on created_at also prune the monthly partitions
+    if since:
+        filters.append("AND m.created_at >= %(since)s")
+        params["since"] = since
+    if until:
+        filters.append("AND m.created_at < %(until)s")
+        params["until"] = until
+    return "\n    ".join(joins), "\n      ".join(filters), params
+
+def _page(conn, template, key, query, order, limit, after, role, status, since, until, renamed=None):
+    """Run one keyset page of `template`; returns (rows as dicts, cursor for the next page).
+
+    `renamed` maps sort columns to the names they are returned under.
+    """
+    if order not in ORDERS:
+        raise ValueError(f"order must be one of {', '.join(ORDERS)}")
+    sort, sort_type = ORDERS[order]
+    joins, filters, params = _filters(conn, role, status, since, until)
+    params.update(query=query, limit=limit)
+    after_sql = ""
+    if after is not None:
+        # The cursor value is cast back to the sort column's type, so a real rank
+        # compares equal to itself after the round trip through Python.
+        after_sql = f"WHERE ({sort}, {key}) < (%(after_value)s::{sort_type}, %(after_id)s)"
+        params["after_value"], params["after_id"] = after
+    sql = template.format(matches=MATCHES_SQL.format(config=TEXT_SEARCH_CONFIG, joins=joins, filters=filters),
+                          config=TEXT_SEARCH_CONFIG, sort=sort, after=after_sql)
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+        columns = [col.name for col in cur.description]
+        rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+    column = (renamed or {}).get(sort, sort)
+    next_cursor = (rows[-1][column], rows[-1][key]) if len(rows) == limit else None
+    return rows, next_cursor
+
+# --- SEARCH API ---
+def search_messages(conn, query, role=None, status=None, since=None, until=None,
+                    order="rank", limit=DEFAULT_LIMIT, after=None):
+    """Messages matching `query` (web search syntax: words, "phrases", OR, -word).
+
+    Optional filters: author role name, conversation status name, and a
+    [since, until) range on created_at. `order` is "rank" (ts_rank_cd, best
+    first) or "recent". Returns (rows, cursor); pass the cursor back as `after`
+    for the next page, until it is None.
+    """
+    return _page(conn, MESSAGES_SQL, "message_id", query, order, limit, after, role, status, since, until)
+
+def search_conversations(conn, query, role=None, status=None, since=None, until=None,
+                         order="rank", limit=DEFAULT_LIMIT, after=None):
+    """Conversations with messages matching `query`, by their best match (or latest, for "recent").
+
+    Takes the same filters as search_messages(); each row carries the number of
+    matching messages. Returns (rows, cursor).
+    """
+    return _page(conn, CONVERSATIONS_SQL, "conversation_id", query, order, limit, after,
+                 role, status, since, until, renamed={"created_at": "last_match_at"})
+
+# --- BENCHMARK ---
+def sample_terms(conn, sample_rows=5000):
+    """A common, a middling and a rare word from a sample of message text."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT content->>'text' FROM messages TABLESAMPLE SYSTEM (1) LIMIT %s;", (sample_rows,))
+        words = Counter(w for (text,) in cur.fetchall() for w in re.findall(r"[a-z]{5,}", (text or "").lower()))
+    ranked = [w for w, _ in words.most_common()]
+    if not ranked:
+        raise RuntimeError("no message text to sample terms from; populate the database first")
+    return [ranked[0], ranked[len(ranked) // 2], ranked[-1]]
+
+def _timed(conn, sql, params, repeat):
+    """Median wall time (seconds) of `repeat` runs, and the last run's rows."""
+    times = []
+    with conn.cursor() as cur:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+            times.append(time.perf_counter() - start)
+    return statistics.median(times), rows
+
+def benchmark(conn, terms, limit=DEFAULT_LIMIT, repeat=5):
+    """Time the first ranked page and the match count via the GIN index against an ILIKE scan."""
+    results = []
+    for term in terms:
+        start_times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            search_messages(conn, term, limit=limit)
+            start_times.append(time.perf_counter() - start)
+        search_count_time, search_count = _timed(conn, SEARCH_COUNT_SQL, {"query": term}, repeat)
+        text = term.strip('"')  # phrase quotes are search syntax, not message text
+        pattern = {"pattern": f"%{text}%", "limit": limit}
+        scan_page_time, _ = _timed(conn, SCAN_PAGE_SQL, pattern, repeat)
+        scan_count_time, scan_count = _timed(conn, SCAN_COUNT_SQL, pattern, repeat)
+        results.append({
+            "term": term,
+            "search_matches": search_count[0][0], "scan_matches": scan_count[0][0],
+            "search_page_ms": statistics.median(start_times) * 1000,
+            "scan_page_ms": scan_page_time * 1000,
+            "search_count_ms": search_count_time * 1000,
+            "scan_count_ms": scan_count_time * 1000,
+        })
+    conn.rollback()
+    return results
+
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Search message text, or benchmark full-text search against an ILIKE scan.")
+    parser.add_argument("query", nargs="?", help='Search terms, e.g. \'refund -"gift card"\'.')
+    parser.add_argument("--conversations", action="store_true", help="List matching conversations instead of messages.")
+    parser.add_argument("--role", help="Only messages written by this role (e.g. Customer, Agent).")
+    parser.add_argument("--status", help="Only conversations with this status (e.g. open, closed).")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Only messages created at or after this time.")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="Only messages created before this time.")
+    parser.add_argument("--order", choices=list(ORDERS), default="rank", help="Best matches or most recent first.")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help="Results per page.")
+    parser.add_argument("--pages", type=int, default=1, help="Pages to fetch by following the cursor.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Compare index-backed search with a naive ILIKE scan.")
+    parser.add_argument("--terms", nargs="+", help="Terms to benchmark (default: sampled from the data).")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per benchmark query (median is reported).")
+    return parser.parse_args()
+
+def print_page(number, rows, conversations, elapsed):
+    print(f"🔎 Page {number}: {len(rows)} results in {elapsed * 1000:.1f}ms")
+    for row in rows:
+        if conversations:
+            print(f"   #{row['conversation_id']} [{row['status']}] rank {row['rank']:.3f}, "
+                  f"{row['matches']} match(es), last at {row['last_match_at']:%Y-%m-%d %H:%M}")
+        else:
+            print(f"   #{row['conversation_id']}/{row['message_id']} {row['created_at']:%Y-%m-%d %H:%M} "
+                  f"{row['user_name']} (rank {row['rank']:.3f}): {row['headline']}")
+
+def print_benchmark(results):
+    print(f"{'term':<16}{'matches (fts/ilike)':>22}{'page fts':>12}{'page ilike':>12}"
+          f"{'count fts':>12}{'count ilike':>13}")
+    for r in results:
+        print(f"{r['term']:<16}{r['search_matches']:>11,} / {r['scan_matches']:<9,}"
+              f"{r['search_page_ms']:>10.1f}ms{r['scan_page_ms']:>10.1f}ms"
+              f"{r['search_count_ms']:>10.1f}ms{r['scan_count_ms']:>11.1f}ms")
+
+# --- MAIN ---
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        conn = chatdb.connect()
+
+        if args.benchmark:
+            terms = args.terms or sample_terms(conn)
+            print(f"⏱️  Benchmarking {', '.join(terms)} (median of {args.repeat} runs)")
+            print_benchmark(benchmark(conn, terms, args.limit, args.repeat))
+        elif not args.query:
+            raise ValueError("give a search query or --benchmark")
+        else:
+            search = search_conversations if args.conversations else search_messages
+            cursor = None
+            for number in range(1, args.pages + 1):
+                start = time.perf_counter()
+                rows, cursor = search(conn, args.query, args.role, args.status, args.since, args.until,
+                                      args.order, args.limit, cursor)
+                print_page(number, rows, args.conversations, time.perf_counter() - start)
+                if cursor is None:
+                    break
+            conn.rollback()
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+    finally:
+        if 'conn' in locals() and conn:
+            conn.close()
@@ -0,0 +1,376 @@
+import argparse
+import bisect
+import json
+import math
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatdb
+
+# --- CONFIG ---
+WATERMARK = "agent_response_stats"
+DEFAULT_COMPRESSION = 200
+PERCENTILES = (0.5, 0.9, 0.99)
+
+# Agent reply gaps (seconds) for messages in (lo, hi]. The LAG only scans the
+# conversations those messages touch; `shards`/`shard` split them by conversation_id.
+GAPS_SQL = """
+    WITH touched AS (
+        SELECT DISTINCT conversation_id FROM messages
+        WHERE message_id > %(lo)s AND message_id <= %(hi)s
+          AND conversation_id %% %(shards)s = %(shard)s
+    ),
+    ordered AS (
+        SELECT m.message_id, m.user_id, m.created_at, u.role_id,
+               LAG(m.created_at) OVER w AS prev_time,
+               LAG(u.role_id) OVER w AS prev_role
+        FROM messages m
+        JOIN touched t ON t.conversation_id = m.conversation_id
+        JOIN users u ON u.user_id = m.user_id
+        WHERE m.message_id <= %(hi)s
+        WINDOW w AS (PARTITION BY m.conversation_id ORDER BY m.created_at)
+    )
+    SELECT user_id, EXTRACT(EPOCH FROM (created_at - prev_time))::float8
+    FROM ordered
+    WHERE message_id > %(lo)s
+      AND role_id = %(agent_role)s
+      AND prev_role = %(customer_role)s;
+"""
+
+# --- SKETCHES ---
+class Welford:
+    """Running count/mean/variance/min/max; two instances merge exactly (Chan et al.)."""
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, minimum=None, maximum=None):
+        self.count, self.mean, self.m2 = count, mean, m2
+        self.min, self.max = minimum, maximum
+
+    def update(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+
+    def update_many(self, values):
+        """Fold a batch in by summarising it with NumPy and merging the summary."""
+        values = np.asarray(values, dtype=float)
+        if len(values):
+            mean = float(values.mean())
+            self.merge(Welford(len(values), mean, float(((values - mean) ** 2).sum()),
+                               float(values.min()), float(values.max())))
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance)
+
+class TDigest:
+    """Merging t-digest (Dunning) for approximate quantiles in bounded space.
+
+    Centroids near the tails stay small, so p99 stays accurate; two digests merge
+    by pooling their centroids and compressing again.
+    """
+
+    def __init__(self, compression=DEFAULT_COMPRESSION, means=(), weights=(), minimum=None, maximum=None):
+        self.compression = compression
+        self.means = list(means)
+        self.weights = list(weights)
+        self.min, self.max = minimum, maximum
+        self._buffer = []
+
+    @property
+    def count(self):
+        return sum(self.weights) + sum(w for _, w in self._buffer)
+
+    def _k(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _k_inverse(self, k):
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def add(self, x, weight=1):
+        self._buffer.append((x, weight))
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+        if len(self._buffer) >= 5 * self.compression:
+            self.compress()
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=float)
+        if len(values):
+            self._buffer.extend(zip(values.tolist(), [1] * len(values)))
+            self.min = float(values.min()) if self.min is None else min(self.min, float(values.min()))
+            self.max = float(values.max()) if self.max is None else max(self.max, float(values.max()))
+            self.compress()
+
+    def merge(self, other):
+        other.compress()
+        self._buffer.extend(zip(other.means, other.weights))
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        self.compress()
+        return self
+
+    def compress(self):
+        if not self._buffer:
+            return
+        items = sorted(list(zip(self.means, self.weights)) + self._buffer)
+        self._buffer = []
+        total = sum(w for _, w in items)
+        means, weights = [], []
+        q0 = 0.0
+        limit = self._k_inverse(self._k(q0) + 1)
+        mean, weight = items[0]
+        for x, w in items[1:]:
+            if q0 + (weight + w) / total <= limit:
+                weight += w
+                mean += (x - mean) * w / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                q0 += weight / total
+                limit = self._k_inverse(self._k(q0) + 1)
+                mean, weight = x, w
+        means.append(mean)
+        weights.append(weight)
+        self.means, self.weights = means, weights
+
+    def quantile(self, q):
+        """Approximate q-quantile (0..1) by interpolating between centroid centres."""
+        self.compress()
+        if not self.means:
+            return None
+        if len(self.means) == 1:
+            return self.means[0]
+        total = sum(self.weights)
+        target = q * total
+        first, last = self.weights[0], self.weights[-1]
+        if target < first / 2:
+            return self.min + (self.means[0] - self.min) * target / (first / 2)
+        if target > total - last / 2:
+            return self.means[-1] + (self.max - self.means[-1]) * (target - (total - last / 2)) / (last / 2)
+        centres = np.cumsum(self.weights) - np.asarray(self.weights) / 2
+        i = bisect.bisect_right(centres.tolist(), target) - 1
+        i = min(max(i, 0), len(self.means) - 2)
+        frac = (target - centres[i]) / (centres[i + 1] - centres[i])
+        return float(self.means[i] + frac * (self.means[i + 1] - self.means[i]))
+
+    def to_dict(self):
+        self.compress()
+        return {"compression": self.compression, "min": self.min, "max": self.max,
+                "means": self.means, "weights": self.weights}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["compression"], d["means"], d["weights"], d["min"], d["max"])
+
+# --- PER-AGENT STATE ---
+class ResponseStats:
+    """Welford moments plus a t-digest for each agent, keyed by user_id. Mergeable."""
+
+    def __init__(self):
+        self.moments = {}
+        self.digests = {}
+
+    def _agent(self, user_id):
+        if user_id not in self.moments:
+            self.moments[user_id] = Welford()
+            self.digests[user_id] = TDigest()
+        return self.moments[user_id], self.digests[user_id]
+
+    def observe(self, user_id, seconds):
+        moments, digest = self._agent(user_id)
+        moments.update(seconds)
+        digest.add(seconds)
+
+    def observe_many(self, user_ids, seconds):
+        """Fold in parallel arrays of agent ids and gaps, one vectorized group per agent."""
+        user_ids = np.asarray(user_ids)
+        seconds = np.asarray(seconds, dtype=float)
+        order = np.argsort(user_ids, kind="stable")
+        agents, starts = np.unique(user_ids[order], return_index=True)
+        for agent, values in zip(agents, np.split(seconds[order], starts[1:])):
+            moments, digest = self._agent(int(agent))
+            moments.update_many(values)
+            digest.add_many(values)
+
+    def merge(self, other):
+        for user_id in other.moments:
+            moments, digest = self._agent(user_id)
+            moments.merge(other.moments[user_id])
+            digest.merge(other.digests[user_id])
+        return self
+
+    def agents(self):
+        return list(self.moments)
+
+    def to_dict(self):
+        return {str(u): {"moments": vars(self.moments[u]), "digest": self.digests[u].to_dict()}
+                for u in self.moments}
+
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls()
+        for user_id, state in d.items():
+            m = state["moments"]
+            stats.moments[int(user_id)] = Welford(m["count"], m["mean"], m["m2"], m["min"], m["max"])
+            stats.digests[int(user_id)] = TDigest.from_dict(state["digest"])
+        return stats
+
+# --- PERSISTENCE ---
+def load_state(conn, user_ids):
+    """Persisted state for `user_ids` (agents without a row start empty)."""
+    stats = ResponseStats()
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT user_id, response_count, mean_seconds, m2, min_seconds, max_seconds, digest
+            FROM agent_response_stats WHERE user_id = ANY(%s);
+        """, (list(user_ids),))
+        for user_id, count, mean, m2, minimum, maximum, digest in cur.fetchall():
+            stats.moments[user_id] = Welford(count, mean, m2, minimum, maximum)
+            stats.digests[user_id] = TDigest.from_dict(digest)
+    return stats
+
+def save_state(conn, stats):
+    """Upsert every agent in `stats`, refreshing the percentile columns from its digest."""
+    rows = []
+    for user_id in stats.agents():
+        m, digest = stats.moments[user_id], stats.digests[user_id]
+        rows.append((user_id, m.count, m.mean, m.m2, m.min, m.max,
+                     *(digest.quantile(q) for q in PERCENTILES), json.dumps(digest.to_dict())))
+    with conn.cursor() as cur:
+        execute_values(cur, """
+            INSERT INTO agent_response_stats (user_id, response_count, mean_seconds, m2, min_seconds,
+                                              max_seconds, p50_seconds, p90_seconds, p99_seconds, digest)
+            VALUES %s
+            ON CONFLICT (user_id) DO UPDATE SET
+                response_count = EXCLUDED.response_count, mean_seconds = EXCLUDED.mean_seconds,
+                m2 = EXCLUDED.m2, min_seconds = EXCLUDED.min_seconds, max_seconds = EXCLUDED.max_seconds,
+                p50_seconds = EXCLUDED.p50_seconds, p90_seconds = EXCLUDED.p90_seconds,
+                p99_seconds = EXCLUDED.p99_seconds, digest = EXCLUDED.digest, updated_at = NOW();
+        """, rows)
+
+# --- UPDATES ---
+def gap_stats(conn, lo, hi, shards=1, shard=0):
+    """ResponseStats for the agent reply gaps of messages in (lo, hi] (one shard of conversations)."""
+    params = {"lo": lo, "hi": hi, "shards": shards, "shard": shard,
+              "agent_role": chatdb.role_id(conn, "Agent"),
+              "customer_role": chatdb.role_id(conn, "Customer")}
+    with conn.cursor() as cur:
+        cur.execute(GAPS_SQL, params)
+        rows = cur.fetchall()
+    stats = ResponseStats()
+    if rows:
+        user_ids, seconds = zip(*rows)
+        stats.observe_many(user_ids, seconds)
+    return stats, len(rows)
+
+def _shard_worker(job):
+    lo, hi, shards, shard = job
+    conn = chatdb.connect()
+    try:
+        stats, gaps = gap_stats(conn, lo, hi, shards, shard)
+        conn.rollback()
+        return stats.to_dict(), gaps
+    finally:
+        conn.close()
+
+def update_response_stats(conn, workers=1):
+    """Fold every message written since the last update into agent_response_stats.
+
+    Holds a SHARE lock on messages so no message below the new watermark can
+    still appear. With `workers` > 1 the gaps are computed per conversation shard
+    in separate processes and their states merged. Returns the number of gaps added.
+    """
+    with conn, conn.cursor() as cur:
+        cur.execute("LOCK TABLE messages IN SHARE MODE;")
+        cur.execute("INSERT INTO report_watermarks (name) VALUES (%s) ON CONFLICT (name) DO NOTHING;",
+                    (WATERMARK,))
+        cur.execute("SELECT last_message_id FROM report_watermarks WHERE name = %s FOR UPDATE;", (WATERMARK,))
+        lo = cur.fetchone()[0]
+        cur.execute("SELECT MAX(message_id) FROM messages WHERE message_id > %s;", (lo,))
+        hi = cur.fetchone()[0]
+        if hi is None:
+            return 0
+
+        if workers > 1:
+            # Rows up to `hi` are committed and, under our lock, final, so workers can read them
+            with Pool(workers) as pool:
+                results = pool.map(_shard_worker, [(lo, hi, workers, i) for i in range(workers)])
+            delta = ResponseStats()
+            for state, _ in results:
+                delta.merge(ResponseStats.from_dict(state))
+            gaps = sum(n for _, n in results)
+        else:
+            delta, gaps = gap_stats(conn, lo, hi)
+
+        state = load_state(conn, delta.agents())
+        save_state(conn, state.merge(delta))
+        cur.execute("UPDATE report_watermarks SET last_message_id = %s, refreshed_at = NOW() WHERE name = %s;",
+                    (hi, WATERMARK))
+    return gaps
+
+def reset_response_stats(conn):
+    """Drop all persisted state so the next update rebuilds it from the first message."""
+    with conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM agent_response_stats;")
+        cur.execute("DELETE FROM report_watermarks WHERE name = %s;", (WATERMARK,))
+
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Update per-agent response-time statistics from new messages.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Compute gaps in N processes (by conversation) and merge their states.")
+    parser.add_argument("--rebuild", action="store_true", help="Discard the saved state and start over.")
+    parser.add_argument("--follow", type=float, default=None,
+                        help="Keep running, updating every N seconds.")
+    return parser.parse_args()
+
+# --- MAIN ---
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        conn = chatdb.connect()
+        if args.rebuild:
+            reset_response_stats(conn)
+            print("✅ Cleared saved response-time statistics")
+
+        while True:
+            start = time.perf_counter()
+            gaps = update_response_stats(conn, args.workers)
+            print(f"✅ Folded {gaps} new agent responses in {time.perf_counter() - start:.2f}s")
+            if args.follow is None:
+                break
+            time.sleep(args.follow)
+
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"❌ Error: {e}")
+    finally:
+        if 'conn' in locals() and conn:
+            conn.close()
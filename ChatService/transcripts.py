@@ -0,0 +1,253 @@
+import argparse
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatdb
+from ChatService.conversation_archive import DEFAULT_ARCHIVE_DIR, archived_conversation
+from ChatService.message_ingestion import percentile
+
+# --- CONFIG ---
+DEFAULT_PAGE_SIZE = 50
+DEFAULT_CACHE_SIZE = 1000  # conversations kept in the transcript cache
+
+# The first page starts after (-infinity, 0). Served by idx_messages_conversation_created
+# (14_add_transcript_index.sql) as a range scan, however deep the page is.
+PAGE_STATEMENT = "transcripts_page"
+PAGE_SQL = """
+    SELECT message_id, user_id, content, created_at
+    FROM messages
+    WHERE conversation_id = $1
+      AND (created_at, message_id) > ($2::timestamp, $3::int)
+    ORDER BY created_at, message_id
+    LIMIT $4
+"""
+FIRST_KEY = ("-infinity", 0)
+
+# What transcripts looked like without this module: OFFSET paging with the sender joined in
+OFFSET_SQL = """
+    SELECT m.message_id, m.user_id, u.name, r.name, m.content, m.created_at
+    FROM messages m
+    JOIN users u ON u.user_id = m.user_id
+    JOIN role r ON r.role_id = u.role_id
+    WHERE m.conversation_id = %s
+    ORDER BY m.created_at, m.message_id
+    OFFSET %s LIMIT %s;
+"""
+
+# --- USERS ---
+class UserDirectory:
+    """Process-wide cache of sender names and roles, filled in bulk for the ids a page needs.
+
+    Names change rarely; call forget() after users are edited.
+    """
+
+    def __init__(self):
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, conn, user_ids):
+        """{user_id: (name, role name)} for `user_ids`, reading only the ones not cached yet."""
+        missing = {uid for uid in user_ids if uid not in self._users}
+        if missing:
+            roles = {rid: name for name, rid in chatdb.role_ids(conn).items()}
+            found = {uid: (name, roles.get(rid)) for uid, (name, rid) in chatdb.user_profiles(conn, missing).items()}
+            with self._lock:
+                self._users.update(found)
+        return {uid: self._users.get(uid, (None, None)) for uid in user_ids}
+
+    def forget(self, user_ids=None):
+        with self._lock:
+            if user_ids is None:
+                self._users.clear()
+            else:
+                for uid in user_ids:
+                    self._users.pop(uid, None)
+
+# --- TRANSCRIPTS ---
+class TranscriptStore:
+    """Reads conversations back in time order, a keyset page at a time, through an LRU cache.
+
+    Pages are cached per conversation for the `cache_size` most recently read
+    conversations. Appending to a conversation must invalidate it: register
+    on_commit() with MessageIngestor.add_commit_hook(), or call invalidate().
+    A read that raced with an invalidation is returned but not cached.
+    Conversations moved out by archive_conversations.py are read from `archive_dir`.
+    """
+
+    def __init__(self, pool=None, cache_size=DEFAULT_CACHE_SIZE, users=None, archive_dir=DEFAULT_ARCHIVE_DIR):
+        self.pool = pool or chatdb.get_pool()
+        self.cache_size = cache_size
+        self.users = users or UserDirectory()
+        self.archive_dir = archive_dir
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()  # conversation_id -> {(after, limit): (messages, cursor)}
+        self._versions = {}          # conversation_id -> invalidation count
+        self._lock = threading.Lock()
+
+    def page(self, conversation_id, after=None, limit=DEFAULT_PAGE_SIZE):
+        """Up to `limit` messages of `conversation_id` after the cursor `after`, oldest first.
+
+        Each message is a dict with message_id, user_id, sender, role, content and
+        created_at. Returns (messages, cursor); pass the cursor back as `after` for
+        the next page, until it is None. Treat the returned messages as read-only.
+        """
+        key = (after, limit)
+        with self._lock:
+            pages = self._cache.get(conversation_id)
+            if pages is not None and key in pages:
+                self._cache.move_to_end(conversation_id)
+                self.hits += 1
+                return pages[key]
+            self.misses += 1
+            version = self._versions.get(conversation_id, 0)
+
+        result = self._read(conversation_id, after, limit)
+
+        with self._lock:
+            if self._versions.get(conversation_id, 0) == version:
+                self._cache.setdefault(conversation_id, {})[key] = result
+                self._cache.move_to_end(conversation_id)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+    def transcript(self, conversation_id, page_size=DEFAULT_PAGE_SIZE):
+        """Every message of `conversation_id`, read page by page."""
+        messages, cursor = self.page(conversation_id, None, page_size)
+        messages = list(messages)
+        while cursor is not None:
+            more, cursor = self.page(conversation_id, cursor, page_size)
+            messages.extend(more)
+        return messages
+
+    def invalidate(self, conversation_ids):
+        """Drop cached pages of `conversation_ids` (after messages were appended to them)."""
+        with self._lock:
+            for conversation_id in conversation_ids:
+                self._cache.pop(conversation_id, None)
+                self._versions[conversation_id] = self._versions.get(conversation_id, 0) + 1
+
+    def on_commit(self, rows):
+        """MessageIngestor commit hook: rows are (message_id, conversation_id, user_id, created_at)."""
+        self.invalidate({row[1] for row in rows})
+
+    def _read(self, conversation_id, after, limit):
+        created_after, id_after = after or FIRST_KEY
+        conn = self.pool.getconn()
+        try:
+            with conn:
+                rows = conn.execute_prepared(PAGE_STATEMENT, PAGE_SQL,
+                                             (conversation_id, created_after, id_after, limit)).fetchall()
+                if not rows:
+                    rows = self._read_archived(conn, conversation_id, after, limit)
+                senders = self.users.resolve(conn, {row[1] for row in rows})
+        finally:
+            self.pool.putconn(conn, close=conn.closed != 0)
+
+        messages = [
+            {"message_id": message_id, "user_id": user_id, "sender": senders[user_id][0],
+             "role": senders[user_id][1], "content": content, "created_at": created_at}
+            for message_id, user_id, content, created_at in rows
+        ]
+        cursor = (rows[-1][3], rows[-1][0]) if len(rows) == limit else None
+        return messages, cursor
+
+    def _read_archived(self, conn, conversation_id, after, limit):
+        """The same page from the archive, or [] if the conversation is not archived."""
+        archived = archived_conversation(conn, conversation_id, self.archive_dir)
+        if archived is None:
+            return []
+        messages = archived["messages"]
+        start = 0
+        if after is not None:
+            start = bisect.bisect_right([(created_at, message_id) for message_id, _, _, created_at in messages],
+                                        tuple(after))
+        return messages[start:start + limit]
+
+# --- BENCHMARK ---
+def sample_conversations(conn, count, min_messages=1):
+    """Ids of up to `count` random conversations with at least `min_messages` messages."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT conversation_id FROM conversations WHERE message_count >= %s "
+                    "ORDER BY random() LIMIT %s;", (min_messages, count))
+        return [row[0] for row in cur.fetchall()]
+
+def timed_reads(read, conversation_ids):
+    """p50/p99/mean milliseconds of `read(conversation_id)` over `conversation_ids`."""
+    times = []
+    for conversation_id in conversation_ids:
+        start = time.perf_counter()
+        read(conversation_id)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return {"p50_ms": percentile(times, 50), "p99_ms": percentile(times, 99), "mean_ms": sum(times) / len(times)}
+
+def benchmark(store, conversation_ids, page_size):
+    """Latency of reading whole transcripts: OFFSET pages with joins, then cold and warm store reads."""
+    conn = store.pool.getconn()
+    try:
+        def offset_read(conversation_id):
+            offset = 0
+            with conn.cursor() as cur:
+                while True:
+                    cur.execute(OFFSET_SQL, (conversation_id, offset, page_size))
+                    fetched = cur.rowcount
+                    offset += fetched
+                    if fetched < page_size:
+                        return
+        results = {"offset + joins": timed_reads(offset_read, conversation_ids)}
+        conn.rollback()
+    finally:
+        store.pool.putconn(conn)
+
+    def store_read(conversation_id):
+        store.transcript(conversation_id, page_size)
+    results["store (cold)"] = timed_reads(store_read, conversation_ids)
+    results["store (cached)"] = timed_reads(store_read, conversation_ids)
+    return results
+
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Print a conversation transcript, or benchmark transcript reads.")
+    parser.add_argument("conversation_id", type=int, nargs="?", help="Conversation to print.")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="Messages per page.")
+    parser.add_argument("--benchmark", type=int, metavar="N",
+                        help="Time reading N random transcripts instead of printing one.")
+    parser.add_argument("--min-messages", type=int, default=1,
+                        help="With --benchmark, only sample conversations with at least this many messages.")
+    return parser.parse_args()
+
+# --- MAIN ---
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        store = TranscriptStore(cache_size=max(DEFAULT_CACHE_SIZE, args.benchmark or 0))
+
+        if args.benchmark:
+            with chatdb.pooled() as conn:
+                ids = sample_conversations(conn, args.benchmark, args.min_messages)
+                conn.rollback()
+            if not ids:
+                raise RuntimeError("no conversations to read; populate the database first")
+            print(f"⏱️  Reading {len(ids)} transcripts, {args.page_size} messages per page")
+            for label, stats in benchmark(store, ids, args.page_size).items():
+                print(f"   {label:<16} p50 {stats['p50_ms']:8.3f}ms  p99 {stats['p99_ms']:8.3f}ms  "
+                      f"mean {stats['mean_ms']:8.3f}ms")
+        elif args.conversation_id is None:
+            raise ValueError("give a conversation_id or --benchmark N")
+        else:
+            messages = store.transcript(args.conversation_id, args.page_size)
+            print(f"💬 Conversation #{args.conversation_id}: {len(messages)} messages")
+            for m in messages:
+                print(f"   {m['created_at']:%Y-%m-%d %H:%M} {m['sender']} ({m['role']}): {m['content'].get('text', '')}")
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+    finally:
+        chatdb.get_pool().closeall()
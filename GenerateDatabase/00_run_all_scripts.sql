@@ -13,4 +13,37 @@
 \i 'GenerateDatabase/05_create_conversations_table.sql'
 
 -- Optional: Insert sample data
-\i 'GenerateDatabase/06_create_messages_table.sql'
\ No newline at end of file
+\i 'GenerateDatabase/06_create_messages_table.sql'
+
+-- 7. Create Conversation Participants Table
+\i 'GenerateDatabase/07_create_conversation_participants_table.sql'
+
+-- 8. Add typed generated columns to Users
+\i 'GenerateDatabase/08_add_users_generated_columns.sql'
+
+-- 9. Create incremental report summary tables
+\i 'GenerateDatabase/09_create_report_summaries.sql'
+
+-- 10. Create online agent response-time statistics
+\i 'GenerateDatabase/10_create_agent_response_stats.sql'
+
+-- 11. Create population checkpoints
+\i 'GenerateDatabase/11_create_population_progress.sql'
+
+-- 12. Add conversation lifecycle statistics
+\i 'GenerateDatabase/12_add_conversation_stats.sql'
+
+-- 13. Add full-text search over messages
+\i 'GenerateDatabase/13_add_message_search.sql'
+
+-- 14. Add the conversation transcript index
+\i 'GenerateDatabase/14_add_transcript_index.sql'
+
+-- 15. Create the conversation archive index
+\i 'GenerateDatabase/15_create_conversation_archive.sql'
+
+-- 16. Create conversation assignments
+\i 'GenerateDatabase/16_create_conversation_assignments.sql'
+
+-- 17. Create change counters for the report cache
+\i 'GenerateDatabase/17_create_table_versions.sql'
\ No newline at end of file
@@ -1,13 +1,16 @@
 -- Drop the table if it already exists (optional)
 DROP TABLE IF EXISTS messages;
 
--- Create the messages table
+-- Create the messages table, range-partitioned by month on created_at
 CREATE TABLE messages (
-    message_id SERIAL PRIMARY KEY,
+    message_id SERIAL,
     conversation_id INT NOT NULL,
     user_id INT NOT NULL,
     content JSONB NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    -- The partition key has to be part of the primary key
+    PRIMARY KEY (message_id, created_at),
 
     -- Foreign key constraints
     CONSTRAINT fk_conversation
@@ -19,8 +22,86 @@ CREATE TABLE messages (
         FOREIGN KEY (user_id)
         REFERENCES users (user_id)  -- or agents if messages can be from agents
         ON DELETE CASCADE
-);
+) PARTITION BY RANGE (created_at);
+
+-- Catch-all for rows outside every monthly partition
+CREATE TABLE messages_default PARTITION OF messages DEFAULT;
 
--- Optional: Indexes for faster queries
+-- Optional: Indexes for faster queries (created on every partition)
 CREATE INDEX idx_messages_conversation_id ON messages(conversation_id);
 CREATE INDEX idx_messages_user_id ON messages(user_id);
+CREATE INDEX idx_messages_created_at ON messages(created_at);
+
+-- Create the monthly partition containing `month` (named messages_yYYYYmMM).
+-- Rows for that month already sitting in messages_default are moved into it.
+-- Generated columns are left out of the move and recomputed on insert.
+CREATE OR REPLACE FUNCTION create_message_partition(month DATE)
+RETURNS TEXT AS $$
+DECLARE
+   start_at TIMESTAMP := date_trunc('month', month);
+   end_at TIMESTAMP := date_trunc('month', month) + INTERVAL '1 month';
+   part_name TEXT := format('messages_y%sm%s', to_char(start_at, 'YYYY'), to_char(start_at, 'MM'));
+   columns TEXT;
+BEGIN
+   IF to_regclass(part_name) IS NOT NULL THEN
+      RETURN NULL;
+   END IF;
+
+   SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO columns
+   FROM pg_attribute
+   WHERE attrelid = 'messages'::regclass AND attnum > 0 AND NOT attisdropped AND attgenerated = '';
+
+   EXECUTE format('CREATE TABLE %I (LIKE messages INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)', part_name);
+   EXECUTE format(
+      'WITH moved AS (DELETE FROM messages_default WHERE created_at >= %L AND created_at < %L RETURNING *)
+       INSERT INTO %I (%s) SELECT %s FROM moved', start_at, end_at, part_name, columns, columns);
+   EXECUTE format('ALTER TABLE messages ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                  part_name, start_at, end_at);
+   RETURN part_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Make sure a monthly partition exists for every month between the two timestamps
+CREATE OR REPLACE FUNCTION ensure_message_partitions(from_at TIMESTAMP, to_at TIMESTAMP)
+RETURNS SETOF TEXT AS $$
+DECLARE
+   month DATE;
+   created TEXT;
+BEGIN
+   FOR month IN
+      SELECT generate_series(date_trunc('month', from_at), date_trunc('month', to_at), INTERVAL '1 month')::date
+   LOOP
+      created := create_message_partition(month);
+      IF created IS NOT NULL THEN
+         RETURN NEXT created;
+      END IF;
+   END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Detach monthly partitions that end on or before `before_at`.
+-- Detached tables keep their data and can be dumped/archived and dropped independently.
+CREATE OR REPLACE FUNCTION detach_message_partitions(before_at TIMESTAMP)
+RETURNS SETOF TEXT AS $$
+DECLARE
+   part RECORD;
+BEGIN
+   FOR part IN
+      SELECT c.relname
+      FROM pg_inherits i
+      JOIN pg_class c ON c.oid = i.inhrelid
+      WHERE i.inhparent = 'messages'::regclass
+        AND c.relname ~ '^messages_y[0-9]{4}m[0-9]{2}$'
+        AND to_timestamp(substr(c.relname, 11, 4) || substr(c.relname, 16, 2), 'YYYYMM')::timestamp
+            + INTERVAL '1 month' <= before_at
+      ORDER BY c.relname
+   LOOP
+      EXECUTE format('ALTER TABLE messages DETACH PARTITION %I', part.relname);
+      RETURN NEXT part.relname;
+   END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Pre-create partitions for the sample data range and the next few months
+SELECT COUNT(*) AS partitions_created
+FROM ensure_message_partitions('2023-01-01', LOCALTIMESTAMP + INTERVAL '3 months');
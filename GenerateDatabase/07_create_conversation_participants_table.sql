@@ -0,0 +1,62 @@
+-- Drop the table if it already exists (optional)
+DROP TABLE IF EXISTS conversation_participants;
+
+-- Create the conversation participants table (one row per user who wrote in a conversation)
+CREATE TABLE conversation_participants (
+    conversation_id INT NOT NULL,
+    user_id INT NOT NULL,
+    role_id INT NOT NULL,
+
+    -- When the user first wrote in the conversation
+    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (conversation_id, user_id),
+
+    -- Foreign key constraints
+    CONSTRAINT fk_conversation
+        FOREIGN KEY (conversation_id)
+        REFERENCES conversations (conversation_id)
+        ON DELETE CASCADE,
+
+    CONSTRAINT fk_user
+        FOREIGN KEY (user_id)
+        REFERENCES users (user_id)
+        ON DELETE CASCADE,
+
+    CONSTRAINT fk_role
+        FOREIGN KEY (role_id)
+        REFERENCES role (role_id)
+);
+
+-- ✅ Indexes for "who is in this conversation as a customer/agent" lookups
+CREATE INDEX idx_conversation_participants_role ON conversation_participants(role_id, conversation_id);
+CREATE INDEX idx_conversation_participants_user_id ON conversation_participants(user_id);
+
+-- Trigger to record participants for every INSERT or COPY into messages.
+-- It runs once per statement over the transition table, so bulk loads stay set-based.
+CREATE OR REPLACE FUNCTION add_conversation_participants()
+RETURNS TRIGGER AS $$
+BEGIN
+   INSERT INTO conversation_participants (conversation_id, user_id, role_id, joined_at)
+   SELECT n.conversation_id, n.user_id, u.role_id, MIN(n.created_at)
+   FROM new_messages n
+   JOIN users u ON u.user_id = n.user_id
+   GROUP BY n.conversation_id, n.user_id, u.role_id
+   ON CONFLICT (conversation_id, user_id) DO NOTHING;
+   RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_add_conversation_participants
+AFTER INSERT ON messages
+REFERENCING NEW TABLE AS new_messages
+FOR EACH STATEMENT
+EXECUTE FUNCTION add_conversation_participants();
+
+-- Backfill from messages written before this script ran
+INSERT INTO conversation_participants (conversation_id, user_id, role_id, joined_at)
+SELECT m.conversation_id, m.user_id, u.role_id, MIN(m.created_at)
+FROM messages m
+JOIN users u ON u.user_id = m.user_id
+GROUP BY m.conversation_id, m.user_id, u.role_id
+ON CONFLICT (conversation_id, user_id) DO NOTHING;
@@ -0,0 +1,35 @@
+-- Typed, stored copies of the hot JSONB fields on users.
+-- PostgreSQL keeps them in sync with `details` on every INSERT/UPDATE,
+-- so reports no longer pay for JSONB extraction on each row they read.
+ALTER TABLE users
+    ADD COLUMN IF NOT EXISTS name TEXT
+        GENERATED ALWAYS AS (details->>'name') STORED,
+    ADD COLUMN IF NOT EXISTS email TEXT
+        GENERATED ALWAYS AS (details->>'email') STORED,
+
+    -- Agent-only fields (NULL for customers)
+    ADD COLUMN IF NOT EXISTS department TEXT
+        GENERATED ALWAYS AS (details->>'department') STORED,
+    ADD COLUMN IF NOT EXISTS agent_status TEXT
+        GENERATED ALWAYS AS (details->>'status') STORED,
+
+    -- Customer-only field derived from the phone prefix (NULL for agents)
+    ADD COLUMN IF NOT EXISTS region TEXT
+        GENERATED ALWAYS AS (
+            CASE
+                WHEN details->>'phone' LIKE '+44%' THEN 'UK'
+                WHEN details->>'phone' LIKE '+27%' THEN 'ZA'
+            END
+        ) STORED;
+
+-- ✅ Indexes for the report access paths
+-- Role filter + join on user_id, with name included for index-only scans
+CREATE INDEX IF NOT EXISTS idx_users_role_user ON users(role_id, user_id) INCLUDE (name);
+CREATE INDEX IF NOT EXISTS idx_users_role_name ON users(role_id, name);
+CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
+CREATE INDEX IF NOT EXISTS idx_users_department_status ON users(department, agent_status)
+    WHERE department IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_users_region ON users(region)
+    WHERE region IS NOT NULL;
+
+ANALYZE users;
@@ -0,0 +1,152 @@
+-- Drop the tables if they already exist (optional)
+DROP TABLE IF EXISTS report_watermarks;
+DROP TABLE IF EXISTS agent_conversation_summary;
+DROP TABLE IF EXISTS customer_message_summary;
+DROP TABLE IF EXISTS agent_response_summary;
+
+-- High-water mark of the last message folded into the summaries
+CREATE TABLE report_watermarks (
+    name VARCHAR(100) PRIMARY KEY,
+    last_message_id INT NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Distinct conversations each agent has written in ("Agent Conversations")
+CREATE TABLE agent_conversation_summary (
+    user_id INT PRIMARY KEY,
+    conversations_handled INT NOT NULL DEFAULT 0,
+
+    CONSTRAINT fk_user
+        FOREIGN KEY (user_id)
+        REFERENCES users (user_id)
+        ON DELETE CASCADE
+);
+
+-- Customer messages per conversation and day ("Message Volume", "Customer Engagement")
+CREATE TABLE customer_message_summary (
+    user_id INT NOT NULL,
+    day DATE NOT NULL,
+    conversation_id INT NOT NULL,
+    message_count INT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (user_id, day, conversation_id),
+
+    CONSTRAINT fk_user
+        FOREIGN KEY (user_id)
+        REFERENCES users (user_id)
+        ON DELETE CASCADE
+);
+
+CREATE INDEX idx_customer_message_summary_day ON customer_message_summary(day);
+
+-- Agent reply gaps after a customer message ("Agent Response Times"). All-time:
+-- archive_conversations.py takes archived conversations out of the two summaries
+-- above, but min/max cannot be unfolded, so these keep archived history.
+CREATE TABLE agent_response_summary (
+    user_id INT PRIMARY KEY,
+    response_count BIGINT NOT NULL DEFAULT 0,
+    total_seconds NUMERIC NOT NULL DEFAULT 0,
+    min_seconds NUMERIC,
+    max_seconds NUMERIC,
+
+    CONSTRAINT fk_user
+        FOREIGN KEY (user_id)
+        REFERENCES users (user_id)
+        ON DELETE CASCADE
+);
+
+-- Fold every message written since the last refresh into the summaries.
+-- Work is proportional to the new messages (and the conversations they touch),
+-- not to the size of the messages table. Returns the number of messages folded.
+CREATE OR REPLACE FUNCTION refresh_report_summaries()
+RETURNS BIGINT AS $$
+DECLARE
+   lo INT;
+   hi INT;
+   folded BIGINT;
+   agent_role INT := (SELECT role_id FROM role WHERE name = 'Agent');
+   customer_role INT := (SELECT role_id FROM role WHERE name = 'Customer');
+BEGIN
+   -- Wait for in-flight writers and hold new ones off until commit, so no
+   -- message with an id below the new watermark can still appear later.
+   LOCK TABLE messages IN SHARE MODE;
+
+   INSERT INTO report_watermarks (name) VALUES ('report_summaries') ON CONFLICT (name) DO NOTHING;
+   SELECT last_message_id INTO lo FROM report_watermarks WHERE name = 'report_summaries' FOR UPDATE;
+   SELECT MAX(message_id), COUNT(*) INTO hi, folded FROM messages WHERE message_id > lo;
+   IF hi IS NULL THEN
+      RETURN 0;
+   END IF;
+
+   -- Agent/conversation pairs that did not exist before the watermark
+   INSERT INTO agent_conversation_summary (user_id, conversations_handled)
+   SELECT n.user_id, COUNT(*)
+   FROM (
+      SELECT DISTINCT m.user_id, m.conversation_id
+      FROM messages m
+      JOIN users u ON u.user_id = m.user_id
+      WHERE m.message_id > lo AND m.message_id <= hi
+        AND u.role_id = agent_role
+   ) n
+   WHERE NOT EXISTS (
+      SELECT 1 FROM messages o
+      WHERE o.conversation_id = n.conversation_id
+        AND o.user_id = n.user_id
+        AND o.message_id <= lo
+   )
+   GROUP BY n.user_id
+   ON CONFLICT (user_id) DO UPDATE
+      SET conversations_handled = agent_conversation_summary.conversations_handled
+                                  + EXCLUDED.conversations_handled;
+
+   -- Customer message counts per conversation and day
+   INSERT INTO customer_message_summary (user_id, day, conversation_id, message_count)
+   SELECT m.user_id, m.created_at::date, m.conversation_id, COUNT(*)
+   FROM messages m
+   JOIN users u ON u.user_id = m.user_id
+   WHERE m.message_id > lo AND m.message_id <= hi
+     AND u.role_id = customer_role
+   GROUP BY m.user_id, m.created_at::date, m.conversation_id
+   ON CONFLICT (user_id, day, conversation_id) DO UPDATE
+      SET message_count = customer_message_summary.message_count + EXCLUDED.message_count;
+
+   -- Response gaps for new agent messages; the LAG only needs the conversations they touch.
+   -- Messages are assumed to be appended in time order within a conversation,
+   -- so gaps already folded for older messages never change.
+   WITH touched AS (
+      SELECT DISTINCT conversation_id FROM messages WHERE message_id > lo AND message_id <= hi
+   ),
+   ordered AS (
+      SELECT m.message_id, m.user_id, m.created_at, u.role_id,
+             LAG(m.created_at) OVER w AS prev_time,
+             LAG(u.role_id) OVER w AS prev_role
+      FROM messages m
+      JOIN touched t ON t.conversation_id = m.conversation_id
+      JOIN users u ON u.user_id = m.user_id
+      WHERE m.message_id <= hi
+      WINDOW w AS (PARTITION BY m.conversation_id ORDER BY m.created_at)
+   ),
+   gaps AS (
+      SELECT user_id, EXTRACT(EPOCH FROM (created_at - prev_time)) AS seconds
+      FROM ordered
+      WHERE message_id > lo
+        AND role_id = agent_role
+        AND prev_role = customer_role
+   )
+   INSERT INTO agent_response_summary (user_id, response_count, total_seconds, min_seconds, max_seconds)
+   SELECT user_id, COUNT(*), SUM(seconds), MIN(seconds), MAX(seconds)
+   FROM gaps
+   GROUP BY user_id
+   ON CONFLICT (user_id) DO UPDATE
+      SET response_count = agent_response_summary.response_count + EXCLUDED.response_count,
+          total_seconds = agent_response_summary.total_seconds + EXCLUDED.total_seconds,
+          min_seconds = LEAST(agent_response_summary.min_seconds, EXCLUDED.min_seconds),
+          max_seconds = GREATEST(agent_response_summary.max_seconds, EXCLUDED.max_seconds);
+
+   UPDATE report_watermarks
+   SET last_message_id = hi, refreshed_at = NOW()
+   WHERE name = 'report_summaries';
+
+   RETURN folded;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,26 @@
+-- Drop the table if it already exists (optional)
+DROP TABLE IF EXISTS agent_response_stats;
+
+-- Online per-agent response-time statistics, maintained by ChatService/response_stats.py.
+-- mean/m2 are Welford accumulators; digest is a serialized t-digest from which the
+-- percentile columns are refreshed on every update. Progress is tracked in
+-- report_watermarks under the name 'agent_response_stats'. The statistics are
+-- all-time: conversations moved out by archive_conversations.py stay counted.
+CREATE TABLE agent_response_stats (
+    user_id INT PRIMARY KEY,
+    response_count BIGINT NOT NULL DEFAULT 0,
+    mean_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    m2 DOUBLE PRECISION NOT NULL DEFAULT 0,
+    min_seconds DOUBLE PRECISION,
+    max_seconds DOUBLE PRECISION,
+    p50_seconds DOUBLE PRECISION,
+    p90_seconds DOUBLE PRECISION,
+    p99_seconds DOUBLE PRECISION,
+    digest JSONB NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT fk_user
+        FOREIGN KEY (user_id)
+        REFERENCES users (user_id)
+        ON DELETE CASCADE
+);
@@ -0,0 +1,18 @@
+-- Drop the table if it already exists (optional)
+DROP TABLE IF EXISTS population_progress;
+
+-- Checkpoints of the PopulateDatabase scripts, one row per job (a script, or one
+-- worker of a sharded script such as '05_conversations_and_messages:2/4').
+-- Each chunk's rows and its checkpoint are committed together, so --resume
+-- continues after `position` items without duplicating anything.
+CREATE TABLE population_progress (
+    job VARCHAR(100) PRIMARY KEY,
+    seed BIGINT NOT NULL,
+    params JSONB NOT NULL DEFAULT '{}',
+    position INT NOT NULL DEFAULT 0,
+    last_key BIGINT,
+    rows_written BIGINT NOT NULL DEFAULT 0,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
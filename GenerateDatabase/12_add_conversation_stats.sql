@@ -0,0 +1,130 @@
+-- Denormalized lifecycle statistics, kept up to date as messages are written,
+-- so reports on conversation length and engagement do not have to scan messages.
+ALTER TABLE conversations
+    ADD COLUMN IF NOT EXISTS first_message_at TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS message_count INT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS customer_message_count INT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS agent_message_count INT NOT NULL DEFAULT 0;
+
+ALTER TABLE conversation_participants
+    ADD COLUMN IF NOT EXISTS message_count INT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMP;
+
+-- ✅ Conversations not yet ended, by last activity (close_idle_conversations.py)
+CREATE INDEX IF NOT EXISTS idx_conversations_unended_last_message
+    ON conversations(last_message_at) WHERE ended_at IS NULL;
+
+-- ✅ Participants by recent activity ("Customer Engagement")
+CREATE INDEX IF NOT EXISTS idx_conversation_participants_last_message
+    ON conversation_participants(role_id, last_message_at);
+
+-- Fold every INSERT or COPY into messages into the statistics, once per statement
+-- over the transition table. Triggers on the same event fire in name order, so
+-- trigger_add_conversation_participants has already created the participant rows.
+CREATE OR REPLACE FUNCTION update_conversation_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+   agent_role INT := (SELECT role_id FROM role WHERE name = 'Agent');
+   customer_role INT := (SELECT role_id FROM role WHERE name = 'Customer');
+BEGIN
+   UPDATE conversations c
+   SET first_message_at = LEAST(c.first_message_at, n.first_at),
+       last_message_at = GREATEST(c.last_message_at, n.last_at),
+       message_count = c.message_count + n.total,
+       customer_message_count = c.customer_message_count + n.customer_total,
+       agent_message_count = c.agent_message_count + n.agent_total
+   FROM (
+      SELECT m.conversation_id,
+             MIN(m.created_at) AS first_at,
+             MAX(m.created_at) AS last_at,
+             COUNT(*) AS total,
+             COUNT(*) FILTER (WHERE u.role_id = customer_role) AS customer_total,
+             COUNT(*) FILTER (WHERE u.role_id = agent_role) AS agent_total
+      FROM new_messages m
+      JOIN users u ON u.user_id = m.user_id
+      GROUP BY m.conversation_id
+   ) n
+   WHERE c.conversation_id = n.conversation_id;
+
+   UPDATE conversation_participants p
+   SET message_count = p.message_count + n.total,
+       last_message_at = GREATEST(p.last_message_at, n.last_at)
+   FROM (
+      SELECT conversation_id, user_id, COUNT(*) AS total, MAX(created_at) AS last_at
+      FROM new_messages
+      GROUP BY conversation_id, user_id
+   ) n
+   WHERE p.conversation_id = n.conversation_id AND p.user_id = n.user_id;
+
+   RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_update_conversation_stats ON messages;
+CREATE TRIGGER trigger_update_conversation_stats
+AFTER INSERT ON messages
+REFERENCING NEW TABLE AS new_messages
+FOR EACH STATEMENT
+EXECUTE FUNCTION update_conversation_stats();
+
+-- Backfill from messages written before this script ran
+UPDATE conversations c
+SET first_message_at = n.first_at,
+    last_message_at = n.last_at,
+    message_count = n.total,
+    customer_message_count = n.customer_total,
+    agent_message_count = n.agent_total
+FROM (
+   SELECT m.conversation_id,
+          MIN(m.created_at) AS first_at,
+          MAX(m.created_at) AS last_at,
+          COUNT(*) AS total,
+          COUNT(*) FILTER (WHERE u.role_id = (SELECT role_id FROM role WHERE name = 'Customer')) AS customer_total,
+          COUNT(*) FILTER (WHERE u.role_id = (SELECT role_id FROM role WHERE name = 'Agent')) AS agent_total
+   FROM messages m
+   JOIN users u ON u.user_id = m.user_id
+   GROUP BY m.conversation_id
+) n
+WHERE c.conversation_id = n.conversation_id;
+
+UPDATE conversation_participants p
+SET message_count = n.total,
+    last_message_at = n.last_at
+FROM (
+   SELECT conversation_id, user_id, COUNT(*) AS total, MAX(created_at) AS last_at
+   FROM messages
+   GROUP BY conversation_id, user_id
+) n
+WHERE p.conversation_id = n.conversation_id AND p.user_id = n.user_id;
+
+-- Close conversations in one set-based pass: every conversation already closed
+-- without an ended_at, plus open ones with no message since `idle_before`, up to
+-- `batch_size` rows. ended_at is the time of the last message (or the start, for
+-- conversations nobody wrote in). Rows locked by concurrent writers are skipped
+-- and picked up by the next batch. Returns the number of conversations updated.
+CREATE OR REPLACE FUNCTION close_idle_conversations(idle_before TIMESTAMP, batch_size INT)
+RETURNS BIGINT AS $$
+DECLARE
+   closed_status INT := (SELECT status_id FROM status WHERE name = 'closed');
+   updated BIGINT;
+BEGIN
+   WITH batch AS (
+      SELECT conversation_id
+      FROM conversations
+      WHERE ended_at IS NULL
+        AND (status_id = closed_status OR COALESCE(last_message_at, started_at) < idle_before)
+      ORDER BY conversation_id
+      LIMIT batch_size
+      FOR UPDATE SKIP LOCKED
+   )
+   UPDATE conversations c
+   SET status_id = closed_status,
+       ended_at = COALESCE(c.last_message_at, c.started_at)
+   FROM batch
+   WHERE c.conversation_id = batch.conversation_id;
+
+   GET DIAGNOSTICS updated = ROW_COUNT;
+   RETURN updated;
+END;
+$$ LANGUAGE plpgsql;
\ No newline at end of file
@@ -0,0 +1,13 @@
+-- Full-text search over message text (ChatService/message_search.py).
+-- The tsvector is stored, so PostgreSQL computes it once per INSERT/COPY and
+-- searches never parse content; the GIN index is created on every partition.
+ALTER TABLE messages
+    ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+        GENERATED ALWAYS AS (to_tsvector('english', COALESCE(content->>'text', ''))) STORED;
+
+-- ✅ Index for search_vector @@ tsquery lookups. A 16MB pending list lets bulk
+-- loads append new entries cheaply; (auto)vacuum merges them into the index.
+CREATE INDEX IF NOT EXISTS idx_messages_search_vector ON messages USING GIN (search_vector)
+    WITH (gin_pending_list_limit = 16384);
+
+ANALYZE messages;
\ No newline at end of file
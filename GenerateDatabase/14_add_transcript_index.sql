@@ -0,0 +1,10 @@
+-- ✅ Index for reading one conversation back in order (ChatService/transcripts.py).
+-- Keyset pages of (created_at, message_id) are a range scan on this index.
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_created
+    ON messages(conversation_id, created_at, message_id);
+
+-- Its leading column serves every lookup the single-column index did,
+-- so drop that one rather than maintain both on each insert.
+DROP INDEX IF EXISTS idx_messages_conversation_id;
+
+ANALYZE messages;
\ No newline at end of file
@@ -0,0 +1,29 @@
+-- Drop the table if it already exists (optional)
+DROP TABLE IF EXISTS archived_conversations;
+
+-- Conversations moved out of the hot tables by MaintainDatabase/archive_conversations.py.
+-- The conversation row and its participants are kept here; its messages live in
+-- zstd-compressed Parquet chunks under the archive directory, at rows
+-- [row_offset, row_offset + row_count) of `archive_file`.
+CREATE TABLE archived_conversations (
+    conversation_id INT PRIMARY KEY,
+    status_id INT NOT NULL,
+    started_at TIMESTAMP,
+    ended_at TIMESTAMP,
+    first_message_at TIMESTAMP,
+    last_message_at TIMESTAMP,
+    message_count INT NOT NULL DEFAULT 0,
+    customer_message_count INT NOT NULL DEFAULT 0,
+    agent_message_count INT NOT NULL DEFAULT 0,
+    participants JSONB NOT NULL DEFAULT '[]',
+
+    archive_file TEXT NOT NULL,
+    row_offset INT NOT NULL,
+    row_count INT NOT NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ✅ Indexes for "archived conversations ended in ..." lookups, and for
+-- finding the closed conversations old enough to archive
+CREATE INDEX idx_archived_conversations_ended_at ON archived_conversations(ended_at);
+CREATE INDEX IF NOT EXISTS idx_conversations_ended_at ON conversations(ended_at) WHERE ended_at IS NOT NULL;
\ No newline at end of file
@@ -0,0 +1,25 @@
+-- Drop the table if it already exists (optional)
+DROP TABLE IF EXISTS conversation_assignments;
+
+-- Agent each conversation was routed to by ChatService/agent_router.py.
+-- An agent's load is the number of its assignments whose conversation is still open.
+CREATE TABLE conversation_assignments (
+    conversation_id INT PRIMARY KEY,
+    user_id INT NOT NULL,
+    skill TEXT,
+    assigned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    -- Foreign key constraints
+    CONSTRAINT fk_conversation
+        FOREIGN KEY (conversation_id)
+        REFERENCES conversations (conversation_id)
+        ON DELETE CASCADE,
+
+    CONSTRAINT fk_user
+        FOREIGN KEY (user_id)
+        REFERENCES users (user_id)
+        ON DELETE CASCADE
+);
+
+-- ✅ Index for per-agent load counts
+CREATE INDEX idx_conversation_assignments_user_id ON conversation_assignments(user_id);
\ No newline at end of file
@@ -0,0 +1,50 @@
+-- Drop the table if it already exists (optional)
+DROP TABLE IF EXISTS table_versions;
+
+-- Change counters read by GenerateReports/report_cache.py. Every INSERT, UPDATE,
+-- DELETE or TRUNCATE on a counted table adds one to it, so a report's cache key
+-- moves with any committed change to the data it reads. A table's version is the
+-- SUM over its slots; writers bump the slot of their backend, so concurrent
+-- sessions rarely wait on the same row. Partition ATTACH/DETACH on messages fires
+-- no trigger; the cache reads the partition list from pg_inherits for that.
+CREATE TABLE table_versions (
+    table_name TEXT NOT NULL,
+    slot INT NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (table_name, slot)
+);
+
+CREATE OR REPLACE FUNCTION bump_table_version()
+RETURNS TRIGGER AS $$
+BEGIN
+   INSERT INTO table_versions AS v (table_name, slot, version)
+   VALUES (TG_TABLE_NAME, pg_backend_pid() % 16, 1)
+   ON CONFLICT (table_name, slot) DO UPDATE
+   SET version = v.version + 1,
+       updated_at = CURRENT_TIMESTAMP;
+   RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Once per statement, so bulk loads and set-based refreshes pay for a single bump
+DO $$
+DECLARE
+   t TEXT;
+BEGIN
+   FOREACH t IN ARRAY ARRAY['messages', 'conversations', 'users',
+                            'agent_conversation_summary', 'customer_message_summary',
+                            'agent_response_summary', 'agent_response_stats']
+   LOOP
+      EXECUTE format('DROP TRIGGER IF EXISTS trigger_bump_table_version ON %I', t);
+      EXECUTE format('CREATE TRIGGER trigger_bump_table_version '
+                     'AFTER INSERT OR UPDATE OR DELETE ON %I '
+                     'FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()', t);
+      EXECUTE format('DROP TRIGGER IF EXISTS trigger_bump_table_version_truncate ON %I', t);
+      EXECUTE format('CREATE TRIGGER trigger_bump_table_version_truncate '
+                     'AFTER TRUNCATE ON %I '
+                     'FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()', t);
+   END LOOP;
+END;
+$$;
@@ -0,0 +1,89 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatdb
+from generate_reports import QUERIES, run_sequential
+from report_engine import compare_frames, compute_reports, load_data
+
+# --- BENCHMARK FUNCTIONS ---
+def latest_activity(conn):
+    """Time of the newest message, so windowed reports compared at it cover the data."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT MAX(created_at) FROM messages;")
+        latest = cur.fetchone()[0]
+    conn.rollback()
+    if latest is None:
+        raise RuntimeError("no messages to report on; populate the database first")
+    return latest
+
+def time_sql(repeat, now):
+    """Median wall time of the SQL reports as of `now`, plus the results of the last run."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = run_sequential(QUERIES, params={"now": now})
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), results
+
+def time_engine(conn, repeat, now):
+    """Median load and compute times of the in-memory engine as of `now`, plus the results of the last run."""
+    loads, computes = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = load_data(conn, now)
+        loads.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        results = compute_reports(data)
+        computes.append(time.perf_counter() - start)
+    return statistics.median(loads), statistics.median(computes), results
+
+def verify(sql_results, engine_results):
+    """Print a per-sheet match/mismatch line and return the number of mismatching sheets."""
+    mismatches = 0
+    for sheet, (sql_df, _) in sql_results.items():
+        problems = compare_frames(sheet, sql_df, engine_results[sheet][0])
+        if problems:
+            mismatches += 1
+            print(f"❌ {sheet}: {'; '.join(problems)}")
+        else:
+            print(f"✅ {sheet}: {len(sql_df)} rows match")
+    return mismatches
+
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compare the SQL reports with the in-memory engine for speed and identical output.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per engine; the median is reported.")
+    parser.add_argument("--now", type=datetime.fromisoformat, default=None,
+                        help="Clock for the time-windowed reports (default: the newest message's created_at).")
+    return parser.parse_args()
+
+# --- MAIN ---
+if __name__ == "__main__":
+    args = parse_args()
+    conn = chatdb.connect()
+    try:
+        # Both engines must read the same data; run against a quiet database. They share
+        # one fixed clock so the windowed reports are compared over real rows.
+        now = args.now or latest_activity(conn)
+        print(f"🔎 Comparing reports as of {now}\n")
+        t_sql, sql_results = time_sql(args.repeat, now)
+        t_load, t_compute, engine_results = time_engine(conn, args.repeat, now)
+
+        print(f"{'Engine':<24}{'seconds':>10}")
+        print(f"{'SQL (6 queries)':<24}{t_sql:>10.3f}")
+        print(f"{'In-memory load':<24}{t_load:>10.3f}")
+        print(f"{'In-memory compute':<24}{t_compute:>10.3f}")
+        print(f"{'In-memory total':<24}{t_load + t_compute:>10.3f}\n")
+
+        print("Per-report compute (s): " + ", ".join(
+            f"{sheet} {stats['seconds']:.3f}" for sheet, (_, stats) in engine_results.items()))
+        mismatches = verify(sql_results, engine_results)
+    finally:
+        conn.close()
+    sys.exit(1 if mismatches else 0)
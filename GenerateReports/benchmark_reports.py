@@ -0,0 +1,139 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatdb
+from generate_reports import QUERIES, report_params
+
+# --- QUERIES ---
+# The current report queries as they would be without 08_add_users_generated_columns.sql,
+# extracting names from the users.details JSONB on every row. Keep them in step with
+# QUERIES so that JSONB extraction is the only difference being timed.
+JSONB_QUERIES = {
+    "Active Conversations": """
+        SELECT c.conversation_id, cu.details->>'name' AS customer_name,
+               ag.details->>'name' AS agent_name, s.name AS status
+        FROM conversations c
+        JOIN status s ON c.status_id = s.status_id
+        LEFT JOIN conversation_participants p_c ON p_c.conversation_id = c.conversation_id
+              AND p_c.role_id = %(customer_role)s
+        LEFT JOIN users cu ON p_c.user_id = cu.user_id
+        LEFT JOIN conversation_participants p_a ON p_a.conversation_id = c.conversation_id
+              AND p_a.role_id = %(agent_role)s
+        LEFT JOIN users ag ON p_a.user_id = ag.user_id
+        WHERE c.status_id = %(open_status)s
+        GROUP BY c.conversation_id, cu.details->>'name', ag.details->>'name', s.name;
+    """,
+
+    "Message Volume": """
+        SELECT u.details->>'name' AS customer_name,
+               COUNT(m.message_id) AS message_count
+        FROM messages m
+        JOIN users u ON m.user_id = u.user_id
+        WHERE u.role_id = %(customer_role)s
+          AND m.created_at BETWEEN %(now)s - INTERVAL '30 days' AND %(now)s
+        GROUP BY u.details->>'name'
+        ORDER BY message_count DESC;
+    """,
+
+    "Agent Conversations": """
+        SELECT a.details->>'name' AS agent_name,
+               COUNT(DISTINCT m.conversation_id) AS conversations_handled
+        FROM messages m
+        JOIN users a ON m.user_id = a.user_id
+        WHERE a.role_id = %(agent_role)s
+        GROUP BY a.details->>'name'
+        ORDER BY conversations_handled DESC;
+    """,
+
+    "Agent Response Times": """
+        WITH ordered_msgs AS (
+            SELECT
+                m.conversation_id, m.user_id, m.created_at,
+                LAG(m.created_at) OVER (PARTITION BY m.conversation_id ORDER BY m.created_at) AS prev_time,
+                LAG(u.role_id) OVER (PARTITION BY m.conversation_id ORDER BY m.created_at) AS prev_role
+            FROM messages m
+            JOIN users u ON m.user_id = u.user_id
+        )
+        SELECT
+            u.details->>'name' AS agent_name,
+            ROUND(MIN(EXTRACT(EPOCH FROM (o.created_at - o.prev_time)))/60, 2) AS min_response_min,
+            ROUND(MAX(EXTRACT(EPOCH FROM (o.created_at - o.prev_time)))/60, 2) AS max_response_min,
+            ROUND(AVG(EXTRACT(EPOCH FROM (o.created_at - o.prev_time)))/60, 2) AS avg_response_min
+        FROM ordered_msgs o
+        JOIN users u ON o.user_id = u.user_id
+        WHERE u.role_id = %(agent_role)s
+          AND o.prev_role = %(customer_role)s
+        GROUP BY u.details->>'name';
+    """,
+
+    "Customer Engagement": """
+        SELECT u.details->>'name' AS customer_name,
+               COUNT(*) AS conversations,
+               SUM(p.message_count) AS total_messages
+        FROM conversation_participants p
+        JOIN users u ON p.user_id = u.user_id
+        WHERE p.role_id = %(customer_role)s
+          AND p.last_message_at >= %(now)s - INTERVAL '1 month'
+        GROUP BY u.details->>'name'
+        ORDER BY total_messages DESC
+        LIMIT 10;
+    """,
+
+    # Reads no user names, so it is the same query on both sides (a control)
+    "Conversation Duration": """
+        SELECT conversation_id,
+               first_message_at AS start_time,
+               last_message_at AS end_time,
+               ROUND(EXTRACT(EPOCH FROM (last_message_at - first_message_at))/60, 2) AS duration_minutes
+        FROM conversations
+        WHERE status_id = %(closed_status)s
+          AND message_count > 0
+        ORDER BY duration_minutes DESC;
+    """
+}
+
+# --- BENCHMARK FUNCTIONS ---
+def time_query(conn, query, repeat, params=None):
+    """Run `query` `repeat` times and return the median wall time in seconds."""
+    timings = []
+    with conn.cursor() as cur:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            cur.execute(query, params)
+            cur.fetchall()
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def compare(conn, before, after, repeat=5):
+    """Print before/after median timings for every report present in both query sets."""
+    params = report_params(conn)
+    print(f"{'Report':<24}{'before (s)':>12}{'after (s)':>12}{'speedup':>10}")
+    for sheet in after:
+        if sheet not in before:
+            continue
+        t_before = time_query(conn, before[sheet], repeat, params)
+        t_after = time_query(conn, after[sheet], repeat, params)
+        speedup = t_before / t_after if t_after > 0 else float("inf")
+        print(f"{sheet:<24}{t_before:>12.4f}{t_after:>12.4f}{speedup:>9.1f}x")
+
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Time each report with JSONB extraction (before) and generated columns (after).")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query; the median is reported.")
+    return parser.parse_args()
+
+# --- MAIN ---
+if __name__ == "__main__":
+    args = parse_args()
+    conn = chatdb.connect()
+    try:
+        # Warm the cache once so the first query measured isn't penalised
+        time_query(conn, "SELECT COUNT(*) FROM messages;", 1)
+        compare(conn, JSONB_QUERIES, QUERIES, args.repeat)
+    finally:
+        conn.close()
@@ -1,48 +1,58 @@
-import psycopg2
+import argparse
+import os
+import sys
+import time
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from psycopg2.extensions import ISOLATION_LEVEL_REPEATABLE_READ
 
-# --- CONFIG ---
-DB_CONFIG = {
-    "host": "localhost",
-    "database": "customer_support",
-    "user": "",
-    "password": "",
-}
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatdb
+from report_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, ReportCache
+from report_export import DEFAULT_FETCH_SIZE, export_streaming
+from report_profile import explain_query, row_bytes, write_sidecar
+from ChatService.response_stats import update_response_stats
 
 # --- QUERIES ---
+# Role and status ids are passed as parameters (see report_params), so the
+# planner sees constants instead of (SELECT role_id FROM role ...) subqueries.
+# Time windows end at %(now)s / %(today)s rather than NOW(), so a cached result
+# is keyed on the bound it was computed for (see report_clock).
 QUERIES = {
     "Active Conversations": """
-        SELECT c.conversation_id, cu.details->>'name' AS customer_name,
-               ag.details->>'name' AS agent_name, s.name AS status
+        SELECT c.conversation_id, cu.name AS customer_name,
+               ag.name AS agent_name, s.name AS status
         FROM conversations c
         JOIN status s ON c.status_id = s.status_id
-        LEFT JOIN messages m_c ON m_c.conversation_id = c.conversation_id
-        LEFT JOIN users cu ON m_c.user_id = cu.user_id AND cu.role_id = (SELECT role_id FROM role WHERE name = 'Customer')
-        LEFT JOIN messages m_a ON m_a.conversation_id = c.conversation_id
-        LEFT JOIN users ag ON m_a.user_id = ag.user_id AND ag.role_id = (SELECT role_id FROM role WHERE name = 'Agent')
-        WHERE s.name = 'open'
-        GROUP BY c.conversation_id, cu.details->>'name', ag.details->>'name', s.name;
+        LEFT JOIN conversation_participants p_c ON p_c.conversation_id = c.conversation_id
+              AND p_c.role_id = %(customer_role)s
+        LEFT JOIN users cu ON p_c.user_id = cu.user_id
+        LEFT JOIN conversation_participants p_a ON p_a.conversation_id = c.conversation_id
+              AND p_a.role_id = %(agent_role)s
+        LEFT JOIN users ag ON p_a.user_id = ag.user_id
+        WHERE c.status_id = %(open_status)s
+        GROUP BY c.conversation_id, cu.name, ag.name, s.name;
     """,
 
     "Message Volume": """
-        SELECT u.details->>'name' AS customer_name,
+        SELECT u.name AS customer_name,
                COUNT(m.message_id) AS message_count
         FROM messages m
         JOIN users u ON m.user_id = u.user_id
-        WHERE u.role_id = (SELECT role_id FROM role WHERE name = 'Customer')
-          AND m.created_at BETWEEN NOW() - INTERVAL '30 days' AND NOW()
-        GROUP BY u.details->>'name'
+        WHERE u.role_id = %(customer_role)s
+          AND m.created_at BETWEEN %(now)s - INTERVAL '30 days' AND %(now)s
+        GROUP BY u.name
         ORDER BY message_count DESC;
     """,
 
     "Agent Conversations": """
-        SELECT a.details->>'name' AS agent_name,
+        SELECT a.name AS agent_name,
                COUNT(DISTINCT m.conversation_id) AS conversations_handled
         FROM messages m
         JOIN users a ON m.user_id = a.user_id
-        WHERE a.role_id = (SELECT role_id FROM role WHERE name = 'Agent')
-        GROUP BY a.details->>'name'
+        WHERE a.role_id = %(agent_role)s
+        GROUP BY a.name
         ORDER BY conversations_handled DESC;
     """,
 
@@ -56,57 +66,333 @@ QUERIES = {
             JOIN users u ON m.user_id = u.user_id
         )
         SELECT
-            u.details->>'name' AS agent_name,
+            u.name AS agent_name,
             ROUND(MIN(EXTRACT(EPOCH FROM (o.created_at - o.prev_time)))/60, 2) AS min_response_min,
             ROUND(MAX(EXTRACT(EPOCH FROM (o.created_at - o.prev_time)))/60, 2) AS max_response_min,
             ROUND(AVG(EXTRACT(EPOCH FROM (o.created_at - o.prev_time)))/60, 2) AS avg_response_min
         FROM ordered_msgs o
         JOIN users u ON o.user_id = u.user_id
-        WHERE u.role_id = (SELECT role_id FROM role WHERE name = 'Agent')
-          AND o.prev_role = (SELECT role_id FROM role WHERE name = 'Customer')
-        GROUP BY u.details->>'name';
+        WHERE u.role_id = %(agent_role)s
+          AND o.prev_role = %(customer_role)s
+        GROUP BY u.name;
     """,
 
+    # Read from the lifecycle statistics in 12_add_conversation_stats.sql. The
+    # window is applied per conversation: a customer's messages count if they
+    # last wrote in that conversation within the month.
     "Customer Engagement": """
-        SELECT u.details->>'name' AS customer_name,
-               COUNT(DISTINCT m.conversation_id) AS conversations,
-               COUNT(m.message_id) AS total_messages
-        FROM messages m
-        JOIN users u ON m.user_id = u.user_id
-        WHERE u.role_id = (SELECT role_id FROM role WHERE name = 'Customer')
-          AND m.created_at >= NOW() - INTERVAL '1 month'
-        GROUP BY u.details->>'name'
+        SELECT u.name AS customer_name,
+               COUNT(*) AS conversations,
+               SUM(p.message_count) AS total_messages
+        FROM conversation_participants p
+        JOIN users u ON p.user_id = u.user_id
+        WHERE p.role_id = %(customer_role)s
+          AND p.last_message_at >= %(now)s - INTERVAL '1 month'
+        GROUP BY u.name
         ORDER BY total_messages DESC
         LIMIT 10;
     """,
 
     "Conversation Duration": """
-        WITH convo_times AS (
-            SELECT c.conversation_id,
-                   MIN(m.created_at) AS start_time,
-                   MAX(m.created_at) AS end_time
-            FROM conversations c
-            JOIN messages m ON c.conversation_id = m.conversation_id
-            JOIN status s ON c.status_id = s.status_id
-            WHERE s.name = 'closed'
-            GROUP BY c.conversation_id
-        )
-        SELECT conversation_id, start_time, end_time,
-               ROUND(EXTRACT(EPOCH FROM (end_time - start_time))/60, 2) AS duration_minutes
-        FROM convo_times
+        SELECT conversation_id,
+               first_message_at AS start_time,
+               last_message_at AS end_time,
+               ROUND(EXTRACT(EPOCH FROM (last_message_at - first_message_at))/60, 2) AS duration_minutes
+        FROM conversations
+        WHERE status_id = %(closed_status)s
+          AND message_count > 0
         ORDER BY duration_minutes DESC;
     """
 }
 
+# Reports served from the incremental summaries in 09_create_report_summaries.sql
+# (used with --incremental). Time windows are applied at day granularity.
+SUMMARY_QUERIES = {
+    "Message Volume": """
+        SELECT u.name AS customer_name,
+               SUM(s.message_count) AS message_count
+        FROM customer_message_summary s
+        JOIN users u ON s.user_id = u.user_id
+        WHERE s.day BETWEEN %(today)s - 30 AND %(today)s
+        GROUP BY u.name
+        ORDER BY message_count DESC;
+    """,
+
+    "Agent Conversations": """
+        SELECT a.name AS agent_name,
+               SUM(s.conversations_handled) AS conversations_handled
+        FROM agent_conversation_summary s
+        JOIN users a ON s.user_id = a.user_id
+        GROUP BY a.name
+        ORDER BY conversations_handled DESC;
+    """,
+
+    "Agent Response Times": """
+        SELECT u.name AS agent_name,
+               ROUND(MIN(s.min_seconds)/60, 2) AS min_response_min,
+               ROUND(MAX(s.max_seconds)/60, 2) AS max_response_min,
+               ROUND(SUM(s.total_seconds)/SUM(s.response_count)/60, 2) AS avg_response_min
+        FROM agent_response_summary s
+        JOIN users u ON s.user_id = u.user_id
+        GROUP BY u.name;
+    """,
+
+    "Customer Engagement": """
+        SELECT u.name AS customer_name,
+               COUNT(DISTINCT s.conversation_id) AS conversations,
+               SUM(s.message_count) AS total_messages
+        FROM customer_message_summary s
+        JOIN users u ON s.user_id = u.user_id
+        WHERE s.day >= (%(today)s - INTERVAL '1 month')::date
+        GROUP BY u.name
+        ORDER BY total_messages DESC
+        LIMIT 10;
+    """,
+}
+
+# "Agent Response Times" from the online statistics kept by ChatService/response_stats.py,
+# with percentiles the LAG query cannot give cheaply.
+RESPONSE_STATS_QUERY = """
+    SELECT u.name AS agent_name,
+           ROUND((s.min_seconds/60)::numeric, 2) AS min_response_min,
+           ROUND((s.max_seconds/60)::numeric, 2) AS max_response_min,
+           ROUND((s.mean_seconds/60)::numeric, 2) AS avg_response_min,
+           ROUND((s.p50_seconds/60)::numeric, 2) AS p50_response_min,
+           ROUND((s.p90_seconds/60)::numeric, 2) AS p90_response_min,
+           ROUND((s.p99_seconds/60)::numeric, 2) AS p99_response_min,
+           s.response_count
+    FROM agent_response_stats s
+    JOIN users u ON s.user_id = u.user_id
+    ORDER BY u.name;
+"""
+
+# --- REPORT FUNCTIONS ---
+def begin_snapshot(conn, snapshot_id=None):
+    """Start a read-only REPEATABLE READ transaction, optionally importing an exported snapshot."""
+    conn.set_session(isolation_level=ISOLATION_LEVEL_REPEATABLE_READ, readonly=True)
+    with conn.cursor() as cur:
+        if snapshot_id:
+            cur.execute("SET TRANSACTION SNAPSHOT %s;", (snapshot_id,))
+        else:
+            cur.execute("SELECT pg_export_snapshot();")
+            return cur.fetchone()[0]
+
+def report_clock(conn):
+    """The end of the reports' time windows: the database clock truncated to the minute, and its date.
+
+    Truncating lets runs within the same minute (or day, for the day-granular
+    summary reports) share cached results.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT date_trunc('minute', LOCALTIMESTAMP), CURRENT_DATE;")
+        now, today = cur.fetchone()
+    return {"now": now, "today": today}
+
+def report_params(conn):
+    """Parameters of the report queries: role and status ids (cached per process) and report_clock()."""
+    return {
+        "customer_role": chatdb.role_id(conn, "Customer"),
+        "agent_role": chatdb.role_id(conn, "Agent"),
+        "open_status": chatdb.status_id(conn, "open"),
+        "closed_status": chatdb.status_id(conn, "closed"),
+        **report_clock(conn),
+    }
+
+def refresh_summaries():
+    """Fold messages written since the last refresh into the summary tables."""
+    conn = chatdb.connect()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute("SELECT refresh_report_summaries();")
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+def refresh_response_stats():
+    """Fold messages written since the last update into agent_response_stats."""
+    conn = chatdb.connect()
+    try:
+        return update_response_stats(conn)
+    finally:
+        conn.close()
+
+def run_report(conn, query, params=None, explain=False):
+    """Run one report query and return (DataFrame, stats).
+
+    stats holds the wall time in seconds, row count, approximate bytes fetched
+    and, with `explain`, the EXPLAIN ANALYZE plan.
+    """
+    start = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute(query, params)
+        rows = cur.fetchall()
+        columns = [col.name for col in cur.description]
+    df = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+    stats = {"seconds": time.perf_counter() - start, "rows": len(rows), "bytes": row_bytes(rows)}
+    if explain:
+        stats["plan"] = explain_query(conn, query, params)
+    return df, stats
+
+def check_cache(conn, queries, params, cache):
+    """Serve what we can from `cache` for the data visible in `conn`'s snapshot.
+
+    Returns (cached results, queries still to run, cache keys).
+    """
+    if cache is None:
+        return {}, queries, {}
+    hits, misses, keys = cache.lookup(conn, queries, params)
+    print(f"🗄️  Cache: {len(hits)} hit(s), {len(misses)} to recompute")
+    return hits, misses, keys
+
+def run_sequential(queries, explain=False, cache=None, params=None):
+    """Run every report on one connection inside a single snapshot.
+
+    `params` are passed to the queries on top of report_params().
+    """
+    conn = chatdb.connect()
+    try:
+        begin_snapshot(conn)
+        params = {**report_params(conn), **(params or {})}
+        results, misses, keys = check_cache(conn, queries, params, cache)
+        fresh = {sheet: run_report(conn, query, params, explain) for sheet, query in misses.items()}
+        if cache is not None:
+            cache.store(fresh, keys)
+        return {**results, **fresh}
+    finally:
+        conn.close()
+
+def run_parallel(queries, parallel, explain=False, cache=None):
+    """Run reports concurrently on a pool of `parallel` connections.
+
+    A coordinator connection exports its snapshot and every worker imports it,
+    so all sheets see the same committed data.
+    """
+    conn_pool = chatdb.create_pool(1, parallel + 1)
+    coordinator = conn_pool.getconn()
+    try:
+        snapshot_id = begin_snapshot(coordinator)
+        params = report_params(coordinator)
+        results, misses, keys = check_cache(coordinator, queries, params, cache)
+
+        def worker(query):
+            conn = conn_pool.getconn()
+            try:
+                begin_snapshot(conn, snapshot_id)
+                return run_report(conn, query, params, explain)
+            finally:
+                conn.rollback()
+                conn_pool.putconn(conn)
+
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            fresh = dict(zip(misses, executor.map(worker, misses.values())))
+        if cache is not None:
+            cache.store(fresh, keys)
+        return {**results, **fresh}
+    finally:
+        coordinator.rollback()
+        conn_pool.closeall()
+
+def run_streaming(queries, base_name, fmt, fetch_size, explain=False):
+    """Stream every report through server-side cursors inside a single snapshot."""
+    conn = chatdb.connect()
+    try:
+        begin_snapshot(conn)
+        params = report_params(conn)
+        stats, files = export_streaming(conn, queries, base_name, fmt, fetch_size, params)
+        if explain:
+            for sheet, query in queries.items():
+                stats[sheet]["plan"] = explain_query(conn, query, params)
+        return stats, files
+    finally:
+        conn.close()
+
+def write_workbook(filename, results):
+    """Write result DataFrames to one sheet each, in the order of `results`."""
+    with pd.ExcelWriter(filename) as writer:
+        for sheet, (df, stats) in results.items():
+            df.to_excel(writer, index=False, sheet_name=sheet)
+            print(f"✅ Wrote {sheet} ({len(df)} rows, query {stats['seconds']:.2f}s)")
+
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate the customer support Excel reports.")
+    parser.add_argument("--parallel", type=int, default=1,
+                        help="Run the report queries concurrently on N pooled connections.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream rows from server-side cursors to disk with bounded memory.")
+    parser.add_argument("--format", choices=["xlsx", "csv", "parquet"], default="xlsx",
+                        help="Output format for --stream (csv is gzip-compressed).")
+    parser.add_argument("--fetch-size", type=int, default=DEFAULT_FETCH_SIZE,
+                        help="Rows fetched per round trip when streaming.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Refresh the summary tables with new messages and report from them "
+                             "(Agent Response Times there is all-time, archived conversations included).")
+    parser.add_argument("--response-stats", action="store_true",
+                        help="Update the online response-time statistics and report percentiles from them "
+                             "(all-time, archived conversations included).")
+    parser.add_argument("--profile", action="store_true",
+                        help="Write per-report time/rows/bytes to a JSON sidecar next to the output.")
+    parser.add_argument("--explain", action="store_true",
+                        help="Also capture EXPLAIN (ANALYZE, BUFFERS) plans in the sidecar (implies --profile).")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse cached results for reports whose data has not changed (workbook mode only).")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help="Directory holding cached report results.")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="Evict least recently used cache entries beyond this size.")
+    args = parser.parse_args()
+    # Streamed reports go through server-side cursors on one connection, straight to disk
+    if args.stream or args.format != "xlsx":
+        if args.parallel > 1:
+            parser.error("--parallel is not supported with --stream or --format csv/parquet")
+        if args.cache:
+            parser.error("--cache is not supported with --stream or --format csv/parquet")
+    return args
+
 # --- RUN REPORTS ---
-conn = psycopg2.connect(**DB_CONFIG)
-excel_filename = f"chat_reports_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
+if __name__ == "__main__":
+    args = parse_args()
+    base_name = f"chat_reports_{datetime.now().strftime('%Y%m%d_%H%M')}"
+
+    start = time.perf_counter()
+    queries = QUERIES
+    if args.incremental:
+        folded = refresh_summaries()
+        print(f"✅ Folded {folded} new messages into the report summaries "
+              f"({time.perf_counter() - start:.2f}s)")
+        # Same sheet order as QUERIES, with summary-backed reports swapped in
+        queries = {sheet: SUMMARY_QUERIES.get(sheet, query) for sheet, query in QUERIES.items()}
+    if args.response_stats:
+        step = time.perf_counter()
+        gaps = refresh_response_stats()
+        print(f"✅ Folded {gaps} new agent responses into the response-time statistics "
+              f"({time.perf_counter() - step:.2f}s)")
+        queries = {**queries, "Agent Response Times": RESPONSE_STATS_QUERY}
+
+    if args.stream or args.format != "xlsx":
+        mode = f"stream-{args.format}"
+        stats, files = run_streaming(queries, base_name, args.format, args.fetch_size, args.explain)
+        print(f"\n⏱️  Total: {time.perf_counter() - start:.2f}s")
+        print("📊 Reports saved to: " + ", ".join(files))
+    else:
+        mode = f"parallel-{args.parallel}" if args.parallel > 1 else "sequential"
+        excel_filename = f"{base_name}.xlsx"
+        cache = ReportCache(args.cache_dir, args.cache_max_mb * 1024 * 1024) if args.cache else None
+        if args.parallel > 1:
+            results = run_parallel(queries, args.parallel, args.explain, cache)
+        else:
+            results = run_sequential(queries, args.explain, cache)
+        query_time = time.perf_counter() - start
+        stats = {sheet: report_stats for sheet, (_, report_stats) in results.items()}
+
+        # Sheets are always written in QUERIES order, whatever order the queries finished in
+        write_workbook(excel_filename, {sheet: results[sheet] for sheet in queries})
 
-with pd.ExcelWriter(excel_filename) as writer:
-    for sheet, query in QUERIES.items():
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, index=False, sheet_name=sheet)
-        print(f"✅ Wrote {sheet} ({len(df)} rows)")
+        print(f"\n⏱️  Queries: {query_time:.2f}s wall "
+              f"({sum(s['seconds'] for s in stats.values()):.2f}s summed), "
+              f"total: {time.perf_counter() - start:.2f}s")
+        print(f"📊 Reports saved to: {excel_filename}")
 
-conn.close()
-print(f"\n📊 Reports saved to: {excel_filename}")
+    if args.profile or args.explain:
+        sidecar = write_sidecar(f"{base_name}.json", queries, stats, mode)
+        print(f"🔎 Profile saved to: {sidecar}  (compare with: python report_profile.py <baseline.json> {sidecar})")
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import re
+import time
+
+import pandas as pd
+
+# --- CONFIGURATION ---
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".report_cache")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Tables whose contents are derived from messages (trigger- or refresh-maintained)
+DERIVED_FROM_MESSAGES = [
+    "conversation_participants",
+    "agent_conversation_summary",
+    "customer_message_summary",
+    "agent_response_summary",
+    "agent_response_stats",
+]
+
+# Per-table change counters kept by the statement triggers in 17_create_table_versions.sql,
+# read in the caller's snapshot. Each report is keyed only on the tables it reads, so a
+# change to one table invalidates only the sheets that depend on it. The counter table's
+# OID changes when the schema is rebuilt, so counters starting again from zero cannot
+# revive entries cached against an earlier database. Attaching or detaching a messages
+# partition (maintain_message_partitions.py) moves rows without firing any trigger, so
+# the partition list is part of the messages version too.
+DATA_VERSION_SQL = """
+    SELECT table_name, SUM(version)::text FROM table_versions GROUP BY table_name
+    UNION ALL
+    SELECT 'messages_partitions', md5(string_agg(inhrelid::text, ',' ORDER BY inhrelid))
+    FROM pg_inherits WHERE inhparent = 'messages'::regclass
+    UNION ALL
+    SELECT 'epoch', 'table_versions'::regclass::oid::text;
+"""
+# Reports take their window bounds as parameters (generate_reports.report_clock);
+# a query calling one of these instead cannot be cached.
+CLOCK_FUNCTIONS = re.compile(r"\b(NOW|CLOCK_TIMESTAMP|STATEMENT_TIMESTAMP|TRANSACTION_TIMESTAMP)\s*\(|"
+                             r"\b(CURRENT_DATE|CURRENT_TIMESTAMP|LOCALTIMESTAMP)\b", re.IGNORECASE)
+
+VERSION_SOURCES = {
+    "messages": ["messages", "messages_partitions"] + DERIVED_FROM_MESSAGES,
+    "conversations": ["conversations"],
+    "users": ["users"],
+}
+
+# --- HELPERS ---
+def _mentions(query, table):
+    return re.search(rf"\b(FROM|JOIN)\s+{table}\b", query, re.IGNORECASE) is not None
+
+def dependencies(query):
+    """Data-version components a report depends on, judged from the tables its SQL reads."""
+    deps = [t for t in ("messages", "conversations", "users") if _mentions(query, t)]
+    if "messages" not in deps and any(_mentions(query, t) for t in DERIVED_FROM_MESSAGES):
+        deps.append("messages")
+    return sorted(deps)
+
+def reads_clock(query):
+    """Whether the query reads the clock itself; its result can change without any write."""
+    return CLOCK_FUNCTIONS.search(query) is not None
+
+# --- CACHE ---
+class ReportCache:
+    """Size-bounded LRU cache of report DataFrames stored as Parquet files.
+
+    Entries are keyed by the query text, the parameters it uses (window bounds
+    such as %(now)s included) and the data version of the tables it reads.
+    Queries that read the clock themselves are never cached.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def data_version(self, conn):
+        """Read the current change markers, inside the caller's snapshot."""
+        with conn.cursor() as cur:
+            cur.execute(DATA_VERSION_SQL)
+            counters = dict(cur.fetchall())
+        epoch = counters.pop("epoch")
+        return {component: ":".join([epoch] + [counters.get(table, "0") for table in tables])
+                for component, tables in VERSION_SOURCES.items()}
+
+    def key(self, query, version, params=None):
+        """Cache key for `query`, or None if it cannot be cached."""
+        if reads_clock(query):
+            return None
+        used = {name: value for name, value in (params or {}).items() if f"%({name})s" in query}
+        parts = [" ".join(query.split()), repr(sorted(used.items()))]
+        parts += [f"{table}={version[table]}" for table in dependencies(query)]
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.parquet")
+
+    def get(self, key):
+        """Return the cached DataFrame for `key`, or None. Hits refresh the entry's LRU position."""
+        path = self._path(key)
+        try:
+            df = pd.read_parquet(path)
+        except (FileNotFoundError, OSError):
+            return None
+        os.utime(path)
+        return df
+
+    def put(self, key, df):
+        """Store a DataFrame atomically (write to a temp file, then rename)."""
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in `max_bytes`."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".parquet"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+    def lookup(self, conn, queries, params=None):
+        """Split `queries` into cached results and misses for the data visible to `conn`.
+
+        Returns (hits {sheet: (df, stats)}, misses {sheet: query}, keys {sheet: key}).
+        """
+        version = self.data_version(conn)
+        hits, misses, keys = {}, {}, {}
+        for sheet, query in queries.items():
+            keys[sheet] = self.key(query, version, params)
+            start = time.perf_counter()
+            df = self.get(keys[sheet]) if keys[sheet] else None
+            if df is None:
+                misses[sheet] = query
+            else:
+                hits[sheet] = (df, {"seconds": time.perf_counter() - start, "rows": len(df),
+                                    "bytes": 0, "cached": True})
+        return hits, misses, keys
+
+    def store(self, results, keys):
+        for sheet, (df, _) in results.items():
+            if keys[sheet]:
+                self.put(keys[sheet], df)
+        self.evict()
@@ -0,0 +1,270 @@
+import argparse
+import io
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatdb
+from generate_reports import begin_snapshot, report_clock, write_workbook
+from report_snapshot import open_snapshot
+
+# --- CONFIGURATION ---
+MICROS_PER_HUNDREDTH_MINUTE = 600_000
+
+# Columns loaded once per run; everything else is derived in memory
+TABLES = {
+    "messages": "SELECT message_id, conversation_id, user_id, created_at FROM messages",
+    "users": "SELECT user_id, role_id, name FROM users",
+    "conversations": "SELECT conversation_id, status_id FROM conversations",
+    "participants": "SELECT conversation_id, user_id, role_id, message_count, last_message_at "
+                    "FROM conversation_participants",
+}
+
+# --- LOADING ---
+def copy_frame(conn, query):
+    """Fetch a query through COPY ... TO STDOUT (CSV) into a DataFrame."""
+    buf = io.StringIO()
+    with conn.cursor() as cur:
+        cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", buf)
+    buf.seek(0)
+    return pd.read_csv(buf)
+
+def load_data(conn, now=None):
+    """Load the report inputs from one snapshot.
+
+    Returns a dict of DataFrames plus the role/status ids and the clock the
+    time-windowed reports use: `now` if given, else report_clock()'s, as the
+    SQL reports use.
+    """
+    begin_snapshot(conn)
+    data = {name: copy_frame(conn, query) for name, query in TABLES.items()}
+    data["messages"]["created_at"] = pd.to_datetime(data["messages"]["created_at"], format="ISO8601")
+    data["participants"]["last_message_at"] = pd.to_datetime(data["participants"]["last_message_at"],
+                                                             format="ISO8601")
+    data["roles"] = chatdb.role_ids(conn)
+    data["statuses"] = chatdb.status_ids(conn)
+    data["now"] = pd.Timestamp(report_clock(conn)["now"] if now is None else now)
+    conn.rollback()
+    return data
+
+def load_snapshot_data(directory):
+    """Load the report inputs from a report_snapshot.py export instead of the database.
+
+    `now` is the time the snapshot was taken, so windowed reports reproduce the
+    workbook as it would have been at export time.
+    """
+    snapshot = open_snapshot(directory)
+    return {
+        "messages": snapshot.frame("messages", ["message_id", "conversation_id", "user_id", "created_at"]),
+        "users": snapshot.frame("users", ["user_id", "role_id", "name"]),
+        "conversations": snapshot.frame("conversations", ["conversation_id", "status_id"]),
+        "participants": snapshot.frame("conversation_participants", ["conversation_id", "user_id", "role_id",
+                                                                     "message_count", "last_message_at"]),
+        "roles": snapshot.roles,
+        "statuses": snapshot.statuses,
+        "now": pd.Timestamp(snapshot.taken_at),
+    }
+
+# --- HELPERS ---
+def round_minutes(micros, count=1):
+    """ROUND(micros / count / 60e6, 2) exactly, rounding half away from zero like PostgreSQL NUMERIC.
+
+    Works on non-negative integer microseconds, so no float error creeps in before rounding.
+    """
+    den = MICROS_PER_HUNDREDTH_MINUTE * np.asarray(count, dtype=np.int64)
+    q, r = np.divmod(np.asarray(micros, dtype=np.int64), den)
+    return (q + (2 * r >= den)) / 100
+
+def _micros(values):
+    return values.astype("datetime64[us]").astype(np.int64)
+
+def messages_by_role(data, role):
+    """Messages written by users of `role`, with the writer's name attached."""
+    users = data["users"]
+    writers = users.loc[users["role_id"] == data["roles"][role], ["user_id", "name"]]
+    return data["messages"].merge(writers, on="user_id")
+
+# --- REPORTS ---
+def active_conversations(data):
+    """Open conversations × their customer and agent participants (derived from messages)."""
+    users = data["users"]
+    pairs = data["messages"][["conversation_id", "user_id"]].drop_duplicates()
+    pairs = pairs.merge(users, on="user_id")
+    customers = pairs.loc[pairs["role_id"] == data["roles"]["Customer"], ["conversation_id", "name"]]
+    agents = pairs.loc[pairs["role_id"] == data["roles"]["Agent"], ["conversation_id", "name"]]
+
+    convos = data["conversations"]
+    open_ids = convos.loc[convos["status_id"] == data["statuses"]["open"], ["conversation_id"]]
+    df = (open_ids
+          .merge(customers.rename(columns={"name": "customer_name"}), on="conversation_id", how="left")
+          .merge(agents.rename(columns={"name": "agent_name"}), on="conversation_id", how="left")
+          .assign(status="open"))
+    return df.drop_duplicates().reset_index(drop=True)
+
+def message_volume(data):
+    msgs = messages_by_role(data, "Customer")
+    now = data["now"]
+    window = msgs[msgs["created_at"].between(now - pd.Timedelta(days=30), now)]
+    df = window.groupby("name").size().rename("message_count").reset_index()
+    df = df.rename(columns={"name": "customer_name"})
+    return df.sort_values("message_count", ascending=False, kind="stable").reset_index(drop=True)
+
+def agent_conversations(data):
+    msgs = messages_by_role(data, "Agent")
+    df = msgs.groupby("name")["conversation_id"].nunique().rename("conversations_handled").reset_index()
+    df = df.rename(columns={"name": "agent_name"})
+    return df.sort_values("conversations_handled", ascending=False, kind="stable").reset_index(drop=True)
+
+def agent_response_times(data):
+    """Gap between each agent message and a directly preceding customer message.
+
+    Sorting by (conversation_id, created_at) and comparing each row with the
+    previous one replaces the SQL LAG window. Ties on created_at are broken by
+    message_id, where SQL leaves the order unspecified.
+    """
+    msgs = data["messages"].merge(data["users"], on="user_id")
+    msgs = msgs.sort_values(["conversation_id", "created_at", "message_id"], kind="stable")
+
+    conv = msgs["conversation_id"].to_numpy()
+    role = msgs["role_id"].to_numpy()
+    ts = _micros(msgs["created_at"]).to_numpy()
+
+    same_conv = np.zeros(len(msgs), dtype=bool)
+    same_conv[1:] = conv[1:] == conv[:-1]
+    prev_role = np.empty_like(role)
+    prev_role[1:] = role[:-1]
+    gap = np.zeros_like(ts)
+    gap[1:] = ts[1:] - ts[:-1]
+
+    mask = same_conv & (role == data["roles"]["Agent"]) & (prev_role == data["roles"]["Customer"])
+    gaps = pd.DataFrame({"agent_name": msgs["name"].to_numpy()[mask], "gap": gap[mask]})
+    stats = gaps.groupby("agent_name")["gap"].agg(["min", "max", "sum", "count"]).reset_index()
+
+    return pd.DataFrame({
+        "agent_name": stats["agent_name"],
+        "min_response_min": round_minutes(stats["min"]),
+        "max_response_min": round_minutes(stats["max"]),
+        "avg_response_min": round_minutes(stats["sum"], stats["count"]),
+    })
+
+def customer_engagement(data):
+    """Customers' participant statistics, over the conversations they last wrote in within the month."""
+    parts = data["participants"]
+    window = parts[(parts["role_id"] == data["roles"]["Customer"])
+                   & (parts["last_message_at"] >= data["now"] - pd.DateOffset(months=1))]
+    df = (window.merge(data["users"][["user_id", "name"]], on="user_id")
+          .groupby("name")
+          .agg(conversations=("conversation_id", "size"), total_messages=("message_count", "sum"))
+          .reset_index()
+          .rename(columns={"name": "customer_name"}))
+    return df.sort_values("total_messages", ascending=False, kind="stable").head(10).reset_index(drop=True)
+
+def conversation_duration(data):
+    convos = data["conversations"]
+    closed = convos.loc[convos["status_id"] == data["statuses"]["closed"], ["conversation_id"]]
+    msgs = data["messages"].merge(closed, on="conversation_id")
+    df = (msgs.groupby("conversation_id")["created_at"]
+          .agg(start_time="min", end_time="max")
+          .reset_index())
+    df["duration_minutes"] = round_minutes(_micros(df["end_time"]) - _micros(df["start_time"]))
+    return df.sort_values("duration_minutes", ascending=False, kind="stable").reset_index(drop=True)
+
+# Same sheets, in the same order, as QUERIES in generate_reports.py
+REPORTS = {
+    "Active Conversations": active_conversations,
+    "Message Volume": message_volume,
+    "Agent Conversations": agent_conversations,
+    "Agent Response Times": agent_response_times,
+    "Customer Engagement": customer_engagement,
+    "Conversation Duration": conversation_duration,
+}
+
+# Sort column and LIMIT of each ordered report, for tie-tolerant comparison
+ORDERING = {
+    "Message Volume": ("message_count", None),
+    "Agent Conversations": ("conversations_handled", None),
+    "Customer Engagement": ("total_messages", 10),
+    "Conversation Duration": ("duration_minutes", None),
+}
+
+def compute_reports(data):
+    """Compute every report from loaded data. Returns {sheet: (DataFrame, stats)} like run_sequential."""
+    results = {}
+    for sheet, report in REPORTS.items():
+        start = time.perf_counter()
+        df = report(data)
+        results[sheet] = (df, {"seconds": time.perf_counter() - start, "rows": len(df)})
+    return results
+
+# --- COMPARISON ---
+def _normalise(df):
+    return df.astype(object).where(df.notna(), None)
+
+def _sorted_rows(df):
+    return sorted(map(tuple, _normalise(df).itertuples(index=False)), key=repr)
+
+def compare_frames(sheet, sql_df, engine_df):
+    """Return a list of differences between the SQL and engine results for one sheet.
+
+    Row order only matters through the ORDER BY column; rows tied on it may come
+    back in any order, and rows tied at a LIMIT cut-off may differ between engines.
+    """
+    if list(sql_df.columns) != list(engine_df.columns):
+        return [f"columns {list(sql_df.columns)} != {list(engine_df.columns)}"]
+    if len(sql_df) != len(engine_df):
+        return [f"{len(sql_df)} rows != {len(engine_df)} rows"]
+
+    order_col, limit = ORDERING.get(sheet, (None, None))
+    if order_col and list(sql_df[order_col]) != list(engine_df[order_col]):
+        return [f"{order_col} sequence differs"]
+
+    if order_col and limit and len(sql_df) == limit:
+        cutoff = sql_df[order_col].iloc[-1]
+        sql_df = sql_df[sql_df[order_col] != cutoff]
+        engine_df = engine_df[engine_df[order_col] != cutoff]
+
+    if _sorted_rows(sql_df) != _sorted_rows(engine_df):
+        return ["row values differ"]
+    return []
+
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compute the report workbook in memory from one load of the chat tables.")
+    parser.add_argument("--output", default=None,
+                        help="Workbook filename (default: chat_reports_engine_<timestamp>.xlsx).")
+    parser.add_argument("--snapshot", default=None,
+                        help="Read from a report_snapshot.py directory instead of the database.")
+    return parser.parse_args()
+
+# --- MAIN ---
+if __name__ == "__main__":
+    args = parse_args()
+    filename = args.output or f"chat_reports_engine_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
+    try:
+        start = time.perf_counter()
+        if args.snapshot:
+            data = load_snapshot_data(args.snapshot)
+        else:
+            conn = chatdb.connect()
+            data = load_data(conn)
+        load_time = time.perf_counter() - start
+        print(f"✅ Loaded {len(data['messages'])} messages, {len(data['users'])} users, "
+              f"{len(data['conversations'])} conversations in {load_time:.2f}s")
+
+        results = compute_reports(data)
+        write_workbook(filename, results)
+        print(f"\n⏱️  Load: {load_time:.2f}s, compute: "
+              f"{sum(s['seconds'] for _, s in results.values()):.2f}s")
+        print(f"📊 Reports saved to: {filename}")
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+    finally:
+        if 'conn' in locals() and conn:
+            conn.close()
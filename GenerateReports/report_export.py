@@ -0,0 +1,180 @@
+import csv
+import gzip
+import json
+import re
+import time
+from openpyxl import Workbook
+
+from report_profile import row_bytes
+
+# --- CONFIGURATION ---
+EXCEL_MAX_ROWS = 1_048_576  # includes the header row
+DEFAULT_FETCH_SIZE = 5000
+
+# --- HELPERS ---
+def slugify(sheet):
+    """File-name friendly version of a sheet name ('Agent Response Times' -> 'agent_response_times')."""
+    return re.sub(r"[^a-z0-9]+", "_", sheet.lower()).strip("_")
+
+def stream_query(conn, query, name, fetch_size=DEFAULT_FETCH_SIZE, counters=None, params=None):
+    """Run `query` on a named server-side cursor and return (cursor.description, chunk iterator).
+
+    Only `fetch_size` rows are held client-side at a time. The connection must
+    already be inside a transaction (see generate_reports.begin_snapshot).
+    If `counters` is given, its "bytes" entry accumulates the bytes fetched.
+    """
+    cur = conn.cursor(name=name)
+    cur.itersize = fetch_size
+    cur.execute(query, params)
+    first = cur.fetchmany(fetch_size)
+    description = cur.description
+
+    def chunks():
+        try:
+            chunk = first
+            while chunk:
+                if counters is not None:
+                    counters["bytes"] = counters.get("bytes", 0) + row_bytes(chunk)
+                yield chunk
+                chunk = cur.fetchmany(fetch_size)
+        finally:
+            cur.close()
+
+    return description, chunks()
+
+# --- WRITERS ---
+def write_csv_gz(path, columns, chunks, header=True):
+    """Write row chunks to a gzip-compressed CSV file and return the row count."""
+    rows = 0
+    with gzip.open(path, "wt", newline="") as f:
+        writer = csv.writer(f)
+        if header:
+            writer.writerow(columns)
+        for chunk in chunks:
+            writer.writerows(chunk)
+            rows += len(chunk)
+    return rows
+
+def arrow_schema(description):
+    """Arrow schema for a result, from the PostgreSQL type OIDs in cursor.description.
+
+    Taking types from the query rather than from the first chunk keeps every row
+    group identical (an all-NULL first chunk would otherwise type a column as null).
+    Types without a mapping here (text, json, interval, ...) are written as strings.
+    """
+    import pyarrow as pa
+
+    types = {
+        16: pa.bool_(),                        # boolean
+        20: pa.int64(), 21: pa.int16(), 23: pa.int32(),
+        700: pa.float32(), 701: pa.float64(),
+        1700: pa.float64(),                    # numeric (ROUND(...)), as the xlsx reports coerce it
+        1082: pa.date32(),
+        1114: pa.timestamp("us"),
+        1184: pa.timestamp("us", tz="UTC"),    # timestamptz
+    }
+    return pa.schema([(col.name, types.get(col.type_code, pa.string())) for col in description])
+
+def _arrow_values(values, arrow_type):
+    import pyarrow as pa
+
+    if pa.types.is_floating(arrow_type):
+        return [None if v is None else float(v) for v in values]
+    if pa.types.is_string(arrow_type):
+        return [v if v is None or isinstance(v, str)
+                else json.dumps(v) if isinstance(v, (dict, list)) else str(v) for v in values]
+    return values
+
+def write_parquet(path, description, chunks):
+    """Write row chunks to a Parquet file one row group per chunk and return the row count."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema(description)
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            arrays = [pa.array(_arrow_values(values, field.type), type=field.type)
+                      for field, values in zip(schema, zip(*chunk))]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(chunk)
+    return rows
+
+class StreamingWorkbook:
+    """Constant-memory xlsx writer built on openpyxl's write-only mode.
+
+    Rows past Excel's sheet limit are spilled to `<base>_<sheet>.csv.gz`.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.workbook = Workbook(write_only=True)
+        self.overflow_files = []
+
+    def add_sheet(self, sheet, columns, chunks):
+        """Append all chunks to a new sheet and return (sheet rows, overflow rows)."""
+        ws = self.workbook.create_sheet(title=sheet)
+        ws.append(columns)
+        capacity = EXCEL_MAX_ROWS - 1
+        written = 0
+
+        for chunk in chunks:
+            room = capacity - written
+            for row in chunk[:room]:
+                ws.append(row)
+            written += min(len(chunk), room)
+            if len(chunk) > room:
+                overflow = self._overflow_path(sheet)
+                spilled = write_csv_gz(overflow, columns, _prepend(chunk[room:], chunks))
+                self.overflow_files.append(overflow)
+                print(f"⚠️  {sheet} exceeds Excel's row limit; {spilled} rows spilled to {overflow}")
+                return written, spilled
+        return written, 0
+
+    def save(self):
+        self.workbook.save(self.filename)
+
+    def _overflow_path(self, sheet):
+        base = self.filename.rsplit(".", 1)[0]
+        return f"{base}_{slugify(sheet)}.csv.gz"
+
+def _prepend(first, chunks):
+    yield first
+    yield from chunks
+
+# --- EXPORT ---
+def export_streaming(conn, queries, base_name, fmt="xlsx", fetch_size=DEFAULT_FETCH_SIZE, params=None):
+    """Stream every report to disk in `fmt` (xlsx, csv or parquet) with bounded memory.
+
+    Returns {sheet: {"seconds", "rows", "bytes"}} and the list of files written.
+    """
+    results = {}
+    files = []
+    workbook = StreamingWorkbook(f"{base_name}.xlsx") if fmt == "xlsx" else None
+
+    for index, (sheet, query) in enumerate(queries.items()):
+        start = time.perf_counter()
+        counters = {"bytes": 0}
+        description, chunks = stream_query(conn, query, f"report_{index}", fetch_size, counters, params)
+        columns = [col.name for col in description]
+        if fmt == "xlsx":
+            rows, overflow = workbook.add_sheet(sheet, columns, chunks)
+            rows += overflow
+        elif fmt == "csv":
+            path = f"{base_name}_{slugify(sheet)}.csv.gz"
+            rows = write_csv_gz(path, columns, chunks)
+            files.append(path)
+        elif fmt == "parquet":
+            path = f"{base_name}_{slugify(sheet)}.parquet"
+            rows = write_parquet(path, description, chunks)
+            files.append(path)
+        else:
+            raise ValueError(f"Unsupported export format '{fmt}'.")
+        results[sheet] = {"seconds": time.perf_counter() - start, "rows": rows,
+                          "bytes": counters["bytes"]}
+        print(f"✅ Streamed {sheet} ({rows} rows, {results[sheet]['seconds']:.2f}s)")
+
+    if workbook is not None:
+        workbook.save()
+        files = [workbook.filename] + workbook.overflow_files
+    return results, files
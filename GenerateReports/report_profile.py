@@ -0,0 +1,130 @@
+import argparse
+import hashlib
+import json
+import sys
+from datetime import datetime
+
+# --- CONFIGURATION ---
+DEFAULT_TIME_THRESHOLD = 1.5  # flag a report when it gets this many times slower
+DEFAULT_MIN_SECONDS = 0.05    # ...and at least this much slower in absolute terms
+
+# --- MEASUREMENT ---
+def row_bytes(rows):
+    """Approximate bytes fetched for a list of rows (text length of every non-NULL value)."""
+    return sum(len(str(v).encode()) for row in rows for v in row if v is not None)
+
+def explain_query(conn, query, params=None):
+    """Return the EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) plan for `query`.
+
+    This executes the query a second time, inside the caller's transaction.
+    """
+    with conn.cursor() as cur:
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query.strip().rstrip(";"), params)
+        return cur.fetchone()[0][0]
+
+def query_hash(query):
+    """Short stable fingerprint of a query's text, to spot when a report's SQL changed."""
+    return hashlib.sha1(" ".join(query.split()).encode()).hexdigest()[:12]
+
+def plan_shape(plan):
+    """Flatten a JSON plan into its node types (depth-first), e.g. ['Sort', 'HashAggregate', ...]."""
+    def walk(node):
+        yield node["Node Type"]
+        for child in node.get("Plans", []):
+            yield from walk(child)
+    return list(walk(plan["Plan"])) if plan else []
+
+def collapse_shape(shape):
+    """Collapse runs of identical sibling nodes (one scan per partition) into (node, count) pairs."""
+    collapsed = []
+    for node in shape:
+        if collapsed and collapsed[-1][0] == node:
+            collapsed[-1] = (node, collapsed[-1][1] + 1)
+        else:
+            collapsed.append((node, 1))
+    return collapsed
+
+def describe_shape(collapsed):
+    """Readable one-line form of a collapsed plan shape."""
+    return " > ".join(node if count == 1 else f"{node}×{count}" for node, count in collapsed)
+
+# --- SIDECAR ---
+def write_sidecar(path, queries, stats, mode):
+    """Write per-report timings, row counts, bytes and optional plans next to the report."""
+    payload = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "mode": mode,
+        "reports": {
+            sheet: {"query_hash": query_hash(queries[sheet]), **stats[sheet]}
+            for sheet in queries if sheet in stats
+        },
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2, default=str)
+    return path
+
+def load_sidecar(path):
+    with open(path) as f:
+        return json.load(f)
+
+# --- COMPARISON ---
+def compare_runs(baseline, current, time_threshold=DEFAULT_TIME_THRESHOLD,
+                 min_seconds=DEFAULT_MIN_SECONDS):
+    """Compare two sidecars and return a list of (sheet, severity, message) findings.
+
+    Severity is 'regression' for slowdowns and plan changes, 'info' otherwise.
+    """
+    findings = []
+    for sheet, cur in current["reports"].items():
+        base = baseline["reports"].get(sheet)
+        if base is None:
+            findings.append((sheet, "info", "new report (no baseline)"))
+            continue
+
+        if base.get("query_hash") != cur.get("query_hash"):
+            findings.append((sheet, "info", "query text changed since baseline"))
+
+        t_base, t_cur = base["seconds"], cur["seconds"]
+        if t_cur > t_base * time_threshold and t_cur - t_base >= min_seconds:
+            findings.append((sheet, "regression",
+                             f"{t_base:.3f}s → {t_cur:.3f}s ({t_cur / max(t_base, 1e-9):.1f}x slower)"))
+
+        if base.get("rows") != cur.get("rows"):
+            findings.append((sheet, "info", f"rows {base.get('rows')} → {cur.get('rows')}"))
+
+        # Partition counts may grow between runs, so only the node sequence is compared
+        base_shape = collapse_shape(plan_shape(base.get("plan")))
+        cur_shape = collapse_shape(plan_shape(cur.get("plan")))
+        if base_shape and cur_shape and [n for n, _ in base_shape] != [n for n, _ in cur_shape]:
+            findings.append((sheet, "regression",
+                             f"plan changed: {describe_shape(base_shape)}  ⇒  {describe_shape(cur_shape)}"))
+
+    for sheet in baseline["reports"]:
+        if sheet not in current["reports"]:
+            findings.append((sheet, "info", "missing from current run"))
+    return findings
+
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare a report profile against a saved baseline.")
+    parser.add_argument("baseline", help="Sidecar JSON from a known-good run.")
+    parser.add_argument("current", help="Sidecar JSON from the run to check.")
+    parser.add_argument("--time-threshold", type=float, default=DEFAULT_TIME_THRESHOLD,
+                        help="Slowdown ratio that counts as a regression.")
+    parser.add_argument("--min-seconds", type=float, default=DEFAULT_MIN_SECONDS,
+                        help="Ignore slowdowns smaller than this many seconds.")
+    return parser.parse_args()
+
+# --- MAIN ---
+if __name__ == "__main__":
+    args = parse_args()
+    findings = compare_runs(load_sidecar(args.baseline), load_sidecar(args.current),
+                            args.time_threshold, args.min_seconds)
+
+    for sheet, severity, message in findings:
+        icon = "❌" if severity == "regression" else "ℹ️ "
+        print(f"{icon} {sheet}: {message}")
+
+    regressions = sum(1 for _, severity, _ in findings if severity == "regression")
+    print(f"\n{'❌' if regressions else '✅'} {regressions} regression(s) against {args.baseline}")
+    sys.exit(1 if regressions else 0)
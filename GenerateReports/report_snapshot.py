@@ -0,0 +1,229 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatdb
+from generate_reports import begin_snapshot
+from report_export import stream_query
+
+# --- CONFIGURATION ---
+FORMAT_VERSION = 2
+DEFAULT_FETCH_SIZE = 50000
+NULL_TIMESTAMP = np.iinfo(np.int64).min  # reads back as NaT when viewed as datetime64[us]
+
+# Column kinds: "int32"/"int64" are stored as-is, "timestamp" as int64 microseconds
+# since the epoch, "text" as UTF-8 bytes in a blob plus an offsets array.
+SNAPSHOT_TABLES = {
+    "users": {
+        "order_by": "user_id",
+        "columns": [("user_id", "int32"), ("role_id", "int32"), ("created_at", "timestamp"),
+                    ("updated_at", "timestamp"), ("name", "text"), ("details", "text")],
+    },
+    "conversations": {
+        "order_by": "conversation_id",
+        "columns": [("conversation_id", "int32"), ("status_id", "int32"),
+                    ("started_at", "timestamp"), ("ended_at", "timestamp")],
+    },
+    "conversation_participants": {
+        "order_by": "conversation_id, user_id",
+        "columns": [("conversation_id", "int32"), ("user_id", "int32"), ("role_id", "int32"),
+                    ("message_count", "int32"), ("last_message_at", "timestamp")],
+    },
+    "messages": {
+        "order_by": "message_id",
+        "columns": [("message_id", "int32"), ("conversation_id", "int32"), ("user_id", "int32"),
+                    ("created_at", "timestamp"), ("content", "text")],
+    },
+}
+
+# --- HELPERS ---
+def _select_expr(column, kind):
+    if kind == "timestamp":
+        return f"COALESCE((EXTRACT(EPOCH FROM {column}) * 1000000)::int8, {NULL_TIMESTAMP})"
+    if kind == "text":
+        return f"COALESCE({column}::text, '')"
+    return column
+
+def _paths(directory, table, column, kind):
+    base = os.path.join(directory, f"{table}.{column}")
+    if kind == "text":
+        return {"offsets": f"{base}.offsets.npy", "blob": f"{base}.bin"}
+    return {"values": f"{base}.npy"}
+
+# --- EXPORT ---
+def export_table(conn, directory, table, spec, fetch_size=DEFAULT_FETCH_SIZE):
+    """Write one table into per-column files; the row count is taken in the same snapshot."""
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT COUNT(*) FROM {table};")
+        count = cur.fetchone()[0]
+
+    arrays, blobs, positions = {}, {}, {}
+    for column, kind in spec["columns"]:
+        paths = _paths(directory, table, column, kind)
+        if kind == "text":
+            offsets = np.lib.format.open_memmap(paths["offsets"], mode="w+", dtype=np.int64, shape=(count + 1,))
+            offsets[0] = 0
+            arrays[column] = offsets
+            blobs[column] = open(paths["blob"], "wb")
+            positions[column] = 0
+        else:
+            dtype = np.int64 if kind == "timestamp" else np.dtype(kind)
+            arrays[column] = np.lib.format.open_memmap(paths["values"], mode="w+", dtype=dtype, shape=(count,))
+
+    query = (f"SELECT {', '.join(_select_expr(c, k) for c, k in spec['columns'])} "
+             f"FROM {table} ORDER BY {spec['order_by']}")
+    _, chunks = stream_query(conn, query, f"snapshot_{table}", fetch_size)
+    row = 0
+    try:
+        for chunk in chunks:
+            n = len(chunk)
+            if row + n > count:
+                raise RuntimeError(f"{table} returned more rows than COUNT(*) = {count}")
+            for (column, kind), values in zip(spec["columns"], zip(*chunk)):
+                if kind == "text":
+                    encoded = [v.encode() for v in values]
+                    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=n)
+                    arrays[column][row + 1:row + n + 1] = positions[column] + np.cumsum(lengths)
+                    positions[column] = int(arrays[column][row + n])
+                    blobs[column].write(b"".join(encoded))
+                else:
+                    arrays[column][row:row + n] = values
+            row += n
+    finally:
+        for blob in blobs.values():
+            blob.close()
+    for array in arrays.values():
+        array.flush()
+    if row != count:
+        raise RuntimeError(f"{table} returned {row} rows, expected {count}")
+
+    return {"rows": count, "order_by": spec["order_by"],
+            "columns": {column: {"kind": kind, **{k: os.path.basename(p) for k, p in
+                                                  _paths(directory, table, column, kind).items()}}
+                        for column, kind in spec["columns"]}}
+
+def export_snapshot(conn, directory, fetch_size=DEFAULT_FETCH_SIZE):
+    """Export users, conversations, participants and messages from one consistent snapshot into `directory`.
+
+    The manifest is written last, so a directory without one is an incomplete export.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, "manifest.json")
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    begin_snapshot(conn)
+    with conn.cursor() as cur:
+        cur.execute("SELECT LOCALTIMESTAMP;")
+        taken_at = cur.fetchone()[0]
+    roles, statuses = chatdb.role_ids(conn), chatdb.status_ids(conn)
+
+    tables = {}
+    for table, spec in SNAPSHOT_TABLES.items():
+        start = time.perf_counter()
+        tables[table] = export_table(conn, directory, table, spec, fetch_size)
+        print(f"✅ Exported {tables[table]['rows']} {table} rows in {time.perf_counter() - start:.2f}s")
+    conn.rollback()
+
+    manifest = {"format_version": FORMAT_VERSION, "taken_at": taken_at.isoformat(),
+                "roles": roles, "statuses": statuses, "tables": tables}
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+# --- LOADING ---
+class TextColumn:
+    """Zero-copy view of a text column: values are decoded from the blob on access."""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode()
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+class Snapshot:
+    """A snapshot directory opened for reading. Column files are memory-mapped on first use."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        if self.manifest["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"unsupported snapshot format {self.manifest['format_version']}")
+        self.taken_at = datetime.fromisoformat(self.manifest["taken_at"])
+        self.roles = self.manifest["roles"]
+        self.statuses = self.manifest["statuses"]
+
+    def rows(self, table):
+        return self.manifest["tables"][table]["rows"]
+
+    def _file(self, name):
+        return os.path.join(self.directory, name)
+
+    def column(self, table, column):
+        """Memory-mapped NumPy array (timestamps as datetime64[us]) or a TextColumn."""
+        meta = self.manifest["tables"][table]["columns"][column]
+        if meta["kind"] == "text":
+            offsets = np.load(self._file(meta["offsets"]), mmap_mode="r")
+            size = int(offsets[-1])
+            blob = np.memmap(self._file(meta["blob"]), dtype=np.uint8, mode="r") if size else np.empty(0, np.uint8)
+            return TextColumn(offsets, blob)
+        values = np.load(self._file(meta["values"]), mmap_mode="r")
+        return values.view("datetime64[us]") if meta["kind"] == "timestamp" else values
+
+    def frame(self, table, columns):
+        """pandas DataFrame of the given columns (text columns are decoded into Python strings)."""
+        import pandas as pd
+        data = {}
+        for column in columns:
+            values = self.column(table, column)
+            data[column] = list(values) if isinstance(values, TextColumn) else values
+        return pd.DataFrame(data)
+
+def open_snapshot(directory):
+    return Snapshot(directory)
+
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export or inspect a memory-mapped snapshot of the chat database.")
+    parser.add_argument("command", choices=["export", "info"])
+    parser.add_argument("directory", help="Snapshot directory.")
+    parser.add_argument("--fetch-size", type=int, default=DEFAULT_FETCH_SIZE,
+                        help="Rows fetched per round trip when exporting.")
+    return parser.parse_args()
+
+# --- MAIN ---
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "info":
+        start = time.perf_counter()
+        snapshot = open_snapshot(args.directory)
+        print(f"📦 Snapshot taken at {snapshot.taken_at} "
+              f"(opened in {(time.perf_counter() - start) * 1000:.1f}ms)")
+        for table in snapshot.manifest["tables"]:
+            print(f"   {table}: {snapshot.rows(table)} rows")
+    else:
+        try:
+            conn = chatdb.connect()
+            start = time.perf_counter()
+            export_snapshot(conn, args.directory, args.fetch_size)
+            print(f"\n⏱️  Total: {time.perf_counter() - start:.2f}s")
+            print(f"📦 Snapshot saved to: {args.directory}")
+        except Exception as e:
+            print(f"❌ Error: {e}")
+        finally:
+            if 'conn' in locals() and conn:
+                conn.close()
@@ -0,0 +1,447 @@
+import argparse
+import asyncio
+import csv
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "GenerateReports"))
+sys.path.insert(0, ROOT)
+import chatdb
+from PopulateDatabase.synthetic import customer_messages, make_rng, reply_messages
+from generate_reports import QUERIES, SUMMARY_QUERIES, report_params, run_report
+from report_profile import query_hash
+
+# --- CONFIG ---
+DEFAULT_CHATS = 50            # concurrent simulated conversations
+DEFAULT_RATE = 200.0          # target messages/sec across all chats
+DEFAULT_DURATION = 30.0       # seconds
+DEFAULT_CONNECTIONS = 8       # pooled connections shared by the chats
+DEFAULT_REPORT_WORKERS = 1    # threads running report queries back to back
+DEFAULT_SEED = 42
+HISTOGRAM_MIN = 1e-5          # 10µs; anything faster lands in the first bucket
+BUCKETS_PER_DECADE = 20       # bucket edges 12% apart, so percentiles are within ~6%
+SCHEMA_TABLES = ["messages", "conversations", "users", "conversation_participants"]
+
+# --- HISTOGRAMS ---
+class LatencyHistogram:
+    """Log-bucketed latency histogram (seconds) with constant memory; histograms merge by adding counts."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @staticmethod
+    def bucket(seconds):
+        if seconds <= HISTOGRAM_MIN:
+            return 0
+        return int(math.log10(seconds / HISTOGRAM_MIN) * BUCKETS_PER_DECADE) + 1
+
+    @staticmethod
+    def bucket_bounds(index):
+        """(low, high) seconds covered by bucket `index`."""
+        if index == 0:
+            return 0.0, HISTOGRAM_MIN
+        return (HISTOGRAM_MIN * 10 ** ((index - 1) / BUCKETS_PER_DECADE),
+                HISTOGRAM_MIN * 10 ** (index / BUCKETS_PER_DECADE))
+
+    def record(self, seconds):
+        self.counts[self.bucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentile(self, pct):
+        """Upper edge of the bucket holding the pct-th percentile (capped at the observed max)."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(pct / 100 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self.bucket_bounds(index)[1], self.max)
+        return self.max
+
+    def summary(self, seconds):
+        """Count, rate over `seconds` and latency percentiles in milliseconds."""
+        return {
+            "count": self.count,
+            "per_sec": self.count / seconds if seconds > 0 else 0,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0,
+            **{f"p{p}_ms".replace(".", ""): self.percentile(p) * 1000 for p in (50, 90, 99, 99.9)},
+            "max_ms": self.max * 1000,
+        }
+
+class Recorder:
+    """Histograms, error counts and a per-second timeline for one thread (or the event loop)."""
+
+    def __init__(self, started_at, warmup):
+        self.started_at = started_at
+        self.measure_from = started_at + warmup
+        self.histograms = {}
+        self.errors = Counter()
+        self.timeline = Counter()
+        self.finished_at = self.measure_from
+
+    @property
+    def seconds(self):
+        """Measured wall time: from the end of warm-up to the last recorded operation."""
+        return self.finished_at - self.measure_from
+
+    def record(self, op, begin, end, error=None):
+        """Record one operation; ones finishing during warm-up are ignored."""
+        if end < self.measure_from:
+            return
+        self.finished_at = max(self.finished_at, end)
+        if not op.endswith("_scheduled"):
+            self.timeline[(int(end - self.started_at), op.split(":")[0], "error" if error else "ok")] += 1
+        if error:
+            self.errors[op] += 1
+            return
+        self.histograms.setdefault(op, LatencyHistogram()).record(end - begin)
+
+    def merge(self, other):
+        for op, histogram in other.histograms.items():
+            self.histograms.setdefault(op, LatencyHistogram()).merge(histogram)
+        self.errors.update(other.errors)
+        self.timeline.update(other.timeline)
+        self.finished_at = max(self.finished_at, other.finished_at)
+        return self
+
+# --- DB FUNCTIONS ---
+def load_participants(conn):
+    """Customer and agent user_ids to chat as."""
+    customers = chatdb.users_with_role(conn, chatdb.role_id(conn, "Customer"))
+    agents = chatdb.users_with_role(conn, chatdb.role_id(conn, "Agent"))
+    if not customers or not agents:
+        raise RuntimeError("no customers/agents to chat as; populate the database first")
+    return customers, agents
+
+def schema_fingerprint(conn):
+    """Index definitions on the tables the load touches, to tell runs on different schemas apart."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT indexname, indexdef FROM pg_indexes
+            WHERE tablename = ANY(%s) ORDER BY indexname;
+        """, (SCHEMA_TABLES,))
+        return dict(cur.fetchall())
+
+def open_conversation(pool, status_id):
+    conn = pool.getconn()
+    try:
+        with conn:
+            return chatdb.insert_conversation(conn, status_id)
+    finally:
+        pool.putconn(conn, close=conn.closed != 0)
+
+def send_message(pool, conversation_id, user_id, content):
+    """One chat message in its own transaction, as the chat service writes them."""
+    conn = pool.getconn()
+    try:
+        with conn:
+            chatdb.execute(conn, "chatdb_insert_message", (conversation_id, user_id, content, None))
+    finally:
+        pool.putconn(conn, close=conn.closed != 0)
+
+def close_conversation(pool, conversation_id, status_id):
+    conn = pool.getconn()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute("UPDATE conversations SET status_id = %s WHERE conversation_id = %s;",
+                        (status_id, conversation_id))
+    finally:
+        pool.putconn(conn, close=conn.closed != 0)
+
+def delete_conversations(conversation_ids):
+    """Remove what the run wrote (messages and participants go with their conversation)."""
+    conn = chatdb.connect()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM conversations WHERE conversation_id = ANY(%s);", (list(conversation_ids),))
+            return cur.rowcount
+    finally:
+        conn.close()
+
+# --- CHATS ---
+def plan_chat(rng, conversation_id, customers, agents):
+    """(user_id, content) for one conversation: a customer's opening messages, then alternating replies.
+
+    Uses the populate scripts' generators; their timestamps are dropped because
+    the load test writes messages live.
+    """
+    customer = customers[int(rng.integers(0, len(customers)))]
+    _, opening_users, opening_text, _ = customer_messages(rng, [conversation_id], [customer])
+    _, reply_users, reply_text, _ = reply_messages(rng, [conversation_id], [np.datetime64("now")],
+                                                   [customer], agents)
+    return list(zip(np.concatenate([opening_users, reply_users]).tolist(),
+                    np.concatenate([opening_text, reply_text]).tolist()))
+
+async def run_chat(index, ctx):
+    """Open, fill and close conversations until the deadline, sending messages on an open-loop schedule.
+
+    Sends are due at exponentially spaced times averaging `chats / rate` apart.
+    A send that is due while the previous one is still running goes out late, and
+    `message_scheduled` measures from when it was due, so a slow database shows up
+    as latency instead of silently lowering the offered load.
+    """
+    rng = make_rng(ctx.seed + index)
+    due = time.perf_counter() + rng.uniform(0, ctx.interval)
+    while due < ctx.deadline:
+        conversation_id = await ctx.timed("conversation", open_conversation, ctx.pool, ctx.open_status)
+        if conversation_id is None:
+            # Failed (and counted); back off to the next due time rather than spin
+            due += rng.exponential(ctx.interval)
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            continue
+        ctx.conversations.append(conversation_id)
+
+        for user_id, content in plan_chat(rng, conversation_id, ctx.customers, ctx.agents):
+            if due >= ctx.deadline:
+                return
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            await ctx.timed("message", send_message, ctx.pool, conversation_id, user_id, content, due=due)
+            due += rng.exponential(ctx.interval)
+
+        await ctx.timed("close", close_conversation, ctx.pool, conversation_id, ctx.closed_status)
+
+class ChatContext:
+    """State shared by the chat coroutines; runs DB calls on the executor and records their latency."""
+
+    def __init__(self, args, pool, executor, recorder, deadline, customers, agents, open_status, closed_status):
+        self.pool, self.executor, self.recorder = pool, executor, recorder
+        self.deadline = deadline
+        self.interval = args.chats / args.rate
+        self.seed = args.seed
+        self.customers, self.agents = customers, agents
+        self.open_status, self.closed_status = open_status, closed_status
+        self.conversations = []
+
+    async def timed(self, op, fn, *args, due=None):
+        loop = asyncio.get_running_loop()
+        begin = time.perf_counter()
+        try:
+            result, error = await loop.run_in_executor(self.executor, fn, *args), None
+        except Exception as e:
+            result, error = None, e
+        end = time.perf_counter()
+        self.recorder.record(op, begin, end, error)
+        if due is not None:
+            self.recorder.record(f"{op}_scheduled", min(begin, due), end, error)
+        return result
+
+# --- REPORTS ---
+def report_worker(pool, queries, deadline, recorder, interval, stop):
+    """Run the report queries round-robin until the deadline, one short transaction each."""
+    conn = pool.getconn()
+    try:
+        while time.perf_counter() < deadline and not stop.is_set():
+            params = report_params(conn)  # moves the report windows' end along with the clock
+            conn.rollback()
+            for sheet, query in queries.items():
+                if time.perf_counter() >= deadline or stop.is_set():
+                    break
+                begin = time.perf_counter()
+                try:
+                    run_report(conn, query, params)
+                    error = None
+                except Exception as e:
+                    error = e
+                finally:
+                    conn.rollback()
+                end = time.perf_counter()
+                recorder.record(f"report:{sheet}", begin, end, error)
+                recorder.record("report", begin, end, error)
+                if interval:
+                    stop.wait(interval)
+    finally:
+        pool.putconn(conn, close=conn.closed != 0)
+
+# --- RUN ---
+async def run_chats(args, pool, recorder, deadline, customers, agents, open_status, closed_status):
+    with ThreadPoolExecutor(max_workers=args.connections) as executor:
+        ctx = ChatContext(args, pool, executor, recorder, deadline, customers, agents, open_status, closed_status)
+        await asyncio.gather(*(run_chat(i, ctx) for i in range(args.chats)))
+    return ctx.conversations
+
+def run_load(args, queries):
+    """Run chats and report workers together; returns (merged Recorder, conversation ids written)."""
+    conn = chatdb.connect()
+    try:
+        customers, agents = load_participants(conn)
+        open_status, closed_status = chatdb.status_id(conn, "open"), chatdb.status_id(conn, "closed")
+    finally:
+        conn.close()
+
+    pool = chatdb.create_pool(1, args.connections + args.report_workers)
+    started_at = time.perf_counter()
+    deadline = started_at + args.warmup + args.duration
+    stop = threading.Event()
+    report_recorders = [Recorder(started_at, args.warmup) for _ in range(args.report_workers)]
+    threads = [threading.Thread(target=report_worker,
+                                args=(pool, queries, deadline, r, args.report_interval, stop), daemon=True)
+               for r in report_recorders]
+    try:
+        for thread in threads:
+            thread.start()
+        recorder = Recorder(started_at, args.warmup)
+        conversations = asyncio.run(run_chats(args, pool, recorder, deadline, customers, agents,
+                                              open_status, closed_status))
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        stop.set()
+        pool.closeall()
+    for r in report_recorders:
+        recorder.merge(r)
+    return recorder, conversations
+
+# --- RESULTS ---
+def build_results(args, recorder, queries, schema):
+    # Sends due before the deadline still go out, so an overloaded run ends late
+    seconds = max(recorder.seconds, args.duration)
+    operations = {op: {**recorder.histograms[op].summary(seconds), "errors": recorder.errors[op]}
+                  for op in sorted(recorder.histograms)}
+    for op in recorder.errors:
+        operations.setdefault(op, {**LatencyHistogram().summary(seconds), "errors": recorder.errors[op]})
+    return {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "config": vars(args),
+        "schema": schema,
+        "query_hashes": {sheet: query_hash(query) for sheet, query in queries.items()},
+        "measured_seconds": seconds,
+        "throughput": {
+            "target_messages_per_sec": args.rate,
+            "messages_per_sec": operations.get("message", {}).get("per_sec", 0),
+            "reports_per_sec": operations.get("report", {}).get("per_sec", 0),
+        },
+        "operations": operations,
+    }
+
+def write_results(prefix, results, recorder):
+    """Write <prefix>.json, <prefix>_histograms.csv and <prefix>_timeline.csv; returns the paths."""
+    paths = [f"{prefix}.json", f"{prefix}_histograms.csv", f"{prefix}_timeline.csv"]
+    with open(paths[0], "w") as f:
+        json.dump(results, f, indent=2, default=str)
+    with open(paths[1], "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["operation", "bucket_low_ms", "bucket_high_ms", "count"])
+        for op in sorted(recorder.histograms):
+            for index, count in sorted(recorder.histograms[op].counts.items()):
+                low, high = LatencyHistogram.bucket_bounds(index)
+                writer.writerow([op, f"{low * 1000:.4f}", f"{high * 1000:.4f}", count])
+    with open(paths[2], "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["second", "operation", "outcome", "count"])
+        for (second, op, outcome), count in sorted(recorder.timeline.items()):
+            writer.writerow([second, op, outcome, count])
+    return paths
+
+def print_results(results):
+    t = results["throughput"]
+    print(f"⏱️  Messages: {t['messages_per_sec']:,.1f}/sec (target {t['target_messages_per_sec']:,.0f}), "
+          f"reports: {t['reports_per_sec']:,.2f}/sec over {results['measured_seconds']:.0f}s")
+    print(f"{'Operation':<40}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}{'p99.9 ms':>10}{'max ms':>10}")
+    for op, s in results["operations"].items():
+        print(f"{op:<40}{s['count']:>8}{s['errors']:>8}{s['p50_ms']:>10.2f}{s['p99_ms']:>10.2f}"
+              f"{s['p999_ms']:>10.2f}{s['max_ms']:>10.2f}")
+
+def compare_results(baseline, current):
+    """Print what changed between two result files: settings, indexes, then per-operation latency and rate."""
+    for key in ("chats", "rate", "duration", "connections", "report_workers", "summary_reports"):
+        if baseline["config"].get(key) != current["config"].get(key):
+            print(f"ℹ️  {key}: {baseline['config'].get(key)} → {current['config'].get(key)}")
+    for name in sorted(set(baseline["schema"]) - set(current["schema"])):
+        print(f"ℹ️  index dropped: {name}")
+    for name in sorted(set(current["schema"]) - set(baseline["schema"])):
+        print(f"ℹ️  index added: {name}")
+
+    print(f"{'Operation':<40}{'p50 ms':>20}{'p99 ms':>20}{'per sec':>20}")
+    for op, cur in current["operations"].items():
+        base = baseline["operations"].get(op)
+        if base is None:
+            print(f"{op:<40}  (no baseline)")
+            continue
+        cells = [f"{base[k]:.2f}→{cur[k]:.2f}" for k in ("p50_ms", "p99_ms", "per_sec")]
+        print(f"{op:<40}" + "".join(f"{c:>20}" for c in cells))
+
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Simulate concurrent customer/agent chats at a target message rate while the report "
+                    "queries run, and record latency histograms and throughput. Writes to the database; "
+                    "run it against a test copy.")
+    parser.add_argument("--chats", type=int, default=DEFAULT_CHATS, help="Concurrent simulated conversations.")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Target messages/sec across all chats.")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="Measured seconds.")
+    parser.add_argument("--warmup", type=float, default=0.0,
+                        help="Seconds to run before measuring (not counted in the results).")
+    parser.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS,
+                        help="Pooled connections the chats share.")
+    parser.add_argument("--report-workers", type=int, default=DEFAULT_REPORT_WORKERS,
+                        help="Threads running the report queries concurrently (0 for writes only).")
+    parser.add_argument("--report-interval", type=float, default=0.0,
+                        help="Pause between report queries on each worker.")
+    parser.add_argument("--summary-reports", action="store_true",
+                        help="Run the summary-table versions of the reports (as --incremental does).")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Seed for the chat generators.")
+    parser.add_argument("--output", default=None,
+                        help="Prefix for the result files (default load_test_<timestamp>).")
+    parser.add_argument("--baseline", default=None, help="Earlier result JSON to compare this run against.")
+    parser.add_argument("--cleanup", action="store_true",
+                        help="Delete the conversations (and messages) written by the run afterwards.")
+    return parser.parse_args()
+
+# --- MAIN ---
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        queries = QUERIES
+        if args.summary_reports:
+            queries = {sheet: SUMMARY_QUERIES.get(sheet, query) for sheet, query in QUERIES.items()}
+
+        conn = chatdb.connect()
+        try:
+            schema = schema_fingerprint(conn)
+        finally:
+            conn.close()
+
+        print(f"🚀 {args.chats} chats at {args.rate:,.0f} msgs/sec, {args.report_workers} report worker(s), "
+              f"{args.warmup:.0f}s warm-up + {args.duration:.0f}s")
+        recorder, conversations = run_load(args, queries)
+        results = build_results(args, recorder, queries, schema)
+        print_results(results)
+
+        paths = write_results(args.output or f"load_test_{datetime.now().strftime('%Y%m%d_%H%M')}",
+                              results, recorder)
+        print("📊 Results saved to: " + ", ".join(paths))
+
+        if args.baseline:
+            with open(args.baseline) as f:
+                print(f"\n🔎 Compared with {args.baseline}:")
+                compare_results(json.load(f), results)
+
+        if args.cleanup:
+            print(f"🧹 Deleted {delete_conversations(conversations)} conversations written by the run")
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
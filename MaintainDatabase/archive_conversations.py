@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from psycopg2 import errors
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatdb
+from ChatService.conversation_archive import DEFAULT_ARCHIVE_DIR, write_chunk
+
+# --- CONFIGURATION ---
+DEFAULT_AGE_DAYS = 90
+DEFAULT_BATCH_SIZE = 500     # conversations moved per transaction (and per archive chunk)
+LOCK_TIMEOUT = "2s"          # give up on a batch rather than queue behind (or ahead of) other writers
+ADVISORY_LOCK = 240024       # one archive run at a time
+
+# Closed conversations that ended before the cutoff. Rows a writer holds are
+# skipped; the row locks also make concurrent inserts of their messages wait.
+BATCH_SQL = """
+    SELECT conversation_id, status_id, started_at, ended_at, first_message_at, last_message_at,
+           message_count, customer_message_count, agent_message_count
+    FROM conversations
+    WHERE status_id = %(closed_status)s
+      AND ended_at < %(cutoff)s
+    ORDER BY conversation_id
+    LIMIT %(batch_size)s
+    FOR UPDATE SKIP LOCKED;
+"""
+
+MESSAGES_SQL = """
+    SELECT message_id, conversation_id, user_id, content::text, created_at
+    FROM messages
+    WHERE conversation_id = ANY(%s)
+    ORDER BY conversation_id, created_at, message_id;
+"""
+
+PARTICIPANTS_SQL = """
+    SELECT conversation_id,
+           json_agg(json_build_object('user_id', user_id, 'role_id', role_id, 'joined_at', joined_at,
+                                      'message_count', message_count, 'last_message_at', last_message_at)
+                    ORDER BY joined_at, user_id)
+    FROM conversation_participants
+    WHERE conversation_id = ANY(%s)
+    GROUP BY conversation_id;
+"""
+
+# Take the archived conversations back out of the count summaries of
+# 09_create_report_summaries.sql, so --incremental reports what is still in messages.
+# Only messages already folded in (message_id <= the summaries' watermark) were counted.
+# The response-time summaries keep archived history: min/max and the t-digest cannot
+# have values taken back out.
+WATERMARK_SQL = """
+    SELECT COALESCE((SELECT last_message_id FROM report_watermarks
+                     WHERE name = 'report_summaries' FOR UPDATE), 0);
+"""
+
+UNFOLD_AGENT_CONVERSATIONS_SQL = """
+    UPDATE agent_conversation_summary s
+    SET conversations_handled = s.conversations_handled - n.conversations
+    FROM (
+        SELECT m.user_id, COUNT(DISTINCT m.conversation_id) AS conversations
+        FROM messages m
+        JOIN users u ON u.user_id = m.user_id
+        WHERE m.conversation_id = ANY(%(ids)s)
+          AND m.message_id <= %(watermark)s
+          AND u.role_id = %(agent_role)s
+        GROUP BY m.user_id
+    ) n
+    WHERE s.user_id = n.user_id;
+"""
+
+UNFOLD_CUSTOMER_MESSAGES_SQL = """
+    DELETE FROM customer_message_summary s
+    USING (
+        SELECT DISTINCT user_id, created_at::date AS day, conversation_id
+        FROM messages
+        WHERE conversation_id = ANY(%(ids)s)
+          AND message_id <= %(watermark)s
+    ) n
+    WHERE s.user_id = n.user_id AND s.day = n.day AND s.conversation_id = n.conversation_id;
+"""
+
+INSERT_ARCHIVED_SQL = """
+    INSERT INTO archived_conversations (
+        conversation_id, status_id, started_at, ended_at, first_message_at, last_message_at,
+        message_count, customer_message_count, agent_message_count, participants,
+        archive_file, row_offset, row_count
+    ) VALUES %s
+"""
+
+# --- ARCHIVING ---
+def unfold_summaries(cur, ids, agent_role):
+    """Subtract the conversations `ids` from the report summaries they were folded into."""
+    cur.execute(WATERMARK_SQL)
+    params = {"ids": ids, "watermark": cur.fetchone()[0], "agent_role": agent_role}
+    cur.execute(UNFOLD_AGENT_CONVERSATIONS_SQL, params)
+    cur.execute(UNFOLD_CUSTOMER_MESSAGES_SQL, params)
+
+def archive_batch(conn, closed_status, cutoff, batch_size, archive_dir):
+    """Move one batch of conversations to the archive in a single short transaction.
+
+    The chunk file is written and synced before the transaction commits; if the
+    commit never happens the file is simply unreferenced. The conversations are
+    also taken out of the count summaries (see UNFOLD_*_SQL). Returns
+    (conversations, messages) moved.
+    """
+    agent_role = chatdb.role_id(conn, "Agent")
+    with conn, conn.cursor() as cur:
+        cur.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}';")
+        # Before the watermark row: refresh_report_summaries() takes SHARE on messages first
+        cur.execute("LOCK TABLE messages IN ROW EXCLUSIVE MODE;")
+        cur.execute(BATCH_SQL, {"closed_status": closed_status, "cutoff": cutoff, "batch_size": batch_size})
+        conversations = cur.fetchall()
+        if not conversations:
+            return 0, 0
+        ids = [row[0] for row in conversations]
+
+        cur.execute(MESSAGES_SQL, (ids,))
+        messages = cur.fetchall()
+        cur.execute(PARTICIPANTS_SQL, (ids,))
+        participants = dict(cur.fetchall())
+
+        name = f"messages_{ids[0]}_{ids[-1]}.parquet"
+        offsets = write_chunk(archive_dir, name, messages)
+        execute_values(cur, INSERT_ARCHIVED_SQL, [
+            (*row, json.dumps(participants.get(row[0], [])), name, *offsets.get(row[0], (0, 0)))
+            for row in conversations
+        ])
+
+        unfold_summaries(cur, ids, agent_role)
+        cur.execute("DELETE FROM messages WHERE conversation_id = ANY(%s);", (ids,))
+        if cur.rowcount != len(messages):
+            raise RuntimeError(f"{name}: deleted {cur.rowcount} messages but archived {len(messages)}")
+        # Participants go with their conversation (ON DELETE CASCADE)
+        cur.execute("DELETE FROM conversations WHERE conversation_id = ANY(%s);", (ids,))
+    return len(conversations), len(messages)
+
+def archive_conversations(conn, cutoff, batch_size=DEFAULT_BATCH_SIZE, archive_dir=DEFAULT_ARCHIVE_DIR,
+                          max_batches=None):
+    """Archive closed conversations that ended before `cutoff`, batch by batch.
+
+    Returns (conversations, messages, batches). Stops early when a batch cannot
+    get its locks within LOCK_TIMEOUT; the next run picks up where this one left off.
+    """
+    with conn, conn.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_lock(%s);", (ADVISORY_LOCK,))
+        if not cur.fetchone()[0]:
+            raise RuntimeError("another archive run is in progress")
+    closed_status = chatdb.status_id(conn, "closed")
+    total_conversations = total_messages = batches = 0
+    try:
+        while max_batches is None or batches < max_batches:
+            try:
+                moved, messages = archive_batch(conn, closed_status, cutoff, batch_size, archive_dir)
+            except errors.LockNotAvailable:
+                print(f"⚠️  Batch {batches + 1} waited more than {LOCK_TIMEOUT} for locks; stopping here")
+                break
+            if not moved:
+                break
+            batches += 1
+            total_conversations += moved
+            total_messages += messages
+    finally:
+        with conn, conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(%s);", (ADVISORY_LOCK,))
+    return total_conversations, total_messages, batches
+
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Move old closed conversations and their messages to cold storage.")
+    parser.add_argument("--older-than-days", type=float, default=DEFAULT_AGE_DAYS,
+                        help="Archive closed conversations that ended more than this many days ago.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Conversations moved per transaction and archive chunk.")
+    parser.add_argument("--max-batches", type=int, default=None,
+                        help="Stop after this many batches (default: until none are left).")
+    parser.add_argument("--archive-dir", default=DEFAULT_ARCHIVE_DIR,
+                        help="Directory for the archive chunks (default: $CHAT_ARCHIVE_DIR or ./archive).")
+    return parser.parse_args()
+
+# --- MAIN ---
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        conn = chatdb.connect()
+
+        cutoff = datetime.now() - timedelta(days=args.older_than_days)
+        start = time.perf_counter()
+        conversations, messages, batches = archive_conversations(conn, cutoff, args.batch_size,
+                                                                 args.archive_dir, args.max_batches)
+        elapsed = time.perf_counter() - start
+        print(f"✅ Archived {conversations} conversations ({messages} messages) ended before "
+              f"{cutoff:%Y-%m-%d} in {batches} batches, {elapsed:.2f}s "
+              f"({messages / elapsed if elapsed else 0:,.0f} messages/sec)")
+        print(f"🗄️  Archive chunks: {args.archive_dir}")
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+    finally:
+        if 'conn' in locals() and conn:
+            conn.close()
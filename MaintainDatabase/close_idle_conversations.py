@@ -0,0 +1,56 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatdb
+
+# --- CONFIGURATION ---
+DEFAULT_IDLE_HOURS = 24
+DEFAULT_BATCH_SIZE = 5000  # conversations closed per transaction
+
+# --- DB FUNCTIONS ---
+def close_idle_conversations(conn, idle_before, batch_size=DEFAULT_BATCH_SIZE):
+    """Close open conversations idle since `idle_before` and set ended_at on closed ones missing it.
+
+    Runs close_idle_conversations() from 12_add_conversation_stats.sql one batch
+    per transaction, so writers are never blocked for long. Returns the number
+    of conversations updated.
+    """
+    total = 0
+    while True:
+        with conn, conn.cursor() as cur:
+            cur.execute("SELECT close_idle_conversations(%s, %s);", (idle_before, batch_size))
+            updated = cur.fetchone()[0]
+        total += updated
+        if updated < batch_size:
+            return total
+
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Close idle conversations and record when they ended.")
+    parser.add_argument("--idle-hours", type=float, default=DEFAULT_IDLE_HOURS,
+                        help="Close open conversations with no message for this many hours.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Conversations updated per transaction.")
+    return parser.parse_args()
+
+# --- MAIN ---
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        conn = chatdb.connect()
+
+        idle_before = datetime.now() - timedelta(hours=args.idle_hours)
+        start = time.perf_counter()
+        closed = close_idle_conversations(conn, idle_before, args.batch_size)
+        print(f"✅ Closed {closed} conversations idle since {idle_before:%Y-%m-%d %H:%M} "
+              f"in {time.perf_counter() - start:.2f}s")
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+    finally:
+        if 'conn' in locals() and conn:
+            conn.close()
@@ -0,0 +1,69 @@
+import argparse
+import os
+import sys
+from datetime import datetime
+from dateutil.relativedelta import relativedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatdb
+
+# --- DB FUNCTIONS ---
+def create_future_partitions(conn, months_ahead):
+    """Create monthly messages partitions from this month up to `months_ahead` months out."""
+    now = datetime.now()
+    with conn.cursor() as cur:
+        cur.execute("SELECT ensure_message_partitions(%s, %s);",
+                    (now, now + relativedelta(months=months_ahead)))
+        return [row[0] for row in cur.fetchall()]
+
+def detach_old_partitions(conn, retain_months):
+    """Detach monthly partitions that ended more than `retain_months` months ago."""
+    cutoff = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0) \
+        - relativedelta(months=retain_months)
+    with conn.cursor() as cur:
+        cur.execute("SELECT detach_message_partitions(%s);", (cutoff,))
+        return [row[0] for row in cur.fetchall()]
+
+def default_partition_rows(conn):
+    """Number of rows that fell outside every monthly partition."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM messages_default;")
+        return cur.fetchone()[0]
+
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pre-create and detach monthly messages partitions.")
+    parser.add_argument("--months-ahead", type=int, default=3,
+                        help="Create partitions up to this many months in the future.")
+    parser.add_argument("--retain-months", type=int, default=None,
+                        help="Detach partitions older than this many months (default: keep all).")
+    return parser.parse_args()
+
+# --- MAIN ---
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        conn = chatdb.connect()
+
+        with conn:
+            created = create_future_partitions(conn, args.months_ahead)
+        print(f"✅ Created {len(created)} partitions: {', '.join(created) or 'none needed'}")
+
+        if args.retain_months is not None:
+            with conn:
+                detached = detach_old_partitions(conn, args.retain_months)
+            print(f"✅ Detached {len(detached)} partitions: {', '.join(detached) or 'none'}")
+            if detached:
+                print("   Detached tables still hold their rows; archive them "
+                      "(e.g. pg_dump -t <table>) and DROP them when ready.")
+
+        leftover = default_partition_rows(conn)
+        if leftover:
+            print(f"⚠️  {leftover} messages are in messages_default; "
+                  "run with a wider --months-ahead or create their partitions.")
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+    finally:
+        if 'conn' in locals() and conn:
+            conn.close()
@@ -0,0 +1,27 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatdb
+
+# --- MAIN ---
+if __name__ == "__main__":
+    try:
+        conn = chatdb.connect()
+
+        start = time.perf_counter()
+        with conn, conn.cursor() as cur:
+            cur.execute("SELECT refresh_report_summaries();")
+            folded = cur.fetchone()[0]
+            cur.execute("SELECT last_message_id FROM report_watermarks WHERE name = 'report_summaries';")
+            row = cur.fetchone()
+
+        print(f"✅ Folded {folded} new messages in {time.perf_counter() - start:.2f}s "
+              f"(watermark: message_id {row[0] if row else 0})")
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+    finally:
+        if 'conn' in locals() and conn:
+            conn.close()
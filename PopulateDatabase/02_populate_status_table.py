@@ -1,14 +1,8 @@
-import psycopg2
-from psycopg2 import sql
+import os
+import sys
 
-# --- Database configuration ---
-DB_CONFIG = {
-    "host": "localhost",
-    "database": "customer_support",
-    "user": "",
-    "password": "",
-    "port": 5432  # Default PostgreSQL port
-}
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatdb
 
 INSERT_STATUS_SQL = """
 INSERT INTO status (name)
@@ -19,7 +13,7 @@ ON CONFLICT (name) DO NOTHING;
 # --- Main execution ---
 def main():
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = chatdb.connect()
         conn.autocommit = True
         cur = conn.cursor()
 
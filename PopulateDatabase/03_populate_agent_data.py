@@ -1,15 +1,14 @@
-import random
-import json
-import psycopg2
-from datetime import datetime, timedelta
+import argparse
+import os
+import sys
 
-# --- CONFIGURATION ---
-DB_CONFIG = {
-    "host": "localhost",
-    "database": "customer_support",
-    "user": "",
-    "password": ""
-}
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatdb
+from bulk_load import DEFAULT_CHUNK_SIZE, copy_users
+from checkpoint import DEFAULT_COMMIT_EVERY, begin_job
+from synthetic import batch_bounds, make_rng, pick, random_dates
+
+JOB = "03_populate_agent_data"  # population_progress key
 
 # --- SAMPLE DATA ---
 first_names = [
@@ -45,69 +44,70 @@ shifts = [
     {"start": "12:00", "end": "20:00"}
 ]
 
-def random_date(start_year=2018, end_year=2024):
-    start_date = datetime(start_year, 1, 1)
-    end_date = datetime(end_year, 12, 31)
-    return (start_date + timedelta(days=random.randint(0, (end_date - start_date).days))).strftime("%Y-%m-%d")
-
 # --- GENERATE AGENTS ---
-def generate_agents(n=50):
-    agents = []
-    for i in range(n):
-        first = random.choice(first_names)
-        last = random.choice(last_names)
-        full_name = f"{first} {last}"
-        email = f"{first.lower()}.{last.lower()}@support.com"
-        agent = {
-            "name": full_name,
-            "email": email,
-            "skills": random.choice(skills_pool),
-            "status": random.choice(statuses),
-            "department": random.choice(departments),
-            "shift": random.choice(shifts),
-            "metadata": {
-                "hire_date": random_date(2018, 2024),
-                "certifications": random.choice(certifications_pool)
+def generate_agents(n=50, rng=None, batch_size=DEFAULT_CHUNK_SIZE):
+    """Yield `n` agent detail dicts, drawing each batch's random columns at once."""
+    rng = rng or make_rng()
+    for _, size in batch_bounds(n, batch_size):
+        columns = zip(
+            pick(rng, first_names, size),
+            pick(rng, last_names, size),
+            pick(rng, skills_pool, size),
+            pick(rng, statuses, size),
+            pick(rng, departments, size),
+            pick(rng, shifts, size),
+            random_dates(rng, 2018, 2024, size),
+            pick(rng, certifications_pool, size),
+        )
+        for first, last, skills, status, department, shift, hire_date, certifications in columns:
+            yield {
+                "name": f"{first} {last}",
+                "email": f"{first.lower()}.{last.lower()}@support.com",
+                "skills": skills,
+                "status": status,
+                "department": department,
+                "shift": shift,
+                "metadata": {
+                    "hire_date": str(hire_date),
+                    "certifications": certifications
+                }
             }
-        }
-        agents.append(agent)
-    return agents
 
 # --- DATABASE FUNCTIONS ---
-def get_role_id(conn, role_name):
-    with conn.cursor() as cur:
-        cur.execute("SELECT role_id FROM role WHERE name = %s;", (role_name,))
-        row = cur.fetchone()
-        if not row:
-            raise ValueError(f"Role '{role_name}' not found in role table.")
-        return row[0]
+def insert_agents(conn, role_id, count, checkpoint, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream `count` agents into users via COPY, committing checkpointed chunks; returns rows loaded."""
+    return copy_users(conn, role_id, lambda rng, offset, size: generate_agents(size, rng, chunk_size),
+                      count, checkpoint, chunk_size)
 
-def insert_agents(conn, role_id, agents):
-    with conn.cursor() as cur:
-        for agent in agents:
-            cur.execute("""
-                INSERT INTO users (role_id, details)
-                VALUES (%s, %s::jsonb);
-            """, (role_id, json.dumps(agent)))
-    conn.commit()
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Populate the users table with agents.")
+    parser.add_argument("--count", type=int, default=50, help="Number of agents to generate.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Rows sent per COPY chunk.")
+    parser.add_argument("--commit-every", type=int, default=DEFAULT_COMMIT_EVERY,
+                        help="Agents committed per transaction, each with a checkpoint.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run from its checkpoint instead of starting over.")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Random seed (default: random; a resumed run reuses the saved one).")
+    return parser.parse_args()
 
 # --- MAIN EXECUTION ---
 if __name__ == "__main__":
+    args = parse_args()
     try:
         # Connect to the database
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = chatdb.connect()
 
         # Fetch role_id for 'Agent'
-        role_id = get_role_id(conn, "Agent")
+        role_id = chatdb.role_id(conn, "Agent")
         print(f"✅ Found role_id for 'Agent': {role_id}")
 
-        # Generate 50 agent records
-        agents = generate_agents(50)
-        print(f"✅ Generated {len(agents)} agents")
-
-        # Insert into users table
-        insert_agents(conn, role_id, agents)
-        print("✅ Successfully inserted agents into users table")
+        # Generate agent records lazily and stream them into the users table
+        checkpoint = begin_job(conn, JOB, args.seed, {"count": args.count}, args.resume, args.commit_every)
+        inserted = insert_agents(conn, role_id, args.count, checkpoint, args.chunk_size)
+        print(f"✅ Successfully inserted {inserted} agents into users table")
 
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -1,15 +1,16 @@
-import random
-import json
-import psycopg2
-from datetime import datetime, timedelta
+import argparse
+import os
+import sys
+import numpy as np
 
-# --- CONFIGURATION ---
-DB_CONFIG = {
-    "host": "localhost",
-    "database": "customer_support",
-    "user": "",
-    "password": ""
-}
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatdb
+from bulk_load import DEFAULT_CHUNK_SIZE, copy_users
+from checkpoint import DEFAULT_COMMIT_EVERY, begin_job
+from synthetic import (batch_bounds, make_rng, pick, randints, random_dates,
+                       random_phones, random_postcodes)
+
+JOB = "04_populate_customer_data"  # population_progress key
 
 # --- SAMPLE DATA FOR UK & SA CUSTOMERS ---
 first_names = [
@@ -26,95 +27,87 @@ uk_counties = ["Greater London", "West Midlands", "Merseyside", "Yorkshire", "La
 za_provinces = ["Gauteng", "Western Cape", "KwaZulu-Natal", "Eastern Cape", "Free State", "Limpopo"]
 contact_methods = ["email", "phone"]
 languages = ["en", "af", "zu", "xh"]  # English, Afrikaans, Zulu, Xhosa
-
-# --- HELPERS ---
-def random_date(start_year=2020, end_year=2025):
-    start_date = datetime(start_year, 1, 1)
-    end_date = datetime(end_year, 12, 31)
-    return (start_date + timedelta(days=random.randint(0, (end_date - start_date).days))).strftime("%Y-%m-%d")
-
-def random_postcode(region):
-    if region == "UK":
-        return f"{random.choice(['SW1A', 'M1', 'B1', 'L1', 'LS1', 'G1'])} {random.randint(1,9)}{random.choice('ABCD')}"
-    else:
-        return str(random.randint(1000, 9999))
-
-def random_phone(region):
-    if region == "UK":
-        return f"+44 7{random.randint(100,999)} {random.randint(100000,999999)}"
-    else:
-        return f"+27 {random.randint(60,83)} {random.randint(100,999)} {random.randint(1000,9999)}"
+street_names = ["Main Road", "High Street", "Church Lane", "Station Road", "Market Street", "Long Street", "Victoria Road"]
 
 # --- GENERATE CUSTOMERS ---
-def generate_customers(n=100):
-    customers = []
-    for i in range(n):
-        region = random.choice(["UK", "ZA"])
-        first = random.choice(first_names)
-        last = random.choice(last_names)
-        full_name = f"{first} {last}"
-        email = f"{first.lower()}.{last.lower()}{i}@example.com"
-        phone = random_phone(region)
-        street_num = random.randint(1, 250)
-        street_name = random.choice(["Main Road", "High Street", "Church Lane", "Station Road", "Market Street", "Long Street", "Victoria Road"])
-        city = random.choice(uk_cities) if region == "UK" else random.choice(za_cities)
-        state = random.choice(uk_counties) if region == "UK" else random.choice(za_provinces)
-        postcode = random_postcode(region)
-        contact_method = random.choice(contact_methods)
-        language = random.choice(languages)
+def generate_customers(n=100, rng=None, batch_size=DEFAULT_CHUNK_SIZE, start=0):
+    """Yield `n` customer detail dicts, drawing each batch's random columns at once.
 
-        customer = {
-            "name": full_name,
-            "email": email,
-            "phone": phone,
-            "address": {
-                "street": f"{street_num} {street_name}",
-                "city": city,
-                "state": state,
-                "zip": postcode
-            },
-            "preferences": {
-                "contact_method": contact_method,
-                "language": language
-            },
-            "metadata": {
-                "signup_date": random_date(2020, 2023),
-                "last_login": random_date(2024, 2025)
+    Customers are numbered from `start` (the number keeps their emails unique).
+    """
+    rng = rng or make_rng()
+    for offset, size in batch_bounds(n, batch_size):
+        regions = pick(rng, ["UK", "ZA"], size)
+        is_uk = regions == "UK"
+        columns = zip(
+            range(start + offset, start + offset + size),
+            pick(rng, first_names, size),
+            pick(rng, last_names, size),
+            random_phones(rng, regions),
+            randints(rng, 1, 250, size),
+            pick(rng, street_names, size),
+            np.where(is_uk, pick(rng, uk_cities, size), pick(rng, za_cities, size)),
+            np.where(is_uk, pick(rng, uk_counties, size), pick(rng, za_provinces, size)),
+            random_postcodes(rng, regions),
+            pick(rng, contact_methods, size),
+            pick(rng, languages, size),
+            random_dates(rng, 2020, 2023, size),
+            random_dates(rng, 2024, 2025, size),
+        )
+        for (i, first, last, phone, street_num, street_name, city, state, postcode,
+             contact_method, language, signup_date, last_login) in columns:
+            yield {
+                "name": f"{first} {last}",
+                "email": f"{first.lower()}.{last.lower()}{i}@example.com",
+                "phone": str(phone),
+                "address": {
+                    "street": f"{street_num} {street_name}",
+                    "city": city,
+                    "state": state,
+                    "zip": str(postcode)
+                },
+                "preferences": {
+                    "contact_method": contact_method,
+                    "language": language
+                },
+                "metadata": {
+                    "signup_date": str(signup_date),
+                    "last_login": str(last_login)
+                }
             }
-        }
-        customers.append(customer)
-    return customers
 
 # --- DATABASE FUNCTIONS ---
-def get_role_id(conn, role_name):
-    with conn.cursor() as cur:
-        cur.execute("SELECT role_id FROM role WHERE name = %s;", (role_name,))
-        row = cur.fetchone()
-        if not row:
-            raise ValueError(f"Role '{role_name}' not found in role table.")
-        return row[0]
+def insert_customers(conn, role_id, count, checkpoint, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream `count` customers into users via COPY, committing checkpointed chunks; returns rows loaded."""
+    return copy_users(conn, role_id,
+                      lambda rng, offset, size: generate_customers(size, rng, chunk_size, start=offset),
+                      count, checkpoint, chunk_size)
 
-def insert_customers(conn, role_id, customers):
-    with conn.cursor() as cur:
-        for customer in customers:
-            cur.execute("""
-                INSERT INTO users (role_id, details)
-                VALUES (%s, %s::jsonb);
-            """, (role_id, json.dumps(customer)))
-    conn.commit()
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Populate the users table with customers.")
+    parser.add_argument("--count", type=int, default=100, help="Number of customers to generate.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Rows sent per COPY chunk.")
+    parser.add_argument("--commit-every", type=int, default=DEFAULT_COMMIT_EVERY,
+                        help="Customers committed per transaction, each with a checkpoint.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run from its checkpoint instead of starting over.")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Random seed (default: random; a resumed run reuses the saved one).")
+    return parser.parse_args()
 
 # --- MAIN EXECUTION ---
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        role_id = get_role_id(conn, "Customer")
+        conn = chatdb.connect()
+        role_id = chatdb.role_id(conn, "Customer")
         print(f"✅ Found role_id for 'Customer': {role_id}")
 
-        customers = generate_customers(100)
-        print(f"✅ Generated {len(customers)} customers")
-
-        insert_customers(conn, role_id, customers)
-        print("✅ Successfully inserted customers into users table")
+        checkpoint = begin_job(conn, JOB, args.seed, {"count": args.count}, args.resume, args.commit_every)
+        inserted = insert_customers(conn, role_id, args.count, checkpoint, args.chunk_size)
+        print(f"✅ Successfully inserted {inserted} customers into users table")
 
     except Exception as e:
         print(f"❌ Error: {e}")
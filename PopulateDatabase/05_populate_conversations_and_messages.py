@@ -1,16 +1,24 @@
-import psycopg2
+import argparse
+import os
 import random
-import json
+import sys
+import time
 from datetime import datetime, timedelta
+from functools import partial
 from faker import Faker
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatdb
+from bulk_load import DEFAULT_CHUNK_SIZE, copy_rows, ensure_message_partitions, report_rate
+from checkpoint import DEFAULT_COMMIT_EVERY, begin_job, check_resume_layout, chunk_rng, job_name
+from parallel import DEFAULT_SEED, run_sharded, shard
+from synthetic import batch_bounds, conversation_plan, customer_messages, iter_rows, make_rng
+
 # --- CONFIG ---
-DB_CONFIG = {
-    "host": "localhost",
-    "database": "customer_support",
-    "user": "",
-    "password": "",
-}
+DEFAULT_BATCH_SIZE = 1000  # conversations created per INSERT ... RETURNING
+START_YEAR, END_YEAR = 2024, 2025  # conversations start somewhere in these years
+MESSAGE_COLUMNS = ["conversation_id", "user_id", "content", "created_at"]
+JOB = "05_populate_conversations_and_messages"  # population_progress key
 
 fake = Faker()
 
@@ -24,78 +32,158 @@ def random_datetime(start_year=2023, end_year=2025):
                              seconds=random.randint(0, 86400))
 
 # --- DB FUNCTIONS ---
-def get_role_id(conn, role_name):
-    with conn.cursor() as cur:
-        cur.execute("SELECT role_id FROM role WHERE name = %s;", (role_name,))
-        row = cur.fetchone()
-        if not row:
-            raise ValueError(f"Role '{role_name}' not found.")
-        return row[0]
-
 def get_status_ids(conn):
     """Fetch open and closed status IDs."""
-    with conn.cursor() as cur:
-        cur.execute("SELECT status_id, name FROM status;")
-        rows = cur.fetchall()
-        status_map = {r[1].lower(): r[0] for r in rows}
-        if "open" not in status_map or "closed" not in status_map:
-            raise ValueError("Both 'open' and 'closed' statuses must exist.")
-        return status_map["open"], status_map["closed"]
-
-def get_customer_ids(conn, customer_role_id):
-    """Fetch all user_ids for customers."""
-    with conn.cursor() as cur:
-        cur.execute("SELECT user_id FROM users WHERE role_id = %s;", (customer_role_id,))
-        return [row[0] for row in cur.fetchall()]
+    return chatdb.status_id(conn, "open"), chatdb.status_id(conn, "closed")
 
-def insert_conversation(conn, status_id):
-    """Insert one conversation and return its ID."""
+def insert_conversations(conn, status_ids):
+    """Insert one conversation per status id in a single statement and return the new IDs."""
     with conn.cursor() as cur:
         cur.execute("""
             INSERT INTO conversations (status_id)
-            VALUES (%s)
+            SELECT unnest(%s::int[])
             RETURNING conversation_id;
-        """, (status_id,))
-        return cur.fetchone()[0]
+        """, (list(status_ids),))
+        return [row[0] for row in cur.fetchall()]
 
-def insert_message(conn, conversation_id, user_id, content, created_at):
-    """Insert one message record."""
-    with conn.cursor() as cur:
-        cur.execute("""
-            INSERT INTO messages (conversation_id, user_id, content, created_at)
-            VALUES (%s, %s, %s::jsonb, %s);
-        """, (conversation_id, user_id, json.dumps(content), created_at))
+# --- GENERATION ---
+def plan_conversations(customer_ids, status_open, status_closed):
+    """Yield (customer_id, status_id) for every conversation to create."""
+    for customer_id in customer_ids:
+        # Each customer can have 1–5 conversations
+        for _ in range(random.randint(1, 5)):
+            yield customer_id, random.choice([status_open, status_closed])
+
+def generate_messages(customer_id):
+    """Yield (user_id, content, created_at) for the 3–10 messages of one conversation."""
+    num_messages = random.randint(3, 10)
+    base_time = random_datetime(START_YEAR, END_YEAR)
+
+    for i in range(num_messages):
+        msg_time = base_time + timedelta(minutes=i * random.randint(2, 15))
+        message_content = {"text": fake.sentence(nb_words=random.randint(4, 12))}
+        yield customer_id, message_content, msg_time
+
+def populate_row_by_row(conn, customer_ids, status_open, status_closed):
+    """Original path: one INSERT round trip per conversation and per message (prepared once)."""
+    messages = 0
+    for customer_id, status_id in plan_conversations(customer_ids, status_open, status_closed):
+        conversation_id = chatdb.insert_conversation(conn, status_id)
+        for user_id, content, created_at in generate_messages(customer_id):
+            chatdb.insert_message(conn, conversation_id, user_id, content, created_at)
+            messages += 1
+    return messages
+
+def populate_batched(conn, customer_ids, status_open, status_closed,
+                     batch_size=DEFAULT_BATCH_SIZE, chunk_size=DEFAULT_CHUNK_SIZE, rng=None):
+    """Create conversations `batch_size` at a time and COPY their messages in chunks.
+
+    Message columns for each batch are generated in one vectorized pass.
+    """
+    rng = rng or make_rng()
+    messages = 0
+    owners, status_ids = conversation_plan(rng, customer_ids, [status_open, status_closed])
+    for offset, size in batch_bounds(len(owners), batch_size):
+        conversation_ids = insert_conversations(conn, status_ids[offset:offset + size].tolist())
+        columns = customer_messages(rng, conversation_ids, owners[offset:offset + size],
+                                    START_YEAR, END_YEAR)
+        messages += copy_rows(conn, "messages", MESSAGE_COLUMNS, iter_rows(columns), chunk_size)
+    return messages
+
+def job_params(batch_size, row_by_row, **_):
+    """Options that change the generated data, saved with the checkpoint."""
+    return {"batch_size": batch_size, "row_by_row": row_by_row}
+
+def populate(conn, customer_ids, status_open, status_closed, checkpoint,
+             batch_size=DEFAULT_BATCH_SIZE, chunk_size=DEFAULT_CHUNK_SIZE, row_by_row=False):
+    """Populate conversations for `customer_ids` and return the number of messages this run wrote.
+
+    Customers are processed in checkpoint chunks: each chunk is one transaction
+    that also saves the checkpoint, and draws from its own seeded generators.
+    """
+    messages = 0
+    for chunk, offset, size in checkpoint.chunks(customer_ids):
+        customers = customer_ids[offset:offset + size]
+        with conn:
+            if row_by_row:
+                random.seed(f"{checkpoint.seed}:{chunk}")
+                fake.seed_instance(f"{checkpoint.seed}:{chunk}")
+                written = populate_row_by_row(conn, customers, status_open, status_closed)
+            else:
+                written = populate_batched(conn, customers, status_open, status_closed,
+                                           batch_size, chunk_size, chunk_rng(checkpoint.seed, chunk))
+            checkpoint.save(conn, customer_ids, offset, size, written)
+        messages += written
+    checkpoint.finish(conn)
+    return messages
+
+def populate_shard(index, customer_ids, seed, workers, resume, commit_every, **options):
+    """Worker entry point: open a connection and populate one shard under its own checkpoint."""
+    conn = chatdb.connect()
+    try:
+        checkpoint = begin_job(conn, job_name(JOB, index, workers), seed, job_params(**options),
+                               resume, commit_every)
+        return populate(conn, customer_ids, checkpoint=checkpoint, **options)
+    finally:
+        conn.close()
+
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Populate conversations and customer messages.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Conversations created per INSERT ... RETURNING statement.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Messages sent per COPY chunk.")
+    parser.add_argument("--row-by-row", action="store_true",
+                        help="Use the original one-INSERT-per-row path.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Split customers into N shards, each populated by its own process.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED,
+                        help="Base random seed; with --workers, worker i uses seed + i.")
+    parser.add_argument("--commit-every", type=int, default=DEFAULT_COMMIT_EVERY,
+                        help="Customers whose conversations are committed per transaction, with a checkpoint.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run (same --workers) from its checkpoints.")
+    return parser.parse_args()
 
 # --- MAIN ---
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = chatdb.connect()
 
         # Get IDs
-        customer_role_id = get_role_id(conn, "Customer")
+        customer_role_id = chatdb.role_id(conn, "Customer")
         status_open, status_closed = get_status_ids(conn)
-        customer_ids = get_customer_ids(conn, customer_role_id)
+        # Sorted, so a resumed run walks the customers in the same order
+        customer_ids = sorted(chatdb.users_with_role(conn, customer_role_id))
 
         print(f"✅ Found {len(customer_ids)} customers.")
         print(f"✅ Status IDs → open: {status_open}, closed: {status_closed}")
 
-        with conn:
-            for customer_id in customer_ids:
-                # Each customer can have 1–5 conversations
-                for _ in range(random.randint(1, 5)):
-                    status_id = random.choice([status_open, status_closed])
-                    conversation_id = insert_conversation(conn, status_id)
-
-                    # Generate 3–10 messages for this conversation
-                    num_messages = random.randint(3, 10)
-                    base_time = random_datetime(2024, 2025)
-
-                    for i in range(num_messages):
-                        msg_time = base_time + timedelta(minutes=i * random.randint(2, 15))
-                        message_content = {"text": fake.sentence(nb_words=random.randint(4, 12))}
-                        insert_message(conn, conversation_id, customer_id, message_content, msg_time)
-
-            print("✅ Conversations and messages successfully populated!")
+        # Messages can run a few hours past the end of END_YEAR
+        ensure_message_partitions(conn, datetime(START_YEAR, 1, 1), datetime(END_YEAR + 1, 1, 1))
+
+        options = dict(status_open=status_open, status_closed=status_closed,
+                       batch_size=args.batch_size, chunk_size=args.chunk_size,
+                       row_by_row=args.row_by_row)
+
+        if args.resume:
+            check_resume_layout(conn, JOB, args.workers)
+
+        if args.workers > 1:
+            # Workers open their own connections; don't share this one across fork()
+            conn.close()
+            run_sharded(partial(populate_shard, workers=args.workers, resume=args.resume,
+                                commit_every=args.commit_every, **options),
+                        shard(customer_ids, args.workers), args.seed, label="messages")
+        else:
+            start = time.perf_counter()
+            checkpoint = begin_job(conn, JOB, args.seed, job_params(**options), args.resume, args.commit_every)
+            total = populate(conn, customer_ids, checkpoint=checkpoint, **options)
+            report_rate("messages", total, time.perf_counter() - start)
+
+        print("✅ Conversations and messages successfully populated!")
 
     except Exception as e:
         print(f"❌ Error: {e}")
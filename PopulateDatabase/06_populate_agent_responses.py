@@ -1,88 +1,276 @@
-import psycopg2
-import random
-import json
+import argparse
+import os
+import sys
+import time
 from datetime import timedelta
-from faker import Faker
+from functools import partial
 
-# --- CONFIG ---
-DB_CONFIG = {
-    "host": "localhost",
-    "database": "customer_support",
-    "user": "",
-    "password": "",
-}
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatdb
+from bulk_load import DEFAULT_CHUNK_SIZE, copy_rows, ensure_message_partitions, report_rate
+from checkpoint import DEFAULT_COMMIT_EVERY, begin_job, check_resume_layout, chunk_rng, job_name
+from parallel import DEFAULT_SEED, run_sharded, run_workers, shard
+from synthetic import batch_bounds, iter_rows, reply_messages, sentence_pool
 
-fake = Faker()
+JOB = "06_populate_agent_responses"  # population_progress key
+
+# --- SERVER-SIDE SYNTHESIS ---
+# The same replies as reply_messages(), generated by PostgreSQL in one statement:
+# 2–6 messages per conversation alternating between one random customer and agent
+# (picked by joining on a random rank), the first 1–10 and later ones 1–15 minutes
+# apart, text drawn from the temp reply_phrases table.
+#
+# Draws hash (conversation_id, slot) with the seed instead of calling random(), so
+# the output depends only on the seed: not on plan, row order or --workers.
+REPLY_DRAW_SQL = """
+    CREATE OR REPLACE FUNCTION pg_temp.reply_draw(key BIGINT, slot INT, seed BIGINT, size INT)
+    RETURNS INT AS $$
+        SELECT 1 + floor((hashint8extended(key * 64 + slot, seed) & 2147483647) / 2147483648.0 * size)::int
+    $$ LANGUAGE sql IMMUTABLE;
+"""
+
+SERVER_SIDE_SQL = """
+    WITH targets AS (
+        SELECT conversation_id, MAX(created_at) AS last_time,
+               1 + pg_temp.reply_draw(conversation_id, 0, %(seed)s, 5) AS replies,
+               pg_temp.reply_draw(conversation_id, 1, %(seed)s, %(customers)s) AS customer_pick,
+               pg_temp.reply_draw(conversation_id, 2, %(seed)s, %(agents)s) AS agent_pick
+        FROM messages
+        WHERE conversation_id > %(after)s AND conversation_id <= %(upto)s
+          AND conversation_id %% %(shards)s = %(shard)s
+        GROUP BY conversation_id
+    ),
+    steps AS (
+        SELECT t.conversation_id, t.last_time, t.customer_pick, t.agent_pick, g.n,
+               pg_temp.reply_draw(t.conversation_id, 8 + 2 * g.n, %(seed)s,
+                                  CASE WHEN g.n = 1 THEN 10 ELSE 15 END) AS gap_minutes,
+               pg_temp.reply_draw(t.conversation_id, 9 + 2 * g.n, %(seed)s, %(phrases)s) AS phrase_id
+        FROM targets t
+        CROSS JOIN LATERAL generate_series(1, t.replies) AS g(n)
+    )
+    INSERT INTO messages (conversation_id, user_id, content, created_at)
+    SELECT s.conversation_id,
+           CASE WHEN s.n %% 2 = 1 THEN c.user_id ELSE a.user_id END,
+           p.content,
+           s.last_time + make_interval(mins => (SUM(s.gap_minutes) OVER (
+               PARTITION BY s.conversation_id ORDER BY s.n))::int)
+    FROM steps s
+    JOIN reply_customers c ON c.pick = s.customer_pick
+    JOIN reply_agents a ON a.pick = s.agent_pick
+    JOIN reply_phrases p ON p.phrase_id = s.phrase_id;
+"""
 
 # --- DB HELPERS ---
-def get_role_id(conn, role_name):
+def message_time_range(conn):
+    """Earliest and latest message timestamps, without pulling conversations into Python."""
     with conn.cursor() as cur:
-        cur.execute("SELECT role_id FROM role WHERE name = %s;", (role_name,))
-        row = cur.fetchone()
-        if not row:
-            raise ValueError(f"Role '{role_name}' not found.")
-        return row[0]
-
-def get_user_ids(conn, role_id):
-    """Return list of user_ids for a given role."""
-    with conn.cursor() as cur:
-        cur.execute("SELECT user_id FROM users WHERE role_id = %s;", (role_id,))
-        return [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT MIN(created_at), MAX(created_at) FROM messages;")
+        return cur.fetchone()
 
 def get_conversations_with_messages(conn):
-    """Fetch conversation_id with the most recent message timestamp and user_id."""
+    """Fetch conversation_id with the most recent message timestamp, in conversation_id order."""
     with conn.cursor() as cur:
         cur.execute("""
             SELECT m.conversation_id, MAX(m.created_at) AS last_time
             FROM messages m
-            GROUP BY m.conversation_id;
+            GROUP BY m.conversation_id
+            ORDER BY m.conversation_id;
         """)
         return cur.fetchall()
 
-def insert_message(conn, conversation_id, user_id, content, created_at):
+def get_conversation_ids(conn, shards=1, shard_index=0):
+    """conversation_ids with conversation_id % shards == shard_index, in order."""
     with conn.cursor() as cur:
-        cur.execute("""
-            INSERT INTO messages (conversation_id, user_id, content, created_at)
-            VALUES (%s, %s, %s::jsonb, %s);
-        """, (conversation_id, user_id, json.dumps(content), created_at))
+        cur.execute("SELECT conversation_id FROM conversations WHERE conversation_id %% %s = %s ORDER BY 1;",
+                    (shards, shard_index))
+        return [row[0] for row in cur.fetchall()]
+
+# --- GENERATION ---
+def populate_replies(conn, conversations, customer_ids, agent_ids, checkpoint,
+                     chunk_size=DEFAULT_CHUNK_SIZE):
+    """COPY generated replies for `conversations` and return the number of messages this run wrote.
+
+    Each conversation gets one random customer and agent who exchange 2–6
+    alternating messages. Conversations are committed in checkpoint chunks, each
+    drawing from its own seeded generator; reply columns are generated and
+    sent `chunk_size` conversations at a time.
+    """
+    keys = [conversation_id for conversation_id, _ in conversations]
+    messages = 0
+    for chunk, offset, size in checkpoint.chunks(keys):
+        rng = chunk_rng(checkpoint.seed, chunk)
+        written = 0
+        with conn:
+            for sub_offset, sub_size in batch_bounds(size, chunk_size):
+                start = offset + sub_offset
+                convo_ids, last_times = zip(*conversations[start:start + sub_size])
+                columns = reply_messages(rng, convo_ids, last_times, customer_ids, agent_ids)
+                written += copy_rows(conn, "messages",
+                                     ["conversation_id", "user_id", "content", "created_at"],
+                                     iter_rows(columns), chunk_size)
+            checkpoint.save(conn, keys, offset, size, written)
+        messages += written
+    checkpoint.finish(conn)
+    return messages
+
+def job_params(server_side, chunk_size=None):
+    """Options that change the generated replies, saved with the checkpoint.
+
+    Client-side replies are drawn `chunk_size` conversations at a time, so a
+    different chunk size would continue a job with different data.
+    """
+    if server_side:
+        return {"server_side": True}
+    return {"server_side": False, "chunk_size": chunk_size}
+
+def populate_shard(index, conversations, seed, customer_ids, agent_ids, chunk_size,
+                   workers, resume, commit_every):
+    """Worker entry point: open a connection and populate one shard under its own checkpoint."""
+    conn = chatdb.connect()
+    try:
+        checkpoint = begin_job(conn, job_name(JOB, index, workers), seed, job_params(False, chunk_size),
+                               resume, commit_every)
+        return populate_replies(conn, conversations, customer_ids, agent_ids, checkpoint, chunk_size)
+    finally:
+        conn.close()
+
+def create_reply_tables(conn, customer_role_id, agent_role_id):
+    """Session temp tables SERVER_SIDE_SQL draws from: ranked customers and agents,
+    and the seeded sentence pool. Returns (customers, agents, phrases) counts.
+    """
+    with conn.cursor() as cur:
+        for table, role_id in (("reply_customers", customer_role_id), ("reply_agents", agent_role_id)):
+            cur.execute(f"""
+                CREATE TEMP TABLE {table} AS
+                SELECT row_number() OVER (ORDER BY user_id)::int AS pick, user_id
+                FROM users WHERE role_id = %s;
+            """, (role_id,))
+        cur.execute("CREATE TEMP TABLE reply_phrases (phrase_id SERIAL PRIMARY KEY, content JSONB NOT NULL);")
+        phrases = copy_rows(conn, "reply_phrases", ["content"], ((c,) for c in sentence_pool(5, 12)))
+        cur.execute("ANALYZE reply_customers, reply_agents, reply_phrases;")
+        cur.execute("SELECT (SELECT COUNT(*) FROM reply_customers), (SELECT COUNT(*) FROM reply_agents);")
+        customers, agents = cur.fetchone()
+    return customers, agents, phrases
+
+def populate_server_side(conn, customer_role_id, agent_role_id, checkpoint, shards=1, shard_index=0):
+    """Generate the replies inside PostgreSQL and return the number of messages this run wrote.
+
+    Only conversations with conversation_id % shards == shard_index are filled,
+    one INSERT ... SELECT and commit per checkpoint chunk of conversation_ids.
+    """
+    with conn, conn.cursor() as cur:
+        cur.execute(REPLY_DRAW_SQL)
+        customers, agents, phrases = create_reply_tables(conn, customer_role_id, agent_role_id)
+        keys = get_conversation_ids(conn, shards, shard_index)
+    if not customers or not agents:
+        return 0
+
+    messages = 0
+    for _, offset, size in checkpoint.chunks(keys):
+        with conn, conn.cursor() as cur:
+            cur.execute(SERVER_SIDE_SQL, {"seed": checkpoint.seed, "customers": customers, "agents": agents,
+                                          "phrases": phrases, "shards": shards, "shard": shard_index,
+                                          "after": keys[offset - 1] if offset else 0,
+                                          "upto": keys[offset + size - 1]})
+            checkpoint.save(conn, keys, offset, size, cur.rowcount)
+            messages += cur.rowcount
+    checkpoint.finish(conn)
+    return messages
+
+def populate_server_shard(index, _worker_seed, seed, shards, customer_role_id, agent_role_id,
+                          resume, commit_every):
+    """Worker entry point for --server-side: fill the conversations in shard `index`.
+
+    Every shard uses the base `seed`, so the output matches a single-process run.
+    """
+    conn = chatdb.connect()
+    try:
+        checkpoint = begin_job(conn, job_name(JOB, index, shards), seed, job_params(True),
+                               resume, commit_every)
+        return populate_server_side(conn, customer_role_id, agent_role_id, checkpoint, shards, index)
+    finally:
+        conn.close()
+
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Add two-way customer/agent replies to conversations.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Messages sent per COPY chunk.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Split conversations into N shards, each populated by its own process.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED,
+                        help="Base random seed for --workers; worker i uses seed + i "
+                             "(--server-side uses the same seed in every shard).")
+    parser.add_argument("--commit-every", type=int, default=DEFAULT_COMMIT_EVERY,
+                        help="Conversations committed per transaction, each with a checkpoint.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run (same --workers) from its checkpoints.")
+    parser.add_argument("--server-side", action="store_true",
+                        help="Generate the replies inside PostgreSQL with one INSERT ... SELECT "
+                             "instead of in Python (with --workers, one statement per shard).")
+    return parser.parse_args()
 
 # --- MAIN ---
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = chatdb.connect()
 
         # Fetch roles
-        agent_role_id = get_role_id(conn, "Agent")
-        customer_role_id = get_role_id(conn, "Customer")
+        agent_role_id = chatdb.role_id(conn, "Agent")
+        customer_role_id = chatdb.role_id(conn, "Customer")
 
         # Fetch users by role
-        agent_ids = get_user_ids(conn, agent_role_id)
-        customer_ids = get_user_ids(conn, customer_role_id)
+        agent_ids = chatdb.users_with_role(conn, agent_role_id)
+        customer_ids = chatdb.users_with_role(conn, customer_role_id)
 
         print(f"✅ Found {len(agent_ids)} agents and {len(customer_ids)} customers.")
 
-        # Fetch conversations with their last message timestamp
-        conversations = get_conversations_with_messages(conn)
-        print(f"✅ Found {len(conversations)} conversations to add agent responses to.")
+        if args.resume:
+            check_resume_layout(conn, JOB, args.workers)
 
-        with conn:
-            for convo_id, last_msg_time in conversations:
-                # Pick one customer and one agent randomly for this conversation
-                customer_id = random.choice(customer_ids)
-                agent_id = random.choice(agent_ids)
-
-                # Generate 2–6 new messages alternating between customer and agent
-                num_new_messages = random.randint(2, 6)
-                next_time = last_msg_time + timedelta(minutes=random.randint(1, 10))
-
-                for i in range(num_new_messages):
-                    sender_id = customer_id if i % 2 == 0 else agent_id
-                    content = {
-                        "text": fake.sentence(nb_words=random.randint(5, 12))
-                    }
-
-                    insert_message(conn, convo_id, sender_id, content, next_time)
-                    next_time += timedelta(minutes=random.randint(1, 15))
+        if args.server_side:
+            # Replies land at most 6 × 15 minutes after each conversation's last message
+            first, last = message_time_range(conn)
+            if first is not None:
+                ensure_message_partitions(conn, first, last + timedelta(days=1))
+
+            if args.workers > 1:
+                # Each worker fills the conversations with conversation_id % workers == its index
+                conn.close()
+                run_workers(partial(populate_server_shard, seed=args.seed, shards=args.workers,
+                                    customer_role_id=customer_role_id, agent_role_id=agent_role_id,
+                                    resume=args.resume, commit_every=args.commit_every),
+                            args.workers, args.seed, label="messages")
+            else:
+                start = time.perf_counter()
+                checkpoint = begin_job(conn, JOB, args.seed, job_params(True), args.resume, args.commit_every)
+                total = populate_server_side(conn, customer_role_id, agent_role_id, checkpoint)
+                report_rate("messages", total, time.perf_counter() - start)
+        else:
+            # Fetch conversations with their last message timestamp
+            conversations = get_conversations_with_messages(conn)
+            print(f"✅ Found {len(conversations)} conversations to add agent responses to.")
+
+            # Replies land at most 6 × 15 minutes after each conversation's last message
+            if conversations:
+                last_times = [last_msg_time for _, last_msg_time in conversations]
+                ensure_message_partitions(conn, min(last_times), max(last_times) + timedelta(days=1))
+
+            if args.workers > 1:
+                # Workers open their own connections; don't share this one across fork()
+                conn.close()
+                run_sharded(partial(populate_shard, customer_ids=customer_ids, agent_ids=agent_ids,
+                                    chunk_size=args.chunk_size, workers=args.workers,
+                                    resume=args.resume, commit_every=args.commit_every),
+                            shard(conversations, args.workers), args.seed, label="messages")
+            else:
+                start = time.perf_counter()
+                checkpoint = begin_job(conn, JOB, args.seed, job_params(False, args.chunk_size),
+                                       args.resume, args.commit_every)
+                total = populate_replies(conn, conversations, customer_ids, agent_ids, checkpoint,
+                                         args.chunk_size)
+                report_rate("messages", total, time.perf_counter() - start)
 
         print("✅ Agent-customer two-way chats successfully populated!")
 
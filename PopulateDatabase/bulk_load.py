@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+
+from checkpoint import chunk_rng
+
+# --- CONFIGURATION ---
+DEFAULT_CHUNK_SIZE = 10000
+
+# --- HELPERS ---
+def chunked(rows, size):
+    """Yield lists of at most `size` items from any iterable, without materialising it."""
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _to_csv_buffer(rows):
+    """Serialise one chunk of row tuples into an in-memory CSV buffer for COPY."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    for row in rows:
+        writer.writerow(["" if v is None else v for v in row])
+    buf.seek(0)
+    return buf
+
+# --- COPY FUNCTIONS ---
+def copy_rows(conn, table, columns, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream row tuples into `table` with COPY ... FROM STDIN, one bounded chunk at a time.
+
+    Empty strings are loaded as NULL, so None values round-trip as NULL.
+    Returns the number of rows written. The caller owns the transaction.
+    """
+    copy_sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    total = 0
+    with conn.cursor() as cur:
+        for chunk in chunked(rows, chunk_size):
+            cur.copy_expert(copy_sql, _to_csv_buffer(chunk))
+            total += len(chunk)
+    return total
+
+def copy_users(conn, role_id, generate, count, checkpoint, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Bulk load `count` `users` rows for one role, committing each checkpoint chunk.
+
+    `generate(rng, offset, size)` yields the details dicts for users
+    [offset, offset + size); each chunk gets its own seeded generator. Prints
+    the achieved rows/sec and returns the number of rows loaded by this run.
+    """
+    start = time.perf_counter()
+    keys = range(count)
+    total = 0
+    for chunk, offset, size in checkpoint.chunks(keys):
+        with conn:
+            details = generate(chunk_rng(checkpoint.seed, chunk), offset, size)
+            rows = copy_rows(conn, "users", ["role_id", "details"],
+                             ((role_id, json.dumps(d)) for d in details), chunk_size)
+            checkpoint.save(conn, keys, offset, size, rows)
+        total += rows
+    checkpoint.finish(conn)
+    report_rate("users", total, time.perf_counter() - start)
+    return total
+
+# --- PARTITIONS ---
+def ensure_message_partitions(conn, start, end):
+    """Create any missing monthly `messages` partitions covering [start, end] and commit.
+
+    Call this once before loading (not from parallel workers) so rows route to
+    monthly partitions instead of messages_default.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT ensure_message_partitions(%s, %s);", (start, end))
+        created = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    if created:
+        print(f"✅ Created {len(created)} message partitions ({created[0]} … {created[-1]})")
+    return created
+
+def report_rate(label, rows, elapsed):
+    """Print a rows/sec summary line for a bulk load."""
+    rate = rows / elapsed if elapsed > 0 else float("inf")
+    print(f"⏱️  Loaded {rows} {label} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
@@ -0,0 +1,115 @@
+import json
+import random
+
+from synthetic import make_rng
+
+# --- CONFIGURATION ---
+DEFAULT_COMMIT_EVERY = 10000  # items (users, customers, conversations) per committed chunk
+
+# --- HELPERS ---
+def job_name(script, index=0, workers=1):
+    """Progress-table key for a script, or for worker `index` of `workers`."""
+    return script if workers <= 1 else f"{script}:{index + 1}/{workers}"
+
+def chunk_rng(seed, chunk):
+    """Generator for chunk number `chunk`, so a resumed run draws what an uninterrupted one would."""
+    return make_rng([seed, chunk])
+
+def check_resume_layout(conn, script, workers):
+    """Raise if unfinished checkpoints for `script` were written with a different --workers."""
+    expected = {job_name(script, i, workers) for i in range(workers)}
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT job FROM population_progress
+            WHERE (job = %s OR job LIKE %s) AND finished_at IS NULL;
+        """, (script, script + ":%"))
+        stray = sorted(row[0] for row in cur.fetchall() if row[0] not in expected)
+    conn.commit()
+    if stray:
+        raise RuntimeError(f"unfinished checkpoints {stray} were written with a different --workers; "
+                           f"resume with the same number of workers")
+
+# --- CHECKPOINTS ---
+class Checkpoint:
+    """Progress of one job through an ordered list of items, committed chunk by chunk.
+
+    Call save() inside the transaction that writes a chunk, so the rows and the
+    checkpoint commit (or roll back) together.
+    """
+
+    def __init__(self, job, seed, commit_every, position=0, last_key=None, rows=0, finished=False):
+        self.job = job
+        self.seed = seed
+        self.commit_every = commit_every
+        self.position = position
+        self.last_key = last_key
+        self.rows = rows
+        self.finished = finished
+
+    def chunks(self, keys):
+        """Yield (chunk number, offset, size) for the items of `keys` not yet done.
+
+        `keys` must list the items in the same order as the run that wrote the
+        checkpoint; the last finished key is checked to make sure it does.
+        """
+        if self.finished:
+            return
+        if self.position:
+            if self.position > len(keys) or keys[self.position - 1] != self.last_key:
+                raise RuntimeError(f"{self.job}: checkpoint at item {self.position} (key {self.last_key}) "
+                                   f"does not match the current data; start over without --resume")
+        for offset in range(self.position, len(keys), self.commit_every):
+            yield offset // self.commit_every, offset, min(self.commit_every, len(keys) - offset)
+
+    def save(self, conn, keys, offset, size, rows):
+        """Record that items [offset, offset + size) are done; the caller commits."""
+        self.position, self.last_key = offset + size, keys[offset + size - 1]
+        self.rows += rows
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE population_progress
+                SET position = %s, last_key = %s, rows_written = %s, updated_at = NOW()
+                WHERE job = %s;
+            """, (self.position, self.last_key, self.rows, self.job))
+
+    def finish(self, conn):
+        self.finished = True
+        with conn, conn.cursor() as cur:
+            cur.execute("UPDATE population_progress SET finished_at = NOW() WHERE job = %s;", (self.job,))
+
+def begin_job(conn, job, seed=None, params=None, resume=False, commit_every=DEFAULT_COMMIT_EVERY):
+    """Return the Checkpoint to run `job` from and commit its progress row.
+
+    With `resume` and a saved checkpoint, the run continues after it with the
+    saved seed (a finished job does nothing); `params` (whatever shapes the
+    generated data) must match the saved ones. Otherwise the job starts over at
+    item 0 with `seed`, or a random seed if None.
+    """
+    params = {**(params or {}), "commit_every": commit_every}
+    with conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT seed, params, position, last_key, rows_written, finished_at IS NOT NULL
+            FROM population_progress WHERE job = %s;
+        """, (job,))
+        row = cur.fetchone()
+        if resume and row:
+            saved_seed, saved_params, position, last_key, rows, finished = row
+            if finished:
+                print(f"✅ {job} already finished ({rows} rows); nothing to resume")
+                return Checkpoint(job, saved_seed, commit_every, position, last_key, rows, finished=True)
+            changed = sorted(k for k in set(params) | set(saved_params) if params.get(k) != saved_params.get(k))
+            if changed or (seed is not None and seed != saved_seed):
+                raise RuntimeError(f"{job}: {', '.join(changed) or 'seed'} differ from the checkpoint "
+                                   f"({json.dumps(saved_params)}, seed {saved_seed}); "
+                                   f"resume with the same options")
+            print(f"↩️  Resuming {job} after item {position} ({rows} rows already written)")
+            return Checkpoint(job, saved_seed, commit_every, position, last_key, rows)
+
+        seed = random.randrange(2 ** 31) if seed is None else seed
+        cur.execute("""
+            INSERT INTO population_progress (job, seed, params) VALUES (%s, %s, %s)
+            ON CONFLICT (job) DO UPDATE SET
+                seed = EXCLUDED.seed, params = EXCLUDED.params, position = 0, last_key = NULL,
+                rows_written = 0, started_at = NOW(), updated_at = NOW(), finished_at = NULL;
+        """, (job, seed, json.dumps(params)))
+        return Checkpoint(job, seed, commit_every)
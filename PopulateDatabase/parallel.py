@@ -0,0 +1,57 @@
+import multiprocessing
+import time
+
+# --- CONFIGURATION ---
+DEFAULT_SEED = 42
+
+# --- HELPERS ---
+def shard(items, workers):
+    """Split a list into `workers` interleaved shards of near-equal size."""
+    return [items[i::workers] for i in range(workers)]
+
+def worker_seed(base_seed, index):
+    """Deterministic random seed for worker `index`."""
+    return base_seed + index
+
+# --- RUNNER ---
+def run_sharded(target, shards, base_seed=DEFAULT_SEED, label="rows"):
+    """Run `target(index, shard, seed)` for every shard in its own process.
+
+    `target` must be a module-level function that opens its own connection
+    and returns the number of rows it wrote. Prints per-worker progress as
+    shards finish and a merged timing summary at the end.
+    Returns the total number of rows written.
+    """
+    return _run_jobs(target, [(i, (s, worker_seed(base_seed, i))) for i, s in enumerate(shards)], label)
+
+def run_workers(target, workers, base_seed=DEFAULT_SEED, label="rows"):
+    """Run `target(index, seed)` in `workers` processes, for work that splits itself by index.
+
+    Same contract and reporting as run_sharded(), but nothing is handed out:
+    each worker selects its own part (e.g. by hashing keys in SQL).
+    """
+    return _run_jobs(target, [(i, (worker_seed(base_seed, i),)) for i in range(workers)], label)
+
+def _run_jobs(target, jobs, label):
+    start = time.perf_counter()
+    results = []
+
+    with multiprocessing.Pool(processes=len(jobs)) as pool:
+        for index, rows, elapsed in pool.imap_unordered(_run_job, [(target, *job) for job in jobs]):
+            results.append((index, rows, elapsed))
+            print(f"  ↳ worker {index}: {rows} {label} in {elapsed:.2f}s "
+                  f"({len(results)}/{len(jobs)} done)")
+
+    wall = time.perf_counter() - start
+    total = sum(rows for _, rows, _ in results)
+    busy = sum(elapsed for _, _, elapsed in results)
+    rate = total / wall if wall > 0 else float("inf")
+    print(f"⏱️  {len(jobs)} workers wrote {total} {label} in {wall:.2f}s wall "
+          f"({busy:.2f}s worker time, {rate:,.0f} {label}/sec)")
+    return total
+
+def _run_job(job):
+    target, index, args = job
+    start = time.perf_counter()
+    rows = target(index, *args)
+    return index, rows, time.perf_counter() - start
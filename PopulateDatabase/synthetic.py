@@ -0,0 +1,147 @@
+import json
+from functools import lru_cache
+
+import numpy as np
+from faker import Faker
+
+# --- CONFIGURATION ---
+SENTENCE_POOL_SIZE = 5000
+SENTENCE_POOL_SEED = 0
+
+# --- RANDOM STATE ---
+def make_rng(seed=None):
+    """Create the NumPy generator used for all column draws."""
+    return np.random.default_rng(seed)
+
+def batch_bounds(n, batch_size):
+    """Yield (offset, size) pairs covering `n` rows in batches of at most `batch_size`."""
+    for offset in range(0, n, batch_size):
+        yield offset, min(batch_size, n - offset)
+
+# --- COLUMN GENERATORS ---
+def _object_array(values):
+    """1-D object array that keeps list/dict elements intact instead of broadcasting them."""
+    arr = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        arr[i] = value
+    return arr
+
+def pick(rng, values, n):
+    """Draw `n` values uniformly from `values` (like random.choice, n times)."""
+    return _object_array(values)[rng.integers(0, len(values), n)]
+
+def randints(rng, low, high, n):
+    """`n` integers in [low, high], inclusive like random.randint."""
+    return rng.integers(low, high + 1, n)
+
+def random_dates(rng, start_year, end_year, n):
+    """`n` 'YYYY-MM-DD' strings uniformly spread over the given years."""
+    start = np.datetime64(f"{start_year}-01-01", "D")
+    days = (np.datetime64(f"{end_year}-12-31", "D") - start).astype(int)
+    return np.datetime_as_string(start + rng.integers(0, days + 1, n), unit="D")
+
+def random_datetimes(rng, start_year, end_year, n):
+    """`n` second-resolution timestamps spread over the given years."""
+    start = np.datetime64(f"{start_year}-01-01", "s")
+    days = (np.datetime64(f"{end_year}-12-31", "D") - np.datetime64(f"{start_year}-01-01", "D")).astype(int)
+    offsets = rng.integers(0, days + 1, n) * 86400 + rng.integers(0, 86401, n)
+    return start + offsets.astype("timedelta64[s]")
+
+def _join(*parts):
+    """Element-wise string concatenation of arrays and scalars."""
+    out = np.asarray(parts[0]).astype(str)
+    for part in parts[1:]:
+        out = np.char.add(out, np.asarray(part).astype(str))
+    return out
+
+def random_phones(rng, regions):
+    """Phone numbers in UK (+44 7xxx xxxxxx) or ZA (+27 xx xxx xxxx) format per region."""
+    n = len(regions)
+    uk = _join("+44 7", randints(rng, 100, 999, n), " ", randints(rng, 100000, 999999, n))
+    za = _join("+27 ", randints(rng, 60, 83, n), " ", randints(rng, 100, 999, n),
+               " ", randints(rng, 1000, 9999, n))
+    return np.where(np.asarray(regions) == "UK", uk, za)
+
+def random_postcodes(rng, regions):
+    """UK-style ('SW1A 3B') or ZA-style (four digit) postcodes per region."""
+    n = len(regions)
+    uk = _join(pick(rng, ["SW1A", "M1", "B1", "L1", "LS1", "G1"], n), " ",
+               randints(rng, 1, 9, n), pick(rng, list("ABCD"), n))
+    za = randints(rng, 1000, 9999, n).astype(str)
+    return np.where(np.asarray(regions) == "UK", uk, za)
+
+def grouped_offsets(rng, counts, low, high, first_low=0, first_high=0):
+    """Cumulative random offsets for consecutive groups of sizes `counts`.
+
+    Each group starts at a draw from [first_low, first_high] and every later
+    element adds a draw from [low, high] to the previous one.
+    """
+    counts = np.asarray(counts)
+    starts = np.cumsum(counts) - counts
+    steps = randints(rng, low, high, int(counts.sum()))
+    steps[starts] = randints(rng, first_low, first_high, len(counts))
+    cum = np.cumsum(steps)
+    return cum - np.repeat(cum[starts] - steps[starts], counts)
+
+def positions(counts):
+    """0-based position of every element within its group."""
+    counts = np.asarray(counts)
+    starts = np.cumsum(counts) - counts
+    return np.arange(int(counts.sum())) - np.repeat(starts, counts)
+
+# --- MESSAGE TEXT ---
+@lru_cache(maxsize=None)
+def sentence_pool(min_words, max_words, size=SENTENCE_POOL_SIZE, seed=SENTENCE_POOL_SEED):
+    """Pre-built pool of message `content` JSON strings, generated once with Faker."""
+    fake = Faker()
+    fake.seed_instance(seed)
+    word_counts = np.random.default_rng(seed).integers(min_words, max_words + 1, size)
+    return np.array([json.dumps({"text": fake.sentence(nb_words=int(k))}) for k in word_counts],
+                    dtype=object)
+
+def message_contents(rng, n, min_words, max_words):
+    """`n` message content JSON strings drawn from the sentence pool."""
+    pool = sentence_pool(min_words, max_words)
+    return pool[rng.integers(0, len(pool), n)]
+
+# --- MESSAGE BATCHES ---
+def conversation_plan(rng, customer_ids, status_ids, min_per=1, max_per=5):
+    """Return (customer_id, status_id) arrays with 1–5 conversations per customer."""
+    per_customer = randints(rng, min_per, max_per, len(customer_ids))
+    owners = np.repeat(np.asarray(customer_ids), per_customer)
+    return owners, pick(rng, status_ids, len(owners)).astype(int)
+
+def customer_messages(rng, conversation_ids, customer_ids, start_year=2024, end_year=2025):
+    """Columns for 3–10 customer messages per conversation, 2–15 minutes apart.
+
+    Returns (conversation_id, user_id, content, created_at) arrays.
+    """
+    counts = randints(rng, 3, 10, len(conversation_ids))
+    base = np.repeat(random_datetimes(rng, start_year, end_year, len(conversation_ids)), counts)
+    minutes = grouped_offsets(rng, counts, 2, 15)
+    return (np.repeat(np.asarray(conversation_ids), counts),
+            np.repeat(np.asarray(customer_ids), counts),
+            message_contents(rng, len(base), 4, 12),
+            base + minutes.astype("timedelta64[m]"))
+
+def reply_messages(rng, conversation_ids, last_times, customer_pool, agent_pool):
+    """Columns for 2–6 alternating customer/agent replies after each conversation's last message.
+
+    The first reply lands 1–10 minutes after `last_times`, later ones 1–15 minutes apart.
+    Returns (conversation_id, user_id, content, created_at) arrays.
+    """
+    n = len(conversation_ids)
+    counts = randints(rng, 2, 6, n)
+    customers = np.repeat(pick(rng, customer_pool, n), counts)
+    agents = np.repeat(pick(rng, agent_pool, n), counts)
+    senders = np.where(positions(counts) % 2 == 0, customers, agents)
+    base = np.repeat(np.asarray(last_times, dtype="datetime64[us]"), counts)
+    minutes = grouped_offsets(rng, counts, 1, 15, 1, 10)
+    return (np.repeat(np.asarray(conversation_ids), counts),
+            senders,
+            message_contents(rng, len(base), 5, 12),
+            base + minutes.astype("timedelta64[m]"))
+
+def iter_rows(columns):
+    """Turn a tuple of equal-length column arrays into row tuples for a bulk writer."""
+    return zip(*(c.tolist() if c.dtype.kind != "M" else c.astype(str).tolist() for c in columns))
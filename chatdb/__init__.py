@@ -0,0 +1,18 @@
+"""Shared data access for the customer support scripts.
+
+Scripts outside this package put the repository root on sys.path and then
+`import chatdb`. Connection settings come from CHAT_DB_* environment variables.
+"""
+from chatdb.config import DEFAULT_POOL_SIZE, db_config
+from chatdb.connection import ChatConnection, connect, create_pool, get_pool, pooled
+from chatdb.lookups import clear_cache, role_id, role_ids, status_id, status_ids
+from chatdb.statements import (STATEMENTS, execute, insert_conversation, insert_message,
+                               user_names, user_profiles, users_with_role)
+
+__all__ = [
+    "DEFAULT_POOL_SIZE", "db_config",
+    "ChatConnection", "connect", "create_pool", "get_pool", "pooled",
+    "clear_cache", "role_id", "role_ids", "status_id", "status_ids",
+    "STATEMENTS", "execute", "insert_conversation", "insert_message", "user_names", "user_profiles",
+    "users_with_role",
+]
@@ -0,0 +1,21 @@
+import os
+
+# --- CONFIG ---
+# Every setting can be overridden from the environment; the defaults match a
+# local development database.
+ENVIRONMENT = {
+    "host": ("CHAT_DB_HOST", "localhost"),
+    "database": ("CHAT_DB_NAME", "customer_support"),
+    "user": ("CHAT_DB_USER", ""),
+    "password": ("CHAT_DB_PASSWORD", ""),
+    "port": ("CHAT_DB_PORT", "5432"),
+}
+
+DEFAULT_POOL_SIZE = int(os.environ.get("CHAT_DB_POOL_SIZE", "10"))
+
+def db_config(**overrides):
+    """Connection keyword arguments for psycopg2, read from CHAT_DB_* environment variables."""
+    config = {key: os.environ.get(var, default) for key, (var, default) in ENVIRONMENT.items()}
+    config["port"] = int(config["port"])
+    config.update(overrides)
+    return config
@@ -0,0 +1,73 @@
+import os
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool
+
+from chatdb.config import DEFAULT_POOL_SIZE, db_config
+
+# --- CONNECTIONS ---
+class ChatConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that remembers which named statements it has PREPAREd.
+
+    Prepared statements live for the whole session (they survive rollbacks), so
+    each one is parsed and planned once per connection and EXECUTEd after that.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+    def execute_prepared(self, name, sql, params=(), cursor=None):
+        """PREPARE `sql` (written with $1, $2 ... placeholders) as `name` if needed, then EXECUTE it.
+
+        Returns the cursor so callers can fetch results.
+        """
+        cur = cursor or self.cursor()
+        if name not in self.prepared:
+            cur.execute(f"PREPARE {name} AS {sql}")
+            self.prepared.add(name)
+        if params:
+            cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", tuple(params))
+        else:
+            cur.execute(f"EXECUTE {name}")
+        return cur
+
+def connect(**overrides):
+    """Open a ChatConnection using the environment config."""
+    return psycopg2.connect(connection_factory=ChatConnection, **db_config(**overrides))
+
+# --- POOLS ---
+def create_pool(minconn=1, maxconn=DEFAULT_POOL_SIZE, **overrides):
+    """New thread-safe pool of ChatConnections; the caller is responsible for closeall()."""
+    return ThreadedConnectionPool(minconn, maxconn, connection_factory=ChatConnection,
+                                  **db_config(**overrides))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Process-wide pool, created on first use.
+
+    A process forked from one that already had a pool gets a fresh one; the
+    inherited connections belong to the parent and are left alone.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = create_pool()
+            _pool_pid = os.getpid()
+        return _pool
+
+@contextmanager
+def pooled():
+    """Borrow a connection from the process-wide pool for the duration of a `with` block."""
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn, close=conn.closed != 0)
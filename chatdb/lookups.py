@@ -0,0 +1,49 @@
+import threading
+
+from chatdb.connection import pooled
+
+# --- CACHED LOOKUPS ---
+# role and status are tiny reference tables that only change when the database
+# is set up, so their name -> id maps are read once per process.
+_cache = {}
+_cache_lock = threading.Lock()
+
+def _load(conn, table):
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT name, {table}_id FROM {table};")
+        return dict(cur.fetchall())
+
+def _lookup(conn, table):
+    with _cache_lock:
+        if table not in _cache:
+            if conn is None:
+                with pooled() as pooled_conn:
+                    _cache[table] = _load(pooled_conn, table)
+            else:
+                _cache[table] = _load(conn, table)
+        return _cache[table]
+
+def role_ids(conn=None):
+    """{role name: role_id}, e.g. {'Customer': 1, 'Agent': 2}."""
+    return _lookup(conn, "role")
+
+def status_ids(conn=None):
+    """{status name: status_id}, e.g. {'open': 1, 'closed': 2}."""
+    return _lookup(conn, "status")
+
+def role_id(conn, name):
+    ids = role_ids(conn)
+    if name not in ids:
+        raise ValueError(f"Role '{name}' not found in role table.")
+    return ids[name]
+
+def status_id(conn, name):
+    ids = status_ids(conn)
+    if name not in ids:
+        raise ValueError(f"Status '{name}' not found in status table.")
+    return ids[name]
+
+def clear_cache():
+    """Forget cached ids (after the role/status tables are repopulated)."""
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,50 @@
+import json
+
+# --- PREPARED STATEMENTS ---
+# Hot single-row statements, prepared once per connection (see ChatConnection).
+STATEMENTS = {
+    "chatdb_insert_message": """
+        INSERT INTO messages (conversation_id, user_id, content, created_at)
+        VALUES ($1, $2, $3::jsonb, COALESCE($4::timestamp, LOCALTIMESTAMP))
+        RETURNING message_id, created_at
+    """,
+    "chatdb_insert_conversation": """
+        INSERT INTO conversations (status_id) VALUES ($1) RETURNING conversation_id
+    """,
+    "chatdb_users_with_role": """
+        SELECT user_id FROM users WHERE role_id = $1
+    """,
+    "chatdb_user_names": """
+        SELECT user_id, name FROM users WHERE user_id = ANY($1::int[])
+    """,
+    "chatdb_user_profiles": """
+        SELECT user_id, name, role_id FROM users WHERE user_id = ANY($1::int[])
+    """,
+}
+
+def execute(conn, name, params=()):
+    """EXECUTE one of STATEMENTS on a ChatConnection and return its cursor."""
+    return conn.execute_prepared(name, STATEMENTS[name], params)
+
+# --- WRAPPERS ---
+def insert_message(conn, conversation_id, user_id, content, created_at=None):
+    """Insert one message (`content` is a dict) and return its message_id."""
+    cur = execute(conn, "chatdb_insert_message", (conversation_id, user_id, json.dumps(content), created_at))
+    return cur.fetchone()[0]
+
+def insert_conversation(conn, status_id):
+    """Insert one conversation and return its conversation_id."""
+    return execute(conn, "chatdb_insert_conversation", (status_id,)).fetchone()[0]
+
+def users_with_role(conn, role_id):
+    """All user_ids with the given role."""
+    return [row[0] for row in execute(conn, "chatdb_users_with_role", (role_id,)).fetchall()]
+
+def user_names(conn, user_ids):
+    """{user_id: name} for the given ids."""
+    return dict(execute(conn, "chatdb_user_names", (list(user_ids),)).fetchall())
+
+def user_profiles(conn, user_ids):
+    """{user_id: (name, role_id)} for the given ids."""
+    rows = execute(conn, "chatdb_user_profiles", (list(user_ids),)).fetchall()
+    return {user_id: (name, role_id) for user_id, name, role_id in rows}